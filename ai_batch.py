@@ -0,0 +1,163 @@
+"""
+Пакетная ИИ-проверка заданий.
+
+Запрос только создает задачу и сразу возвращает ее id; проверка идет в
+фоновом потоке. Обращения к модели выполняются параллельно (не более
+AI_BATCH_CONCURRENCY одновременно), а результаты записываются в БД
+пачками по COMMIT_EVERY из одного потока. Прогресс интерфейс получает
+опросом /api/assignments/batch-check/<job_id>.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, Assignment, AssignmentDefinition, AICheckJob, AICheckJobItem
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 5
+DEFAULT_REQUIREMENTS = "Стандартные требования"
+
+
+def create_job(teacher_id, assignment_ids):
+    """Создает задачу проверки; задания без файла отмечаются как пропущенные."""
+    assignments = Assignment.query.filter(
+        Assignment.id.in_(assignment_ids),
+        Assignment.teacher_id == teacher_id
+    ).all() if assignment_ids else []
+
+    job = AICheckJob(teacher_id=teacher_id)
+    for assignment in assignments:
+        has_file = bool(assignment.file_path)
+        job.items.append(AICheckJobItem(
+            assignment_id=assignment.id,
+            status='pending' if has_file else 'skipped',
+            error=None if has_file else 'Нет файла работы'
+        ))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def start_job(job_id, ai, use_cache=True):
+    """Запускает проверку в фоновом потоке; use_cache=False — мимо кэша ответов модели."""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                run_job(job_id, ai, use_cache)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"AI check job {job_id} failed: {e}")
+                job = db.session.get(AICheckJob, job_id)
+                if job:
+                    job.status = 'failed'
+                    job.error = str(e)[:500]
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+
+    threading.Thread(target=run, name=f'ai-check-{job_id}', daemon=True).start()
+
+
+def analyze_file(ai, title, file_path, use_cache=True):
+    """Проверяет один файл работы. Возвращает (оценка, текст анализа).
+
+    Выполняется в потоках пула, поэтому не обращается к БД.
+    """
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read()
+
+    if title.lower().endswith('.py'):
+        analysis = ai.analyze_code(content, use_cache=use_cache)
+    else:
+        analysis = ai.analyze_text_assignment(content, DEFAULT_REQUIREMENTS, use_cache=use_cache)
+
+    score = analysis.get('score', 0)
+    return score, str(analysis)
+
+
+def run_job(job_id, ai, use_cache=True):
+    job = db.session.get(AICheckJob, job_id)
+    if job is None:
+        return
+
+    pending = AICheckJobItem.query.filter_by(job_id=job_id, status='pending').all()
+    # Название — из задания группы; title в работе — снимок на момент создания
+    targets = {
+        assignment_id: (title, file_path)
+        for assignment_id, title, file_path in db.session.query(
+            Assignment.id,
+            func.coalesce(AssignmentDefinition.title, Assignment.title),
+            Assignment.file_path
+        ).outerjoin(
+            AssignmentDefinition, Assignment.definition_id == AssignmentDefinition.id
+        ).filter(
+            Assignment.id.in_([item.assignment_id for item in pending])
+        ).all()
+    } if pending else {}
+
+    job.status = 'running'
+    db.session.commit()
+
+    concurrency = max(int(current_app.config.get('AI_BATCH_CONCURRENCY', 4)), 1)
+    completed = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'ai-check-{job_id}') as pool:
+        futures = {}
+        for item in pending:
+            title, file_path = targets.get(item.assignment_id, ('', None))
+            if not file_path:
+                item.status = 'skipped'
+                item.error = 'Нет файла работы'
+                continue
+            futures[pool.submit(analyze_file, ai, title, file_path, use_cache)] = item
+
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                score, analysis = future.result()
+            except Exception as e:
+                item.status = 'failed'
+                item.error = str(e)[:500]
+            else:
+                now = datetime.utcnow()
+                assignment = db.session.get(Assignment, item.assignment_id)
+                if assignment is not None:
+                    assignment.ai_analysis = analysis
+                    assignment.score = score
+                    assignment.checked_at = now
+                item.status = 'checked'
+                item.score = score
+                item.checked_at = now
+
+            completed += 1
+            if completed % COMMIT_EVERY == 0:
+                db.session.commit()
+
+    job.status = 'done'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def job_status(job):
+    counts = {'pending': 0, 'checked': 0, 'failed': 0, 'skipped': 0}
+    for item in job.items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    total = len(job.items)
+    finished = total - counts['pending']
+    return {
+        'id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'total': total,
+        'counts': counts,
+        'progress': round(finished / total * 100) if total else 100,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'results': [item.to_dict() for item in job.items if item.status == 'checked']
+    }
@@ -0,0 +1,108 @@
+"""
+Кэш ответов модели для AIAnalyzer.
+
+Ключ — SHA-256 от (модель, сообщения промпта, temperature): одинаковая
+работа с теми же требованиями и тем же промптом повторно модель не
+вызывает. Кэш хранится в отдельном файле SQLite (AI_CACHE_PATH), а не в
+основной БД, потому что AIAnalyzer вызывается и из потоков пакетной
+проверки без контекста приложения.
+
+Записи живут AI_CACHE_TTL секунд; при превышении AI_CACHE_MAX_ENTRIES
+удаляются давно не использованные. Счетчики попаданий и промахов
+доступны через stats().
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+EVICT_EVERY = 50    # проверка размера раз в столько записей
+
+
+class AIResponseCache:
+    """Потокобезопасный кэш ответов модели в SQLite."""
+
+    def __init__(self, path, ttl=30 * 24 * 60 * 60, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS ai_cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' model TEXT,'
+            ' response TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' hits INTEGER DEFAULT 0)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_ai_cache_last_used ON ai_cache (last_used)')
+
+    @staticmethod
+    def make_key(model, messages, temperature):
+        raw = json.dumps([model, messages, temperature], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, created_at FROM ai_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE ai_cache SET last_used = ?, hits = hits + 1 WHERE key = ?', (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ai_cache (key, model, response, created_at, last_used, hits)'
+                ' VALUES (?, ?, ?, ?, ?, 0)',
+                (key, model, response, now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute('DELETE FROM ai_cache WHERE created_at < ?', (now - self.ttl,))
+        count = self._conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM ai_cache WHERE key IN ('
+                ' SELECT key FROM ai_cache ORDER BY last_used ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM ai_cache')
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
@@ -0,0 +1,253 @@
+"""
+Анализ длинных работ по частям (map-reduce).
+
+Большая работа делится на части не длиннее AI_CHUNK_CHARS символов: текст —
+по разделам (заголовкам) и абзацам, код — по функциям и классам верхнего
+уровня. Части проверяются моделью параллельно (не более AI_CHUNK_CONCURRENCY
+одновременно), затем оценки усредняются с весом по длине части, а отзывы и
+рекомендации объединяются.
+
+iter_analysis() выдает события по мере готовности частей, поэтому первый
+отзыв можно показать, не дожидаясь проверки всей работы.
+"""
+
+import ast
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_SUGGESTIONS = 10
+
+# Строка-заголовок раздела: "# ...", "1.2 Название", "Глава 3", "Введение", "ВВЕДЕНИЕ".
+# Регистр не важен только для ключевых слов: нумерация и строки капсом требуют
+# заглавных букв, иначе заголовком считалась бы любая короткая строка
+HEADING_RE = re.compile(
+    r'^\s*(#{1,6}\s+\S|\d+(\.\d+)*\.?\s+[А-ЯЁA-Z]|(?i:глава|раздел|часть|chapter|section)\s+\S'
+    r'|(?i:введение|заключение|выводы|список литературы)\s*$|[А-ЯЁA-Z][А-ЯЁA-Z\s]{3,60}$)'
+)
+# Начало определения верхнего уровня в коде на других языках
+CODE_BLOCK_RE = re.compile(
+    r'^(def |class |async def |function |export |public |private |protected |static |func |fn |'
+    r'int |void |struct |interface |package |@)'
+)
+
+TEXT_PROMPT = """
+        Это часть {index} из {total} студенческой работы. Проанализируй только эту часть
+        по следующим критериям:
+        {requirements}
+
+        Текст части:
+        {chunk}
+
+        Оцени часть от 0 до 100 и дай краткое обоснование.
+        Формат ответа: JSON с полями score, feedback, suggestions
+        """
+
+CODE_PROMPT = """
+        Это фрагмент {index} из {total} программы на {language}. Проверь фрагмент:
+        1. Синтаксис
+        2. Логика
+        3. Оптимизация
+        4. Стиль кода
+
+        Код:
+        {chunk}
+
+        Оцени фрагмент от 0 до 100 и дай краткое обоснование.
+        Формат ответа: JSON с полями score, feedback, suggestions
+        """
+
+
+def _pack(blocks, max_chars, separator):
+    """Собирает соседние блоки в части не длиннее max_chars."""
+    chunks = []
+    current = ''
+    for block in blocks:
+        if not block.strip():
+            continue
+        while len(block) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(block[:max_chars])
+            block = block[max_chars:]
+        candidate = f'{current}{separator}{block}' if current else block
+        if len(candidate) > max_chars:
+            chunks.append(current)
+            current = block
+        else:
+            current = candidate
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_chars):
+    """Делит текст на части по разделам; слишком длинные разделы — по абзацам."""
+    if len(text) <= max_chars:
+        return [text]
+
+    sections = []
+    lines = []
+    for line in text.splitlines():
+        if HEADING_RE.match(line) and lines:
+            sections.append('\n'.join(lines))
+            lines = []
+        lines.append(line)
+    if lines:
+        sections.append('\n'.join(lines))
+
+    blocks = []
+    for section in sections:
+        if len(section) <= max_chars:
+            blocks.append(section)
+        else:
+            blocks.extend(_pack(re.split(r'\n\s*\n', section), max_chars, '\n\n'))
+    return _pack(blocks, max_chars, '\n\n')
+
+
+def _python_blocks(code):
+    """Определения верхнего уровня (с декораторами) и код между ними."""
+    tree = ast.parse(code)
+    lines = code.splitlines()
+    starts = []
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        starts.append(first - 1)
+    if not starts:
+        return [code]
+    starts[0] = 0
+    starts.append(len(lines))
+    return ['\n'.join(lines[a:b]) for a, b in zip(starts, starts[1:])]
+
+
+def _generic_code_blocks(code):
+    blocks = []
+    lines = []
+    for line in code.splitlines():
+        if CODE_BLOCK_RE.match(line) and lines:
+            blocks.append('\n'.join(lines))
+            lines = []
+        lines.append(line)
+    if lines:
+        blocks.append('\n'.join(lines))
+    return blocks
+
+
+def split_code(code, language, max_chars):
+    """Делит код на части по функциям и классам верхнего уровня."""
+    if len(code) <= max_chars:
+        return [code]
+    blocks = None
+    if language.lower() in ('python', 'py'):
+        try:
+            blocks = _python_blocks(code)
+        except SyntaxError:
+            blocks = None
+    if blocks is None:
+        blocks = _generic_code_blocks(code)
+    return _pack(blocks, max_chars, '\n')
+
+
+def merge_results(parts):
+    """Сводит результаты частей [(длина, результат), ...] в одну оценку."""
+    total_weight = sum(weight for weight, _ in parts) or 1
+    score = sum(weight * result['score'] for weight, result in parts) / total_weight
+
+    feedback = []
+    suggestions = []
+    for result in sorted((result for _, result in parts), key=lambda r: r['index']):
+        if result.get('feedback'):
+            feedback.append(f"Часть {result['index']}: {result['feedback']}")
+        for suggestion in result.get('suggestions') or []:
+            if suggestion not in suggestions and len(suggestions) < MAX_SUGGESTIONS:
+                suggestions.append(suggestion)
+
+    return {
+        'score': round(score),
+        'feedback': '\n'.join(feedback),
+        'suggestions': suggestions,
+        'chunks': len(parts)
+    }
+
+
+def _normalize(raw, index):
+    score = raw.get('score', 0) if isinstance(raw, dict) else 0
+    try:
+        score = max(0, min(100, float(score)))
+    except (TypeError, ValueError):
+        score = 0
+    suggestions = raw.get('suggestions') if isinstance(raw, dict) else None
+    if isinstance(suggestions, str):
+        suggestions = [suggestions]
+    return {
+        'index': index,
+        'score': score,
+        'feedback': str(raw.get('feedback', '')) if isinstance(raw, dict) else str(raw),
+        'suggestions': [str(s) for s in suggestions or []]
+    }
+
+
+def iter_analysis(ai, content, requirements='', kind='text', language='python',
+                  max_chars=6000, concurrency=4, use_cache=True):
+    """Генератор событий анализа по частям.
+
+    {'type': 'start', 'total': n}
+    {'type': 'chunk', 'index': i, 'total': n, 'score', 'feedback', 'suggestions'} — по готовности
+    {'type': 'result', 'score', 'feedback', 'suggestions', 'chunks', 'failed'} — итог
+    """
+    if kind == 'code':
+        chunks = split_code(content, language, max_chars)
+    else:
+        chunks = split_text(content, max_chars)
+    total = len(chunks)
+    yield {'type': 'start', 'total': total}
+
+    def analyze(index, chunk):
+        if kind == 'code':
+            prompt = CODE_PROMPT.format(index=index, total=total, language=language, chunk=chunk)
+            messages = [{"role": "user", "content": prompt}]
+        else:
+            prompt = TEXT_PROMPT.format(index=index, total=total, requirements=requirements, chunk=chunk)
+            messages = [{"role": "system", "content": "Ты опытный преподаватель"},
+                        {"role": "user", "content": prompt}]
+        return ai.complete_json(messages, temperature=0.3, use_cache=use_cache)
+
+    parts = []
+    failed = []
+    pool = ThreadPoolExecutor(max_workers=max(min(concurrency, total), 1), thread_name_prefix='ai-chunk')
+    try:
+        futures = {
+            pool.submit(analyze, index, chunk): (index, len(chunk))
+            for index, chunk in enumerate(chunks, start=1)
+        }
+        for future in as_completed(futures):
+            index, weight = futures[future]
+            try:
+                result = _normalize(future.result(), index)
+            except Exception as e:
+                failed.append(index)
+                yield {'type': 'error', 'index': index, 'total': total, 'error': str(e)}
+                continue
+            parts.append((weight, result))
+            yield dict(result, type='chunk', total=total)
+    finally:
+        # Клиент мог отключиться: непроверенные части больше не нужны
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if parts:
+        result = merge_results(parts)
+    else:
+        result = {'score': 0, 'feedback': 'Ошибка анализа: ни одна часть не проверена',
+                  'suggestions': [], 'chunks': 0}
+    result['failed'] = sorted(failed)
+    yield dict(result, type='result')
+
+
+def analyze(ai, content, **kwargs):
+    """Итоговый результат анализа по частям (без промежуточных событий)."""
+    result = None
+    for event in iter_analysis(ai, content, **kwargs):
+        if event['type'] == 'result':
+            result = event
+    result.pop('type', None)
+    return result
@@ -0,0 +1,118 @@
+"""
+Локальный сервер-заглушка OpenAI Chat Completions для проверки ИИ-функций.
+
+Отвечает на POST /v1/chat/completions тем же форматом, что и OpenAI, с
+настраиваемой задержкой, и считает запросы (в том числе максимальное число
+одновременных). Ответ по умолчанию — JSON с полями score, feedback,
+suggestions; его можно заменить функцией responder(messages) -> str.
+
+Пример:
+    server = StandinAIServer(delay=0.5).start()
+    # OPENAI_API_KEY=test OPENAI_BASE_URL=server.base_url
+    ...
+    server.stop()
+
+Запуск из командной строки (для ручной проверки интерфейса):
+    python ai_standin.py
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(messages):
+    prompt = messages[-1]['content'] if messages else ''
+    words = len(prompt.split())
+    return json.dumps({
+        'score': min(100, 50 + words % 50),
+        'feedback': 'Проверено локальной заглушкой',
+        'suggestions': ['Добавить выводы']
+    }, ensure_ascii=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.standin
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            content = server.responder(payload.get('messages') or [])
+        finally:
+            with server.lock:
+                server.active -= 1
+
+        body = json.dumps({
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'standin'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandinAIServer:
+    """Сервер-заглушка на 127.0.0.1 (порт выбирается автоматически)."""
+
+    def __init__(self, delay=0.0, responder=None, host='127.0.0.1', port=0):
+        self.delay = delay
+        self.responder = responder or default_responder
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='ai-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+if __name__ == '__main__':
+    server = StandinAIServer(delay=1.0).start()
+    print(f"OPENAI_BASE_URL={server.base_url}")
+    print("OPENAI_API_KEY=любой непустой ключ")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,6 +1,8 @@
 import json
 import re
 from config import Config
+from ai_cache import AIResponseCache
+import ai_chunks
 
 try:
     import openai
@@ -11,16 +13,79 @@ except Exception:
 class AIAnalyzer:
     def __init__(self):
         self.api_key = Config.OPENAI_API_KEY
+        self.model = Config.OPENAI_MODEL
+        self.cache = None
+        if Config.AI_CACHE_ENABLED:
+            try:
+                self.cache = AIResponseCache(Config.AI_CACHE_PATH, Config.AI_CACHE_TTL, Config.AI_CACHE_MAX_ENTRIES)
+            except Exception as e:
+                print(f"AI cache disabled: {e}")
         self.client = None
         if openai and self.api_key:
             try:
                 openai.api_key = self.api_key
                 # openai>=1.x
-                self.client = openai.OpenAI(api_key=self.api_key)
+                # OPENAI_BASE_URL позволяет указать совместимый сервер (например, ai_standin)
+                self.client = openai.OpenAI(api_key=self.api_key, base_url=Config.OPENAI_BASE_URL or None)
             except Exception:
                 self.client = None
 
-    def analyze_text_assignment(self, text, requirements):
+    def _complete(self, messages, temperature, use_cache=True, validate=None):
+        """Ответ модели (content) через кэш.
+
+        use_cache=False — обойти кэш (ответ все равно сохраняется);
+        validate(content) — проверка ответа: непрошедший проверку не кэшируется.
+        """
+        key = AIResponseCache.make_key(self.model, messages, temperature) if self.cache else None
+        if key and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+        if validate is not None:
+            validate(content)
+        if key:
+            self.cache.set(key, self.model, content)
+        return content
+
+    def complete_json(self, messages, temperature, use_cache=True):
+        return json.loads(self._complete(messages, temperature, use_cache=use_cache, validate=json.loads))
+
+    def _chunk_options(self, use_cache):
+        return {
+            'max_chars': Config.AI_CHUNK_CHARS,
+            'concurrency': Config.AI_CHUNK_CONCURRENCY,
+            'use_cache': use_cache
+        }
+
+    def stream_analysis(self, content, requirements='', kind='text', language='python', use_cache=True):
+        """События анализа по частям (см. ai_chunks.iter_analysis).
+
+        Без ключа API сразу выдает итог локальной эвристики.
+        """
+        if not self.client:
+            if kind == 'code':
+                result = self.analyze_code(content, language)
+            else:
+                result = self.analyze_text_assignment(content, requirements)
+            yield {'type': 'start', 'total': 1}
+            yield dict(result, type='result', chunks=1, failed=[])
+            return
+        yield from ai_chunks.iter_analysis(
+            self, content, requirements=requirements, kind=kind, language=language,
+            **self._chunk_options(use_cache)
+        )
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {'enabled': False}
+
+    def analyze_text_assignment(self, text, requirements, use_cache=True):
         prompt = f"""
         Проанализируй студенческую работу по следующим критериям:
         {requirements}
@@ -36,14 +101,17 @@ class AIAnalyzer:
             # Fallback heuristic if no API key
             score = max(0, min(100, 60 + (len(text.split()) // 50)))
             return {"score": score, "feedback": "Локальная эвристическая оценка без ИИ", "suggestions": []}
+        if len(text) > Config.AI_CHUNK_CHARS:
+            # Длинная работа целиком в один запрос не помещается
+            return ai_chunks.analyze(self, text, requirements=requirements, **self._chunk_options(use_cache))
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "system", "content": "Ты опытный преподаватель"},
-                          {"role": "user", "content": prompt}],
-                temperature=0.3
+            result = self._complete(
+                [{"role": "system", "content": "Ты опытный преподаватель"},
+                 {"role": "user", "content": prompt}],
+                temperature=0.3,
+                use_cache=use_cache,
+                validate=json.loads
             )
-            result = response.choices[0].message.content
             return json.loads(result)
         except Exception as e:
             return {"score": 0, "feedback": f"Ошибка анализа: {str(e)}", "suggestions": []}
@@ -58,7 +126,7 @@ class AIAnalyzer:
             "is_original": uniqueness > 70
         }
 
-    def analyze_code(self, code, language='python'):
+    def analyze_code(self, code, language='python', use_cache=True):
         prompt = f"""
         Проверь код на {language}:
         1. Синтаксис
@@ -70,21 +138,19 @@ class AIAnalyzer:
         {code}
 
         Дай оценку 0-100 и рекомендации.
+        Формат ответа: JSON с полями score, feedback, suggestions
         """
 
         if not self.client:
             return {"score": 70, "feedback": "Локальная проверка кода недоступна без ИИ", "suggestions": []}
+        if len(code) > Config.AI_CHUNK_CHARS:
+            return ai_chunks.analyze(self, code, kind='code', language=language, **self._chunk_options(use_cache))
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            return response.choices[0].message.content
+            return self.complete_json([{"role": "user", "content": prompt}], temperature=0.3, use_cache=use_cache)
         except Exception as e:
-            return f"Ошибка анализа кода: {str(e)}"
+            return {"score": 0, "feedback": f"Ошибка анализа кода: {str(e)}", "suggestions": []}
 
-    def suggest_schedule_slot(self, existing_schedule, duration_minutes=90):
+    def suggest_schedule_slot(self, existing_schedule, duration_minutes=90, use_cache=True):
         prompt = f"""
         На основе существующего расписания предложи оптимальное время для нового занятия.
         Длительность: {duration_minutes} минут
@@ -104,11 +170,12 @@ class AIAnalyzer:
             # Simple local suggestion: next weekday at 10:00
             return {"day": "Monday", "time": "10:00", "reason": "Локальная эвристика без ИИ"}
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.5
+            result = self._complete(
+                [{"role": "user", "content": prompt}],
+                temperature=0.5,
+                use_cache=use_cache,
+                validate=json.loads
             )
-            return json.loads(response.choices[0].message.content)
+            return json.loads(result)
         except Exception as e:
             return {"error": str(e)}
\ No newline at end of file
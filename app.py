@@ -4,7 +4,7 @@ from config import Config
 from models import db, Teacher
 from auth import auth_bp
 from journal import journal_bp
-from assignments import assignments_bp
+from assignments import assignments_bp, link_legacy_assignments
 from calendar_module import calendar_bp
 from groups import groups_bp
 from tasks import tasks_bp
@@ -15,12 +15,17 @@ from conference import conference_bp
 from admin import admin_bp
 from notes import notes_bp
 from analytics import analytics_bp
+from schedule_snapshots import register_snapshot_listeners
+from dashboard_summary import register_summary_listeners, get_summary
 import os
 import hmac
 import hashlib
 import subprocess
 from datetime import datetime, timedelta
-from sqlalchemy import func, case
+from sqlalchemy import func
+import numpy as np
+import time_buckets
+import score_distribution
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -29,6 +34,8 @@ app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config['JSON_AS_ASCII'] = False
 
 db.init_app(app)
+register_snapshot_listeners()
+register_summary_listeners()
 login_manager = LoginManager(app)
 
 login_manager.login_view = 'auth.login'
@@ -66,27 +73,8 @@ def index():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    from models import Group, Student, Assignment, Lesson
-
-    groups_count = Group.query.filter_by(teacher_id=current_user.id).count()
-    students_count = db.session.query(Student).join(Group).filter(
-        Group.teacher_id == current_user.id
-    ).count()
-    assignments_count = Assignment.query.filter_by(teacher_id=current_user.id).count()
-    lessons_count = Lesson.query.filter_by(teacher_id=current_user.id).count()
-
-    unchecked = Assignment.query.filter_by(
-        teacher_id=current_user.id,
-        checked_at=None
-    ).count()
-
-    return render_template('dashboard.html',
-                           groups=groups_count,
-                           students=students_count,
-                           assignments=assignments_count,
-                           lessons=lessons_count,
-                           unchecked=unchecked
-                           )
+    # Счетчики кэшируются и сбрасываются при записи (см. dashboard_summary)
+    return render_template('dashboard.html', **get_summary(current_user.id))
 
 
 @app.route('/api/analytics/overview')
@@ -118,354 +106,88 @@ def analytics_overview():
 @app.route('/api/analytics/attendance-monthly')
 @login_required
 def analytics_attendance_monthly():
-    from models import Attendance, Lesson
-    # Последние 12 месяцев, включая текущий
-    now = datetime.now()
-    start_date = (now.replace(day=1) - timedelta(days=365)).replace(day=1)
-
-    # SQLite strftime('%Y-%m', date)
-    month_label = func.strftime('%Y-%m', Lesson.date)
-
-    present_count = func.sum(case((Attendance.present == True, 1), else_=0))
-    total_count = func.count(Attendance.id)
-    absent_count = (total_count - present_count)
-
-    rows = (
-        db.session.query(
-            month_label.label('month'),
-            present_count.label('present'),
-            absent_count.label('absent')
-        )
-        .join(Lesson, Attendance.lesson_id == Lesson.id)
-        .filter(Lesson.teacher_id == current_user.id)
-        .filter(Lesson.date >= start_date)
-        .group_by('month')
-        .order_by('month')
-        .all()
-    )
-
-    # Сформировать последовательность месяцев за период, чтобы заполнить нули
-    labels = []
-    data_present = []
-    data_absent = []
-
-    # helper to iterate months
-    def add_month(dt):
-        if dt.month == 12:
-            return dt.replace(year=dt.year + 1, month=1)
-        return dt.replace(month=dt.month + 1)
-
-    # map from month to counts
-    data_map = {r.month: {'present': int(r.present or 0), 'absent': int(r.absent or 0)} for r in rows}
-
-    cursor = start_date.replace(day=1)
-    end_cursor = now.replace(day=1)
-    # include up to and including current month
-    while cursor <= end_cursor:
-        key = cursor.strftime('%Y-%m')
-        labels.append(key)
-        counts = data_map.get(key, {'present': 0, 'absent': 0})
-        data_present.append(counts['present'])
-        data_absent.append(counts['absent'])
-        cursor = add_month(cursor)
+    # Последние 12 месяцев, включая текущий; записи посещаемости есть только у явных отметок
+    start, end = _last_year()
+    months, series = time_buckets.aggregate('attendance', 'month', start, end, teacher_id=current_user.id)
 
     return jsonify({
-        'labels': labels,
-        'present': data_present,
-        'absent': data_absent
+        'labels': [time_buckets.bucket_key(m, 'month') for m in months],
+        'present': series['present'].tolist(),
+        'absent': series['absent'].tolist()
     })
 
 
 @app.route('/api/analytics/attendance-monthly/group')
 @login_required
 def analytics_attendance_monthly_group():
-    from models import Attendance, Lesson
+    from models import Student
     group_id = request.args.get('group_id', type=int)
     if not group_id:
         return jsonify({'error': 'group_id is required'}), 400
 
-    now = datetime.now()
-    start_date = (now.replace(day=1) - timedelta(days=365)).replace(day=1)
-
-    # Групповой размер и агрегации по месяцам: считаем отсутствия, а присутствие выводим как
-    # present = (количество занятий в месяце * размер группы) - количество отсутствий
-    from models import Student
+    # Посещаемость хранится разреженно: считаем занятия и пропуски, а присутствие выводим как
+    # present = (количество занятий в месяце * размер группы) - количество пропусков
     group_size = db.session.query(func.count(Student.id)).filter(Student.group_id == group_id).scalar() or 0
-
-    month_label = func.strftime('%Y-%m', Lesson.date)
-    lessons_count = func.count(func.distinct(Lesson.id))
-    absent_count = func.sum(case((Attendance.present == False, 1), else_=0))
-
-    rows = (
-        db.session.query(
-            month_label.label('month'),
-            lessons_count.label('lessons_cnt'),
-            absent_count.label('absent')
-        )
-        .join(Lesson, Attendance.lesson_id == Lesson.id)
-        .filter(Lesson.teacher_id == current_user.id)
-        .filter(Lesson.group_id == group_id)
-        .filter(Lesson.date >= start_date)
-        .group_by('month')
-        .order_by('month')
-        .all()
+    start, end = _last_year()
+    months, series = time_buckets.aggregate(
+        'lesson_absences', 'month', start, end, teacher_id=current_user.id, group_id=group_id
     )
+    present = np.maximum(series['lessons'] * group_size - series['absent'], 0)
 
-    labels = []
-    data_present = []
-    data_absent = []
-
-    def add_month(dt):
-        if dt.month == 12:
-            return dt.replace(year=dt.year + 1, month=1)
-        return dt.replace(month=dt.month + 1)
-
-    # Пересчитываем present по правилу: present = lessons_cnt * group_size - absent
-    data_map = {}
-    for r in rows:
-        lessons_cnt = int(r.lessons_cnt or 0)
-        absent = int(r.absent or 0)
-        present = lessons_cnt * group_size - absent
-        if present < 0:
-            present = 0
-        data_map[r.month] = {'present': present, 'absent': absent}
-
-    cursor = start_date.replace(day=1)
-    end_cursor = now.replace(day=1)
-    while cursor <= end_cursor:
-        key = cursor.strftime('%Y-%m')
-        labels.append(key)
-        counts = data_map.get(key, {'present': 0, 'absent': 0})
-        data_present.append(counts['present'])
-        data_absent.append(counts['absent'])
-        cursor = add_month(cursor)
-
-    return jsonify({'labels': labels, 'present': data_present, 'absent': data_absent})
+    return jsonify({
+        'labels': [time_buckets.bucket_key(m, 'month') for m in months],
+        'present': present.tolist(),
+        'absent': series['absent'].tolist()
+    })
 
 
 @app.route('/api/analytics/scores-monthly/group')
 @login_required
 def analytics_scores_monthly_group():
-    from models import Assignment, Student
     group_id = request.args.get('group_id', type=int)
     if not group_id:
         return jsonify({'error': 'group_id is required'}), 400
-
-    now = datetime.now()
-    start_date = (now.replace(day=1) - timedelta(days=365)).replace(day=1)
-
-    # Связываем задания со студентами выбранной группы
-    month_label = func.strftime('%Y-%m', Assignment.submitted_at)
-    # Бинning по диапазонам (0-59 низкий, 60-74 средний, 75-89 хороший, 90-100 отличный, None — нет оценки)
-    excellent = func.sum(case((Assignment.score >= 90, 1), else_=0))
-    good = func.sum(case(((Assignment.score >= 75) & (Assignment.score < 90), 1), else_=0))
-    average = func.sum(case(((Assignment.score >= 60) & (Assignment.score < 75), 1), else_=0))
-    low = func.sum(case(((Assignment.score < 60) & (Assignment.score != None), 1), else_=0))
-    no_score = func.sum(case((Assignment.score == None, 1), else_=0))
-
-    rows = (
-        db.session.query(
-            month_label.label('month'),
-            excellent.label('excellent'),
-            good.label('good'),
-            average.label('average'),
-            low.label('low'),
-            no_score.label('no_score')
-        )
-        .join(Student, Assignment.student_id == Student.id)
-        .filter(Student.group_id == group_id)
-        .filter(Assignment.teacher_id == current_user.id)
-        .filter(Assignment.submitted_at >= start_date)
-        .group_by('month')
-        .order_by('month')
-        .all()
-    )
-
-    labels = []
-    series_excellent = []
-    series_good = []
-    series_average = []
-    series_low = []
-    series_no_score = []
-
-    def add_month(dt):
-        if dt.month == 12:
-            return dt.replace(year=dt.year + 1, month=1)
-        return dt.replace(month=dt.month + 1)
-
-    data_map = {
-        r.month: {
-            'excellent': int(r.excellent or 0),
-            'good': int(r.good or 0),
-            'average': int(r.average or 0),
-            'low': int(r.low or 0),
-            'no_score': int(r.no_score or 0)
-        } for r in rows
-    }
-
-    cursor = start_date.replace(day=1)
-    end_cursor = now.replace(day=1)
-    while cursor <= end_cursor:
-        key = cursor.strftime('%Y-%m')
-        labels.append(key)
-        entry = data_map.get(key, None)
-        series_excellent.append((entry or {}).get('excellent', 0))
-        series_good.append((entry or {}).get('good', 0))
-        series_average.append((entry or {}).get('average', 0))
-        series_low.append((entry or {}).get('low', 0))
-        series_no_score.append((entry or {}).get('no_score', 0))
-        cursor = add_month(cursor)
-
-    return jsonify({
-        'labels': labels,
-        'excellent': series_excellent,
-        'good': series_good,
-        'average': series_average,
-        'low': series_low,
-        'no_score': series_no_score
-    })
+    return jsonify(_scores_monthly(group_id=group_id))
 
 
 @app.route('/api/analytics/scores-monthly')
 @login_required
 def analytics_scores_monthly_overall():
-    from models import Assignment
+    return jsonify(_scores_monthly())
+
+
+def _last_year():
+    """Период графиков по месяцам: 12 прошедших месяцев и текущий."""
     now = datetime.now()
-    start_date = (now.replace(day=1) - timedelta(days=365)).replace(day=1)
-
-    month_label = func.strftime('%Y-%m', Assignment.submitted_at)
-    excellent = func.sum(case((Assignment.score >= 90, 1), else_=0))
-    good = func.sum(case(((Assignment.score >= 75) & (Assignment.score < 90), 1), else_=0))
-    average = func.sum(case(((Assignment.score >= 60) & (Assignment.score < 75), 1), else_=0))
-    low = func.sum(case(((Assignment.score < 60) & (Assignment.score != None), 1), else_=0))
-    no_score = func.sum(case((Assignment.score == None, 1), else_=0))
-
-    rows = (
-        db.session.query(
-            month_label.label('month'),
-            excellent.label('excellent'),
-            good.label('good'),
-            average.label('average'),
-            low.label('low'),
-            no_score.label('no_score')
-        )
-        .filter(Assignment.teacher_id == current_user.id)
-        .filter(Assignment.submitted_at >= start_date)
-        .group_by('month')
-        .order_by('month')
-        .all()
-    )
+    return time_buckets.shift(time_buckets.align(now, 'month'), 'month', -12), now
 
-    labels = []
-    series_excellent = []
-    series_good = []
-    series_average = []
-    series_low = []
-    series_no_score = []
-
-    def add_month(dt):
-        if dt.month == 12:
-            return dt.replace(year=dt.year + 1, month=1)
-        return dt.replace(month=dt.month + 1)
-
-    data_map = {
-        r.month: {
-            'excellent': int(r.excellent or 0),
-            'good': int(r.good or 0),
-            'average': int(r.average or 0),
-            'low': int(r.low or 0),
-            'no_score': int(r.no_score or 0)
-        } for r in rows
-    }
-
-    cursor = start_date.replace(day=1)
-    end_cursor = now.replace(day=1)
-    while cursor <= end_cursor:
-        key = cursor.strftime('%Y-%m')
-        labels.append(key)
-        entry = data_map.get(key, None)
-        series_excellent.append((entry or {}).get('excellent', 0))
-        series_good.append((entry or {}).get('good', 0))
-        series_average.append((entry or {}).get('average', 0))
-        series_low.append((entry or {}).get('low', 0))
-        series_no_score.append((entry or {}).get('no_score', 0))
-        cursor = add_month(cursor)
 
-    return jsonify({
-        'labels': labels,
-        'excellent': series_excellent,
-        'good': series_good,
-        'average': series_average,
-        'low': series_low,
-        'no_score': series_no_score
-    })
+def _scores_monthly(group_id=None):
+    """Оценки заданий по диапазонам (отлично/хорошо/средне/низко/нет оценки) по месяцам сдачи."""
+    start, end = _last_year()
+    months, series = time_buckets.aggregate(
+        'scores', 'month', start, end, teacher_id=current_user.id, group_id=group_id
+    )
+    result = {'labels': [time_buckets.bucket_key(m, 'month') for m in months]}
+    result.update((name, values.tolist()) for name, values in series.items())
+    return result
 
 
 @app.route('/api/analytics/scores-by-group')
 @login_required
 def analytics_scores_by_group():
     """Статистика успеваемости по группам на основе контрольных точек из журнала"""
-    from models import ControlPoint, ControlPointScore, Student, Group
-    
-    # Получаем все контрольные точки преподавателя
-    control_points = ControlPoint.query.filter_by(teacher_id=current_user.id).all()
-    if not control_points:
-        return jsonify({'labels': [], 'excellent': [], 'good': [], 'average': [], 'low': []})
-    
-    # Получаем все оценки контрольных точек
-    cp_ids = [cp.id for cp in control_points]
-    scores = db.session.query(ControlPointScore).join(
-        Student, ControlPointScore.student_id == Student.id
-    ).join(Group, Student.group_id == Group.id).filter(
-        ControlPointScore.control_point_id.in_(cp_ids)
-    ).all()
-    
-    # Группируем по группам
-    group_stats = {}
-    for score in scores:
-        student = db.session.get(Student, score.student_id)
-        if not student or not student.group:
-            continue
-            
-        group_name = student.group.name
-        if group_name not in group_stats:
-            group_stats[group_name] = []
-        
-        # Находим контрольную точку для нормализации
-        cp = next((cp for cp in control_points if cp.id == score.control_point_id), None)
-        if not cp:
-            continue
-            
-        # Нормализуем к 100-балльной шкале
-        normalized_score = (score.points / cp.max_points) * 100 if cp.max_points > 0 else 0
-        group_stats[group_name].append(normalized_score)
-    
-    # Подсчитываем категории по группам
-    labels = []
-    excellent = []
-    good = []
-    average = []
-    low = []
-    
-    for group_name, scores_list in group_stats.items():
-        labels.append(group_name)
-        
-        excellent_count = sum(1 for s in scores_list if s >= 85)
-        good_count = sum(1 for s in scores_list if s >= 70 and s < 85)
-        average_count = sum(1 for s in scores_list if s >= 55 and s < 70)
-        low_count = sum(1 for s in scores_list if s < 55)
-        
-        excellent.append(excellent_count)
-        good.append(good_count)
-        average.append(average_count)
-        low.append(low_count)
-    
+    subject = request.args.get('subject', type=str)
+    stats = score_distribution.distribution(current_user.id, by='group', subject=subject)
+    names = score_distribution.group_names(stats.keys())
+    groups = sorted((names[group_id], counts) for group_id, counts in stats.items() if group_id in names)
+
     return jsonify({
-        'labels': labels, 
-        'excellent': excellent, 
-        'good': good, 
-        'average': average, 
-        'low': low
+        'labels': [name for name, _ in groups],
+        'excellent': [counts['excellent'] for _, counts in groups],
+        'good': [counts['good'] for _, counts in groups],
+        'average': [counts['average'] for _, counts in groups],
+        'low': [counts['low'] for _, counts in groups]
     })
 
 
@@ -522,91 +244,45 @@ def analytics_assignments_by_group():
 def analytics_control_points_group():
     """Возвращает данные контрольных точек для диаграммы успеваемости группы"""
     from models import ControlPoint, ControlPointScore, Student
-    
+
     group_id = request.args.get('group_id', type=int)
     if not group_id:
         return jsonify({'error': 'group_id is required'}), 400
 
     # Получаем контрольные точки для группы
     control_points = ControlPoint.query.filter_by(
-        group_id=group_id, 
+        group_id=group_id,
         teacher_id=current_user.id
     ).order_by(ControlPoint.date.asc()).all()
 
     if not control_points:
         return jsonify({'labels': [], 'datasets': []})
 
-    # Получаем все оценки для этих контрольных точек
-    control_point_ids = [cp.id for cp in control_points]
-    scores = db.session.query(ControlPointScore).join(
+    # Категории — одним сгруппированным запросом; размер группы — один раз
+    stats = score_distribution.distribution(current_user.id, by='control_point', group_id=group_id)
+    total_students = db.session.query(func.count(Student.id)).filter(Student.group_id == group_id).scalar() or 0
+
+    # Сами баллы (для подсказок диаграммы)
+    scores_by_cp = {}
+    for cp_id, points in db.session.query(
+        ControlPointScore.control_point_id, ControlPointScore.points
+    ).join(
         Student, ControlPointScore.student_id == Student.id
     ).filter(
         Student.group_id == group_id,
-        ControlPointScore.control_point_id.in_(control_point_ids)
-    ).all()
-
-    # Группируем оценки по контрольным точкам
-    scores_by_cp = {}
-    for score in scores:
-        cp_id = score.control_point_id
-        if cp_id not in scores_by_cp:
-            scores_by_cp[cp_id] = []
-        scores_by_cp[cp_id].append(score.points)
-
-    # Формируем данные для линейчатой диаграммы с накоплением
-    labels = []  # Названия контрольных точек (ось Y)
-    excellent_data = []  # 90-100%
-    good_data = []       # 75-89%
-    average_data = []    # 60-74%
-    low_data = []        # <60%
-    no_score_data = []   # Без оценки
-    
-    for cp in control_points:
-        # Название контрольной точки (дата + название)
-        date_str = cp.date.strftime('%d.%m.%Y')
-        label = f"{date_str} - {cp.title}"
-        labels.append(label)
-        
-        # Получаем оценки для этой контрольной точки
-        cp_scores = scores_by_cp.get(cp.id, [])
-        
-        # Подсчитываем количество студентов в каждой категории
-        excellent = 0
-        good = 0
-        average = 0
-        low = 0
-        
-        for score in cp_scores:
-            # Нормализуем балл к шкале 0-100
-            normalized_score = (score / cp.max_points) * 100 if cp.max_points > 0 else 0
-            
-            # Категории: Отлично (85-100), Хорошо (70-84), Удовлетворительно (55-69), Неудовлетворительно (0-54)
-            if normalized_score >= 85:
-                excellent += 1
-            elif normalized_score >= 70:
-                good += 1
-            elif normalized_score >= 55:
-                average += 1
-            else:
-                low += 1
-        
-        # Получаем общее количество студентов в группе
-        total_students = db.session.query(Student).filter_by(group_id=group_id).count()
-        no_score = max(0, total_students - len(cp_scores))
-        
-        excellent_data.append(excellent)
-        good_data.append(good)
-        average_data.append(average)
-        low_data.append(low)
-        no_score_data.append(no_score)
+        ControlPointScore.control_point_id.in_([cp.id for cp in control_points]),
+        ControlPointScore.points != None
+    ).all():
+        scores_by_cp.setdefault(cp_id, []).append(points)
 
+    counts = [stats.get(cp.id, score_distribution.empty_counts()) for cp in control_points]
     return jsonify({
-        'labels': labels,
-        'excellent': excellent_data,
-        'good': good_data,
-        'average': average_data,
-        'low': low_data,
-        'no_score': no_score_data,
+        'labels': [f"{cp.date.strftime('%d.%m.%Y')} - {cp.title}" for cp in control_points],
+        'excellent': [c['excellent'] for c in counts],
+        'good': [c['good'] for c in counts],
+        'average': [c['average'] for c in counts],
+        'low': [c['low'] for c in counts],
+        'no_score': [max(0, total_students - c['scored']) for c in counts],
         'control_points': [{
             'id': cp.id,
             'title': cp.title,
@@ -618,6 +294,31 @@ def analytics_control_points_group():
     })
 
 
+@app.route('/api/analytics/control-points/distribution')
+@login_required
+def analytics_control_points_distribution():
+    """Распределение баллов контрольных точек по категориям для любой выборки
+
+    by=group|control_point; фильтры: control_point_id, group_id, subject.
+    """
+    by = 'control_point' if request.args.get('by') == 'control_point' else 'group'
+    stats = score_distribution.distribution(
+        current_user.id,
+        by=by,
+        control_point_id=request.args.get('control_point_id', type=int),
+        group_id=request.args.get('group_id', type=int),
+        subject=request.args.get('subject', type=str)
+    )
+    names = score_distribution.group_names(stats.keys()) if by == 'group' else {}
+    return jsonify({
+        'by': by,
+        'items': [
+            dict(counts, id=key, name=names.get(key)) if by == 'group' else dict(counts, id=key)
+            for key, counts in sorted(stats.items())
+        ]
+    })
+
+
 def ensure_startup_state():
     with app.app_context():
         db.create_all()
@@ -677,8 +378,14 @@ def ensure_startup_state():
                     db.session.execute(text("ALTER TABLE 'assignment' ADD COLUMN due_date DATE"))
                 if 'subject' not in column_names:
                     db.session.execute(text("ALTER TABLE 'assignment' ADD COLUMN subject VARCHAR(200)"))
+                if 'definition_id' not in column_names:
+                    db.session.execute(text("ALTER TABLE 'assignment' ADD COLUMN definition_id INTEGER REFERENCES assignment_definition (id)"))
+                    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_assignment_definition_id ON assignment (definition_id)"))
+                db.session.commit()
+                # Старые работы без задания — объединяем в задания группы
+                link_legacy_assignments()
             except Exception:
-                pass  # Таблица может не существовать
+                db.session.rollback()  # Таблица может не существовать
             
             # Миграция таблицы control_point
             try:
@@ -689,6 +396,59 @@ def ensure_startup_state():
             except Exception:
                 pass
             
+            # Кэш заголовков почты: поиск идет по search_text (casefold). Кэш без этой
+            # колонки проще собрать заново — письма повторно загрузятся при открытии папки
+            try:
+                result = db.session.execute(text("PRAGMA table_info('mail_header')")).all()
+                column_names = {row[1] for row in result}
+                if column_names and 'search_text' not in column_names:
+                    db.session.execute(text("ALTER TABLE mail_header ADD COLUMN search_text TEXT"))
+                    db.session.execute(text("DELETE FROM mail_header"))
+                    db.session.execute(text("DELETE FROM mailbox_state"))
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+            # Индекс облака: поиск идет по search_name (casefold), заполняем его для прочитанных записей
+            try:
+                result = db.session.execute(text("PRAGMA table_info('cloud_entry')")).all()
+                column_names = {row[1] for row in result}
+                if column_names and 'search_name' not in column_names:
+                    db.session.execute(text("ALTER TABLE cloud_entry ADD COLUMN search_name VARCHAR(500)"))
+                    rows = db.session.execute(text("SELECT id, name FROM cloud_entry")).all()
+                    if rows:
+                        db.session.execute(
+                            text("UPDATE cloud_entry SET search_name = :search_name WHERE id = :id"),
+                            [{'id': entry_id, 'search_name': (name or '').casefold()} for entry_id, name in rows]
+                        )
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+            # Подписи похожих работ: путь был уникален во всей таблице, теперь — в пределах группы.
+            # Подписи пересчитываются из облака, поэтому старую таблицу достаточно пересоздать
+            try:
+                path_unique = any(
+                    index[2] and [col[2] for col in db.session.execute(
+                        text(f"PRAGMA index_info('{index[1]}')")
+                    ).all()] == ['path']
+                    for index in db.session.execute(text("PRAGMA index_list('submission_signature')")).all()
+                )
+                if path_unique:
+                    from models import SubmissionSignature
+                    db.session.execute(text("DROP TABLE submission_signature"))
+                    db.session.commit()
+                    SubmissionSignature.__table__.create(db.engine)
+            except Exception:
+                db.session.rollback()
+
+            # Индексы для отбора по периоду в графиках аналитики (create_all не добавляет их в старые таблицы)
+            try:
+                db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_lesson_teacher_date ON lesson (teacher_id, date)"))
+                db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_assignment_teacher_submitted ON assignment (teacher_id, submitted_at)"))
+            except Exception:
+                pass
+
             db.session.commit()
         except Exception:
             pass
@@ -705,98 +465,28 @@ except Exception as startup_error:
 @login_required
 def analytics_lessons_timeline():
     """Возвращает данные о занятиях для временного графика"""
-    from models import Lesson
-    
     period = request.args.get('period', 'month')  # day, week, month
     days_back = request.args.get('days', type=int)
-    
-    # Определяем период для анализа
+
+    # Период анализа и максимальное число точек для читаемости
     if period == 'day':
-        days_back = days_back or 30  # последние 30 дней
+        days_back, max_points = days_back or 30, 30  # последние 30 дней
     elif period == 'week':
-        days_back = days_back or 84  # последние 12 недель
-    else:  # month
-        days_back = days_back or 365  # последние 12 месяцев
-    
-    start_date = datetime.now() - timedelta(days=days_back)
-    
-    # Получаем занятия за период
-    lessons = Lesson.query.filter(
-        Lesson.teacher_id == current_user.id,
-        Lesson.date >= start_date
-    ).order_by(Lesson.date.asc()).all()
-    
-    # Группируем по периодам
-    period_counts = {}
-    
-    for lesson in lessons:
-        if period == 'day':
-            key = lesson.date.strftime('%Y-%m-%d')
-        elif period == 'week':
-            # Получаем номер недели
-            year, week, _ = lesson.date.isocalendar()
-            key = f"{year}-W{week:02d}"
-        else:  # month
-            key = lesson.date.strftime('%Y-%m')
-        
-        if key not in period_counts:
-            period_counts[key] = 0
-        period_counts[key] += 1
-    
-    # Создаем полный список периодов (включая пустые)
-    all_periods = []
-    current_date = start_date
-    end_date = datetime.now()
-    
-    while current_date <= end_date:
-        if period == 'day':
-            key = current_date.strftime('%Y-%m-%d')
-            label = current_date.strftime('%d.%m.%Y')
-            current_date += timedelta(days=1)
-        elif period == 'week':
-            year, week, _ = current_date.isocalendar()
-            key = f"{year}-W{week:02d}"
-            # Понедельник этой недели
-            monday = current_date - timedelta(days=current_date.weekday())
-            # Воскресенье этой недели
-            sunday = monday + timedelta(days=6)
-            label = f"{monday.strftime('%d.%m.%Y')} - {sunday.strftime('%d.%m.%Y')}"
-            current_date += timedelta(weeks=1)
-        else:  # month
-            key = current_date.strftime('%Y-%m')
-            # Получаем название месяца на русском
-            month_names = {
-                1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-                5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-                9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-            }
-            month_name = month_names[current_date.month]
-            label = f"{month_name} {current_date.year}"
-            # Правильный переход к следующему месяцу
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1, day=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1, day=1)
-        
-        all_periods.append({
-            'key': key,
-            'label': label,
-            'count': period_counts.get(key, 0)
-        })
-    
-    # Ограничиваем количество точек для читаемости
-    if period == 'day' and len(all_periods) > 30:
-        all_periods = all_periods[-30:]
-    elif period == 'week' and len(all_periods) > 12:
-        all_periods = all_periods[-12:]
-    elif period == 'month' and len(all_periods) > 12:
-        all_periods = all_periods[-12:]
-    
-    labels = [p['label'] for p in all_periods]
-    data = [p['count'] for p in all_periods]
-    
+        days_back, max_points = days_back or 84, 12  # последние 12 недель
+    else:
+        period = 'month'
+        days_back, max_points = days_back or 365, 12  # последние 12 месяцев
+
+    end = datetime.now()
+    start = end - timedelta(days=days_back)
+    first = time_buckets.shift(time_buckets.align(end, period), period, -(max_points - 1))
+    buckets, series = time_buckets.aggregate(
+        'lessons', period, max(start, first), end, teacher_id=current_user.id
+    )
+    data = series['count'].tolist()
+
     return jsonify({
-        'labels': labels,
+        'labels': [time_buckets.bucket_label(b, period) for b in buckets],
         'data': data,
         'period': period,
         'total_lessons': sum(data)
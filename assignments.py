@@ -1,14 +1,32 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, abort
+from flask import Blueprint, render_template, request, jsonify, send_file, abort, Response, stream_with_context, current_app
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-from models import db, Assignment, Student, Group
+from werkzeug.utils import secure_filename, safe_join
+from models import db, Assignment, AssignmentDefinition, Student, Group, AICheckJob
 from cloud_utils import CloudStorage
+from config import Config
+import cloud_index
+from upload_sessions import (
+    UploadSessionError, create_session, get_session, session_status,
+    append_chunk, open_assembled, discard_session
+)
+from submission_archive import stream_group_archive
+import similarity
+from disk_cache import DiskLRUCache
 from ai_utils import AIAnalyzer
+from ai_batch import create_job, start_job, job_status
 from datetime import datetime, date
+from sqlalchemy import insert, update, text
 import os
+import hashlib
+import json
+import tempfile
+import threading
+from urllib.parse import quote
 
 assignments_bp = Blueprint('assignments', __name__)
 cloud = CloudStorage()
+_downloads = None
+_downloads_lock = threading.Lock()
 ai = AIAnalyzer()
 
 
@@ -26,43 +44,40 @@ def get_group_assignments(group_id):
     group = Group.query.filter_by(id=group_id, teacher_id=current_user.id).first_or_404()
     students = Student.query.filter_by(group_id=group_id).order_by(Student.name.asc()).all()
     subject = request.args.get('subject', type=str)
-    
-    # Получаем все задания для студентов этой группы
-    assignments = Assignment.query.join(Student).filter(
-        Student.group_id == group_id,
-        Assignment.teacher_id == current_user.id
-    )
+
+    definitions = AssignmentDefinition.query.filter_by(group_id=group_id, teacher_id=current_user.id)
     if subject:
-        assignments = assignments.filter((Assignment.subject == subject) | (Assignment.subject == None))
-    assignments = assignments.order_by(Assignment.title.asc(), Assignment.due_date.asc()).all()
-    
-    # Группируем задания по названию и дате (уникальные задания)
-    assignment_groups = {}
-    for assignment in assignments:
-        key = f"{assignment.title}_{assignment.due_date.isoformat() if assignment.due_date else 'no_date'}"
-        if key not in assignment_groups:
-            assignment_groups[key] = {
-                'title': assignment.title,
-                'due_date': assignment.due_date.isoformat() if assignment.due_date else None,
-                'subject': assignment.subject,
-                'assignment_id': assignment.id
-            }
-    
-    # Создаем матрицу оценок: student_id -> assignment_key -> score
+        definitions = definitions.filter(
+            (AssignmentDefinition.subject == subject) | (AssignmentDefinition.subject == None)
+        )
+    definitions = definitions.order_by(AssignmentDefinition.title.asc(), AssignmentDefinition.due_date.asc()).all()
+    definition_ids = [d.id for d in definitions]
+
+    # Сводка по каждому заданию — один GROUP BY
+    stats = {
+        definition_id: {'submissions': total, 'checked': checked,
+                        'avg_score': round(avg, 1) if avg is not None else None}
+        for definition_id, total, checked, avg in db.session.query(
+            Assignment.definition_id,
+            db.func.count(Assignment.id),
+            db.func.count(Assignment.checked_at),
+            db.func.avg(Assignment.score)
+        ).filter(Assignment.definition_id.in_(definition_ids)).group_by(Assignment.definition_id).all()
+    } if definition_ids else {}
+
+    # Матрица оценок: student_id -> definition_id -> оценка
     scores_matrix = {}
-    for assignment in assignments:
-        student_id = assignment.student_id
-        key = f"{assignment.title}_{assignment.due_date.isoformat() if assignment.due_date else 'no_date'}"
-        
-        if student_id not in scores_matrix:
-            scores_matrix[student_id] = {}
-        
-        scores_matrix[student_id][key] = {
-            'score': assignment.score,
-            'checked_at': assignment.checked_at.isoformat() if assignment.checked_at else None,
-            'assignment_id': assignment.id
+    cells = db.session.query(
+        Assignment.id, Assignment.definition_id, Assignment.student_id, Assignment.score, Assignment.checked_at
+    ).filter(Assignment.definition_id.in_(definition_ids)).all() if definition_ids else []
+    for assignment_id, definition_id, student_id, score, checked_at in cells:
+        scores_matrix.setdefault(student_id, {})[definition_id] = {
+            'score': score,
+            'checked_at': checked_at.isoformat() if checked_at else None,
+            'assignment_id': assignment_id
         }
-    
+
+    empty_stats = {'submissions': 0, 'checked': 0, 'avg_score': None}
     return jsonify({
         'group': {
             'id': group.id,
@@ -70,11 +85,18 @@ def get_group_assignments(group_id):
             'course': group.course
         },
         'students': [{'id': s.id, 'name': s.name} for s in students],
-        'assignments': list(assignment_groups.values()),
+        'assignments': [dict(d.to_dict(), **stats.get(d.id, empty_stats)) for d in definitions],
         'scores_matrix': scores_matrix
     })
 
 
+def _parse_due_date(value):
+    """Дата срока из ISO-строки; пустое значение — без срока. ValueError при неверном формате."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).date()
+
+
 @assignments_bp.route('/api/assignments/create', methods=['POST'])
 @login_required
 def create_assignment():
@@ -82,49 +104,125 @@ def create_assignment():
     data = request.json
     group_id = data.get('group_id')
     title = data.get('title', '').strip()
-    due_date_str = data.get('due_date')
     subject = (data.get('subject') or '').strip()
-    
+
     if not group_id or not title:
         return jsonify({'error': 'group_id and title are required'}), 400
-    
+
     group = Group.query.filter_by(id=group_id, teacher_id=current_user.id).first_or_404()
-    students = Student.query.filter_by(group_id=group_id).all()
-    
-    if not students:
+    student_ids = [student_id for (student_id,) in db.session.query(Student.id).filter_by(group_id=group_id).all()]
+
+    if not student_ids:
         return jsonify({'error': 'No students in group'}), 400
-    
-    due_date = None
-    if due_date_str:
+
+    try:
+        due_date = _parse_due_date(data.get('due_date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    definition = AssignmentDefinition(
+        teacher_id=current_user.id,
+        group_id=group.id,
+        title=title,
+        due_date=due_date,
+        subject=subject or None
+    )
+    db.session.add(definition)
+    db.session.flush()
+
+    # Работы студентов — одним INSERT на всю группу
+    now = datetime.utcnow()
+    db.session.execute(insert(Assignment), [
+        {
+            'definition_id': definition.id,
+            'title': title,
+            'student_id': student_id,
+            'teacher_id': current_user.id,
+            'due_date': due_date,
+            'subject': subject or None,
+            'submitted_at': now
+        }
+        for student_id in student_ids
+    ])
+    db.session.commit()
+
+    return jsonify({
+        'status': 'success',
+        'created_count': len(student_ids),
+        'assignment': definition.to_dict()
+    })
+
+
+@assignments_bp.route('/api/assignments/definition/<int:definition_id>', methods=['PATCH'])
+@login_required
+def update_assignment_definition(definition_id):
+    """Переименовать задание, изменить срок или дисциплину (одна запись для всей группы)"""
+    definition = AssignmentDefinition.query.filter_by(
+        id=definition_id,
+        teacher_id=current_user.id
+    ).first_or_404()
+    data = request.json or {}
+
+    if 'title' in data:
+        title = (data.get('title') or '').strip()
+        if not title:
+            return jsonify({'error': 'title must not be empty'}), 400
+        definition.title = title
+    if 'due_date' in data:
         try:
-            due_date = datetime.fromisoformat(due_date_str).date()
+            definition.due_date = _parse_due_date(data.get('due_date'))
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
-    
-    # Создаем задание для каждого студента
-    created_assignments = []
-    for student in students:
-        assignment = Assignment(
-            title=title,
-            student_id=student.id,
-            teacher_id=current_user.id,
-            due_date=due_date,
-            subject=subject or None,
-            submitted_at=datetime.utcnow()
+    if 'subject' in data:
+        definition.subject = (data.get('subject') or '').strip() or None
+    db.session.commit()
+
+    return jsonify({'status': 'success', 'assignment': definition.to_dict()})
+
+
+def link_legacy_assignments():
+    """Создает задания (AssignmentDefinition) для работ, созданных до их появления.
+
+    Работы объединяются по преподавателю, группе студента, названию, сроку и
+    дисциплине — так же, как их раньше объединяла матрица. Повторный вызов
+    ничего не меняет.
+    """
+    pending = db.session.execute(text(
+        "SELECT COUNT(*) FROM assignment WHERE definition_id IS NULL"
+    )).scalar()
+    if not pending:
+        return 0
+    db.session.execute(text("""
+        INSERT INTO assignment_definition (teacher_id, group_id, title, due_date, subject, created_at)
+        SELECT a.teacher_id, s.group_id, a.title, a.due_date, a.subject, MIN(a.submitted_at)
+        FROM assignment a JOIN student s ON s.id = a.student_id
+        WHERE a.definition_id IS NULL AND a.teacher_id IS NOT NULL AND s.group_id IS NOT NULL
+        GROUP BY a.teacher_id, s.group_id, a.title, a.due_date, a.subject
+    """))
+    db.session.execute(text("""
+        UPDATE assignment SET definition_id = (
+            SELECT MIN(d.id) FROM assignment_definition d JOIN student s ON s.group_id = d.group_id
+            WHERE s.id = assignment.student_id AND d.teacher_id = assignment.teacher_id
+              AND d.title = assignment.title AND d.due_date IS assignment.due_date
+              AND d.subject IS assignment.subject
         )
-        db.session.add(assignment)
-        created_assignments.append(assignment)
-    
+        WHERE definition_id IS NULL
+    """))
     db.session.commit()
-    
-    return jsonify({
-        'status': 'success',
-        'created_count': len(created_assignments),
-        'assignment': {
-            'title': title,
-            'due_date': due_date.isoformat() if due_date else None
-        }
-    })
+    return pending
+
+
+def _parse_score(value):
+    """Оценка 0..100 из числа или строки ("4,5" допускается); пустое значение — None."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        score = float(value.strip().replace(',', '.')) if isinstance(value, str) else float(value)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid score format')
+    if score < 0 or score > 100:
+        raise ValueError('Score must be between 0 and 100')
+    return score
 
 
 @assignments_bp.route('/api/assignments/score', methods=['POST'])
@@ -139,10 +237,10 @@ def update_assignment_score():
         return jsonify({'error': 'assignment_id and score are required'}), 400
     
     try:
-        score = float(score)
-        if score < 0 or score > 100:
-            return jsonify({'error': 'Score must be between 0 and 100'}), 400
-    except (ValueError, TypeError):
+        score = _parse_score(score)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if score is None:
         return jsonify({'error': 'Invalid score format'}), 400
     
     assignment = Assignment.query.filter_by(
@@ -161,6 +259,142 @@ def update_assignment_score():
     })
 
 
+@assignments_bp.route('/api/assignments/scores', methods=['POST'])
+@login_required
+def update_assignment_scores():
+    """Сохранить блок оценок одним запросом (например, вставленный из Excel)
+
+    cells: [{student_id, definition_id, score}] или [{assignment_id, score}].
+    Пустая оценка снимает отметку о проверке. Ячейки без работы студента
+    (студент добавлен в группу позже задания) создаются. Все изменения
+    сохраняются одной транзакцией; ошибки возвращаются по каждой ячейке.
+    """
+    data = request.json or {}
+    cells = data.get('cells')
+    if not isinstance(cells, list) or not cells:
+        return jsonify({'error': 'cells are required'}), 400
+
+    parsed = []
+    errors = []
+    for index, cell in enumerate(cells):
+        if not isinstance(cell, dict):
+            errors.append({'index': index, 'error': 'Invalid cell'})
+            continue
+        try:
+            assignment_id = int(cell['assignment_id']) if cell.get('assignment_id') else None
+            definition_id = int(cell['definition_id']) if cell.get('definition_id') else None
+            student_id = int(cell['student_id']) if cell.get('student_id') else None
+        except (ValueError, TypeError):
+            errors.append({'index': index, 'error': 'Invalid cell'})
+            continue
+        try:
+            score = _parse_score(cell.get('score'))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        if not assignment_id and not (definition_id and student_id):
+            errors.append({'index': index, 'error': 'assignment_id or student_id and definition_id are required'})
+            continue
+        parsed.append((index, assignment_id, definition_id, student_id, score))
+
+    # Работы, задания и студенты преподавателя — по одному запросу на всю пачку
+    assignment_ids = {p[1] for p in parsed if p[1]}
+    definition_ids = {p[2] for p in parsed if p[2]}
+    student_ids = {p[3] for p in parsed if p[3]}
+    rows = Assignment.query.with_entities(
+        Assignment.id, Assignment.definition_id, Assignment.student_id
+    ).filter(
+        Assignment.teacher_id == current_user.id,
+        Assignment.id.in_(assignment_ids) | (
+            Assignment.definition_id.in_(definition_ids) & Assignment.student_id.in_(student_ids)
+        )
+    ).all() if parsed else []
+    by_id = {row.id: row for row in rows}
+    by_cell = {(row.definition_id, row.student_id): row.id for row in rows if row.definition_id}
+    definitions = {
+        d.id: d for d in AssignmentDefinition.query.filter(
+            AssignmentDefinition.id.in_(definition_ids),
+            AssignmentDefinition.teacher_id == current_user.id
+        ).all()
+    } if definition_ids else {}
+    student_groups = dict(
+        db.session.query(Student.id, Student.group_id).filter(Student.id.in_(student_ids)).all()
+    ) if student_ids else {}
+
+    now = datetime.utcnow()
+    updates = {}
+    inserts = {}
+    saved = []
+    for index, assignment_id, definition_id, student_id, score in parsed:
+        checked_at = now if score is not None else None
+        if assignment_id:
+            if assignment_id not in by_id:
+                errors.append({'index': index, 'error': 'Assignment not found'})
+                continue
+            updates[assignment_id] = {'id': assignment_id, 'score': score, 'checked_at': checked_at}
+            saved.append((index, assignment_id, None, score, checked_at))
+            continue
+
+        definition = definitions.get(definition_id)
+        if definition is None:
+            errors.append({'index': index, 'error': 'Assignment not found'})
+            continue
+        if student_groups.get(student_id) != definition.group_id:
+            errors.append({'index': index, 'error': 'Student is not in the assignment group'})
+            continue
+        existing_id = by_cell.get((definition_id, student_id))
+        if existing_id:
+            updates[existing_id] = {'id': existing_id, 'score': score, 'checked_at': checked_at}
+            saved.append((index, existing_id, None, score, checked_at))
+        else:
+            inserts[(definition_id, student_id)] = {
+                'definition_id': definition_id,
+                'title': definition.title,
+                'student_id': student_id,
+                'teacher_id': current_user.id,
+                'due_date': definition.due_date,
+                'subject': definition.subject,
+                'submitted_at': now,
+                'score': score,
+                'checked_at': checked_at
+            }
+            saved.append((index, None, (definition_id, student_id), score, checked_at))
+
+    if updates:
+        db.session.execute(update(Assignment), list(updates.values()))
+    if inserts:
+        db.session.execute(insert(Assignment), list(inserts.values()))
+    if updates or inserts:
+        db.session.commit()
+
+    created = {}
+    if inserts:
+        created = {
+            (row.definition_id, row.student_id): row.id
+            for row in Assignment.query.with_entities(
+                Assignment.id, Assignment.definition_id, Assignment.student_id
+            ).filter(
+                Assignment.definition_id.in_({key[0] for key in inserts}),
+                Assignment.student_id.in_({key[1] for key in inserts})
+            ).all()
+        }
+
+    return jsonify({
+        'status': 'success' if not errors else ('partial' if saved else 'error'),
+        'saved': len(saved),
+        'cells': [
+            {
+                'index': index,
+                'assignment_id': assignment_id or created.get(key),
+                'score': score,
+                'checked_at': checked_at.isoformat() if checked_at else None
+            }
+            for index, assignment_id, key, score, checked_at in saved
+        ],
+        'errors': sorted(errors, key=lambda e: e['index'])
+    }), 200 if saved or not errors else 400
+
+
 @assignments_bp.route('/assignments/<int:assignment_id>')
 @login_required
 def assignment_detail(assignment_id):
@@ -175,6 +409,15 @@ def assignment_detail(assignment_id):
 # Удалён API загрузки заданий: страница теперь управляет облачными папками
 
 
+def _ai_summary(ai_result, plagiarism):
+    return f"""
+        AI Оценка: {ai_result['score']}/100
+        Обратная связь: {ai_result['feedback']}
+        Уникальность: {plagiarism['uniqueness_score']}%
+        Рекомендации: {', '.join(ai_result.get('suggestions', []))}
+        """
+
+
 @assignments_bp.route('/api/assignments/check/<int:assignment_id>', methods=['POST'])
 @login_required
 def check_assignment(assignment_id):
@@ -184,16 +427,13 @@ def check_assignment(assignment_id):
     if data.get('use_ai'):
         submission_text = data.get('submission_text', '')
         requirements = data.get('requirements', '')
+        # no_cache=true — повторная проверка мимо кэша ответов модели
+        use_cache = not data.get('no_cache', False)
 
-        ai_result = ai.analyze_text_assignment(submission_text, requirements)
+        ai_result = ai.analyze_text_assignment(submission_text, requirements, use_cache=use_cache)
         plagiarism = ai.check_plagiarism(submission_text)
 
-        assignment.ai_analysis = f"""
-        AI Оценка: {ai_result['score']}/100
-        Обратная связь: {ai_result['feedback']}
-        Уникальность: {plagiarism['uniqueness_score']}%
-        Рекомендации: {', '.join(ai_result.get('suggestions', []))}
-        """
+        assignment.ai_analysis = _ai_summary(ai_result, plagiarism)
         assignment.score = ai_result['score']
     else:
         assignment.score = data.get('score', 0)
@@ -209,6 +449,43 @@ def check_assignment(assignment_id):
     })
 
 
+@assignments_bp.route('/api/assignments/check/<int:assignment_id>/stream', methods=['POST'])
+@login_required
+def check_assignment_stream(assignment_id):
+    """ИИ-проверка с выдачей отзывов по мере готовности (text/event-stream).
+
+    Длинная работа проверяется по частям; события: start, chunk (отзыв по
+    части), error (часть не проверена), result (итог, сохраняется в задании).
+    """
+    Assignment.query.filter_by(id=assignment_id, teacher_id=current_user.id).first_or_404()
+    data = request.json or {}
+    submission_text = data.get('submission_text', '')
+    requirements = data.get('requirements', '')
+    kind = 'code' if data.get('kind') == 'code' else 'text'
+    language = data.get('language') or 'python'
+    use_cache = not data.get('no_cache', False)
+
+    def generate():
+        for event in ai.stream_analysis(submission_text, requirements, kind=kind,
+                                        language=language, use_cache=use_cache):
+            if event['type'] == 'result':
+                plagiarism = ai.check_plagiarism(submission_text)
+                # Объект из обработчика к этому моменту отсоединен от сессии
+                assignment = db.session.get(Assignment, assignment_id)
+                assignment.ai_analysis = _ai_summary(event, plagiarism)
+                assignment.score = event['score']
+                assignment.checked_at = datetime.utcnow()
+                db.session.commit()
+                event['uniqueness_score'] = plagiarism['uniqueness_score']
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @assignments_bp.route('/api/assignments/submissions/<int:student_id>')
 @login_required
 def get_submissions(student_id):
@@ -223,39 +500,114 @@ def get_submissions(student_id):
     })
 
 
+@assignments_bp.route('/api/assignments/group/<int:group_id>/submissions.zip')
+@login_required
+def download_group_submissions(group_id):
+    """Все работы студентов группы одним ZIP-архивом (формируется потоково).
+
+    Параметр q оставляет только файлы, в имени которых есть подстрока
+    (например, название задания).
+    """
+    group = Group.query.filter_by(id=group_id, teacher_id=current_user.id).first_or_404()
+    student_names = [name for (name,) in db.session.query(Student.name).filter_by(
+        group_id=group_id
+    ).order_by(Student.name.asc()).all()]
+    name_filter = request.args.get('q', '').strip() or None
+    workers = current_app.config.get('SUBMISSIONS_ZIP_WORKERS', 4)
+
+    archive_name = f"{group.name}_{name_filter}.zip" if name_filter else f"{group.name}.zip"
+    fallback = secure_filename(archive_name) or 'submissions.zip'
+    return Response(
+        stream_with_context(stream_group_archive(cloud, student_names, group.name, name_filter, workers)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(archive_name)}"
+        }
+    )
+
+
+@assignments_bp.route('/api/assignments/similarity')
+@login_required
+def find_similar_submissions():
+    """Похожие работы разных студентов группы (group_id) или всего курса (course).
+
+    Подписи новых и измененных файлов пересчитываются при запросе;
+    threshold — минимальная оценка похожести (0..1).
+    """
+    groups_query = Group.query.filter_by(teacher_id=current_user.id)
+    group_id = request.args.get('group_id', type=int)
+    course = request.args.get('course', '').strip()
+    if group_id:
+        groups_query = groups_query.filter_by(id=group_id)
+    elif course:
+        groups_query = groups_query.filter_by(course=course)
+    else:
+        return jsonify({'error': 'Укажите group_id или course'}), 400
+    groups = groups_query.all()
+    if not groups:
+        return jsonify({'error': 'Группа не найдена'}), 404
+
+    threshold = request.args.get('threshold', type=float)
+    if threshold is None:
+        threshold = current_app.config.get('SIMILARITY_THRESHOLD', 0.5)
+    workers = current_app.config.get('SIMILARITY_WORKERS', 4)
+
+    students = {}
+    rows = []
+    hashed = 0
+    for group in groups:
+        group_students = Student.query.filter_by(group_id=group.id).all()
+        students.update((student.id, (student.name, group.name)) for student in group_students)
+        group_rows, group_hashed = similarity.index_group(cloud, group, group_students, workers)
+        rows.extend(group_rows)
+        hashed += group_hashed
+
+    def describe(row):
+        name, group_name = students.get(row.student_id, ('', ''))
+        return {'student_id': row.student_id, 'student': name, 'group': group_name,
+                'name': row.name, 'path': row.path}
+
+    pairs = similarity.find_similar(rows, threshold)
+    return jsonify({
+        'files': len(rows),
+        'indexed': sum(1 for row in rows if row.signature),
+        'hashed': hashed,
+        'threshold': threshold,
+        'pairs': [
+            {'similarity': round(score, 3), 'a': describe(a), 'b': describe(b)}
+            for a, b, score in pairs
+        ]
+    })
+
+
 @assignments_bp.route('/api/assignments/batch-check', methods=['POST'])
 @login_required
 def batch_check():
-    data = request.json
+    """Запускает фоновую ИИ-проверку; прогресс — GET /api/assignments/batch-check/<job_id>"""
+    data = request.json or {}
     assignment_ids = data.get('assignment_ids', [])
     use_ai = data.get('use_ai', False)
 
-    results = []
+    if not use_ai:
+        return jsonify({'results': []})
 
-    for aid in assignment_ids:
-        assignment = db.session.get(Assignment, aid)
-        if assignment and assignment.teacher_id == current_user.id:
-            if use_ai and assignment.file_path:
-                with open(assignment.file_path, 'r') as f:
-                    content = f.read()
+    job = create_job(current_user.id, assignment_ids)
+    start_job(job.id, ai, use_cache=not data.get('no_cache', False))
+    return jsonify(job_status(job)), 202
 
-                if assignment.title.lower().endswith('.py'):
-                    analysis = ai.analyze_code(content)
-                else:
-                    analysis = ai.analyze_text_assignment(content, "Стандартные требования")
 
-                assignment.ai_analysis = str(analysis)
-                assignment.score = analysis.get('score', 0) if isinstance(analysis, dict) else 70
-                assignment.checked_at = datetime.utcnow()
+@assignments_bp.route('/api/assignments/batch-check/<int:job_id>')
+@login_required
+def batch_check_status(job_id):
+    job = AICheckJob.query.filter_by(id=job_id, teacher_id=current_user.id).first_or_404()
+    return jsonify(job_status(job))
 
-                results.append({
-                    'id': aid,
-                    'score': assignment.score,
-                    'status': 'checked'
-                })
 
-    db.session.commit()
-    return jsonify({'results': results})
+@assignments_bp.route('/api/assignments/ai-cache')
+@login_required
+def ai_cache_stats():
+    """Размер и эффективность кэша ответов модели"""
+    return jsonify(ai.cache_stats())
 
 
 @assignments_bp.route('/api/assignments/stats')
@@ -276,10 +628,49 @@ def api_cloud_list():
     base = group
     if subpath:
         base = f"{group}/{subpath}"
+    if getattr(cloud, 'webdav', None):
+        # Served from the metadata index; a folder not indexed yet is read live once
+        try:
+            items = cloud_index.list_dir(base)
+            if items is None:
+                items = cloud_index.refresh_dir(cloud.webdav, base)
+            if cloud_index.is_stale():
+                cloud_index.request_crawl(cloud.webdav)
+            return jsonify({'path': base, 'items': items})
+        except Exception as e:
+            db.session.rollback()
+            print('cloud index error', e)
     items = cloud.list_group_folders(base)
     return jsonify({'path': base, 'items': items})
 
 
+@assignments_bp.route('/api/cloud/search')
+@login_required
+def api_cloud_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q required'}), 400
+    group = request.args.get('group')
+    items = cloud_index.search(query, group=group)
+    if getattr(cloud, 'webdav', None) and cloud_index.is_stale():
+        cloud_index.request_crawl(cloud.webdav)
+    return jsonify({'query': query, 'items': items})
+
+
+def _index_changed(rel_path, removed=False):
+    """Keep the cloud index in step with changes made through the app."""
+    if not getattr(cloud, 'webdav', None):
+        return
+    try:
+        if removed:
+            cloud_index.forget(rel_path)
+        else:
+            cloud_index.mark_changed(rel_path.strip('/').rsplit('/', 1)[0] if '/' in rel_path.strip('/') else '')
+    except Exception as e:
+        db.session.rollback()
+        print('cloud index error', e)
+
+
 @assignments_bp.route('/api/cloud/mkdir', methods=['POST'])
 @login_required
 def api_cloud_mkdir():
@@ -292,6 +683,7 @@ def api_cloud_mkdir():
     target = f"{group}/{subpath}/{name}" if subpath else f"{group}/{name}"
     try:
         cloud.mkdir(target)
+        _index_changed(target)
     except Exception as e:
         print('mkdir error', e)
         return jsonify({'status': 'error'}), 500
@@ -312,6 +704,9 @@ def api_cloud_rename():
             s = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + src).replace('//', '/')
             d = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + dst).replace('//', '/')
             cloud.webdav.move(s, d)
+            cloud.forget_dirs(s)
+            _index_changed(src, removed=True)
+            _index_changed(dst)
             ok = True
         except Exception as e:
             print('rename webdav error', e)
@@ -336,6 +731,8 @@ def api_cloud_delete():
         try:
             t = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + target).replace('//', '/')
             cloud.webdav.clean(t)
+            cloud.forget_dirs(t)
+            _index_changed(target, removed=True)
             ok = True
         except Exception as e:
             print('delete webdav error', e)
@@ -364,26 +761,95 @@ def api_cloud_upload():
     rel = f"{group}/{path}/{file.filename}" if path else f"{group}/{file.filename}"
     try:
         cloud.upload(rel, file)
+        _index_changed(rel)
         return jsonify({'status': 'ok'})
     except Exception as e:
         print('upload error', e)
         return jsonify({'status': 'error'}), 500
 
 
+# Chunked, resumable uploads for files larger than MAX_CONTENT_LENGTH (see upload_sessions)
+
+@assignments_bp.route('/api/cloud/upload/session', methods=['POST'])
+@login_required
+def api_cloud_upload_session():
+    data = request.get_json(silent=True) or {}
+    group = data.get('group')
+    path = (data.get('path') or '').strip('/')
+    filename = (data.get('filename') or '').replace('\\', '/').split('/')[-1].strip()
+    if not group or not filename:
+        return jsonify({'error': 'group and filename required'}), 400
+    rel = f"{group}/{path}/{filename}" if path else f"{group}/{filename}"
+    try:
+        upload = create_session(current_user.id, 'cloud', filename, data.get('size'), rel)
+    except (UploadSessionError, ValueError) as e:
+        return jsonify({'error': str(e)}), getattr(e, 'status', 400)
+    return jsonify(session_status(upload)), 201
+
+
+@assignments_bp.route('/api/cloud/upload/session/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@login_required
+def api_cloud_upload_session_chunk(upload_id):
+    try:
+        upload = get_session(upload_id, current_user.id, 'cloud')
+        if request.method == 'GET':
+            return jsonify(session_status(upload))
+        if request.method == 'DELETE':
+            discard_session(upload)
+            return jsonify({'status': 'ok'})
+        status = session_status(upload)
+        if not status['complete']:
+            append_chunk(upload, request.stream, request.headers.get('Content-Range'))
+            status = session_status(upload)
+    except UploadSessionError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    if not status['complete']:
+        return jsonify(status)
+    try:
+        with open_assembled(upload) as stream:
+            cloud.upload_stream(upload['target'], stream, upload['size'])
+        _index_changed(upload['target'])
+    except Exception as e:
+        # the assembled file is kept; an empty PUT retries the transfer
+        print('upload error', e)
+        return jsonify({'status': 'error'}), 502
+    discard_session(upload)
+    return jsonify({'status': 'ok', 'complete': True})
+
+
+def _download_cache():
+    global _downloads
+    with _downloads_lock:
+        if _downloads is None:
+            directory = current_app.config.get('DOWNLOAD_CACHE_DIR') or os.path.join('instance', 'download_cache')
+            _downloads = DiskLRUCache(directory, current_app.config.get('DOWNLOAD_CACHE_MAX_MB', 500) * 1024 * 1024)
+    return _downloads
+
+
 @assignments_bp.route('/api/cloud/download')
 @login_required
 def api_cloud_download():
     rel = request.args.get('target')
     if not rel:
         return jsonify({'error': 'target required'}), 400
-    # Скачиваем во временный файл и отдаем
-    tmp_dir = os.path.join('uploads', '__tmp_dl__')
-    os.makedirs(tmp_dir, exist_ok=True)
     filename = rel.split('/')[-1]
-    local_path = os.path.join(tmp_dir, filename)
+    if not getattr(cloud, 'webdav', None):
+        # Local storage: the file is already on disk
+        local_path = safe_join(os.path.abspath('uploads'), rel.strip('/'))
+        if not local_path or not os.path.isfile(local_path):
+            return jsonify({'error': 'not found'}), 404
+        return send_file(local_path, as_attachment=True, download_name=filename, conditional=True)
     try:
-        cloud.download(rel, local_path)
-        return send_file(local_path, as_attachment=True, download_name=filename)
+        # Cached copy keyed by path + etag: an unchanged file costs one PROPFIND, not a download
+        version = cloud.remote_version(rel)
+        if not version:
+            buffer = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            cloud.download_to(rel, buffer)
+            buffer.seek(0)
+            return send_file(buffer, as_attachment=True, download_name=filename)
+        key = hashlib.sha256(f'{rel.strip("/")}\0{version}'.encode('utf-8')).hexdigest()
+        path = _download_cache().fill(key, lambda f: cloud.download_to(rel, f))
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=filename, conditional=True)
     except Exception as e:
         print('download error', e)
-        return jsonify({'status': 'error'}), 500
\ No newline at end of file
+        return jsonify({'status': 'error'}), 500
@@ -0,0 +1,263 @@
+"""
+Индекс метаданных облака заданий (WebDAV).
+
+Фоновый обходчик читает дерево облака запросами PROPFIND с глубиной 1,
+выполняя несколько запросов параллельно, и сохраняет имя, путь, размер,
+etag и время изменения в таблицу cloud_entry. Навигация по папкам и поиск
+по всем группам обслуживаются из таблицы без обращения к WebDAV.
+
+Повторный обход спускается только в папки, у которых изменился etag (или
+время изменения, если сервер не отдает etag для папок); неизмененные
+поддеревья остаются в индексе как есть. Изменения через приложение
+(загрузка, создание, переименование, удаление) помечают затронутую папку,
+и при следующем открытии она перечитывается.
+
+Запуск обхода вручную (например, по расписанию):
+    python cloud_index.py
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from flask import current_app
+
+from config import Config
+from models import db, CloudEntry
+
+logger = logging.getLogger(__name__)
+
+_running = False
+_last_crawl = 0.0
+_state_lock = threading.Lock()
+
+
+def _remote(rel_path):
+    return (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + rel_path.strip('/')).replace('//', '/')
+
+
+def _relative(remote_path):
+    root = Config.WEBDAV_ROOT_PATH.rstrip('/')
+    path = remote_path.rstrip('/')
+    if root and path.startswith(root):
+        path = path[len(root):]
+    return path.strip('/')
+
+
+def _parent(rel_path):
+    return rel_path.rsplit('/', 1)[0] if '/' in rel_path else ''
+
+
+def _parse_modified(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _propfind(webdav, rel_path):
+    """Содержимое папки (PROPFIND, Depth: 1) в виде словарей индекса."""
+    entries = []
+    for info in webdav.list(_remote(rel_path), get_info=True):
+        path = _relative(info.get('path') or '')
+        if not path or path == rel_path:
+            continue
+        try:
+            size = int(info.get('size') or 0)
+        except (TypeError, ValueError):
+            size = 0
+        entries.append({
+            'path': path,
+            'name': path.rsplit('/', 1)[-1],
+            'is_dir': bool(info.get('isdir')),
+            'size': size,
+            'etag': (info.get('etag') or '').strip('"') or None,
+            'modified': _parse_modified(info.get('modified'))
+        })
+    return entries
+
+
+def _change_token(etag, modified):
+    return etag or (modified.isoformat() if modified else None)
+
+
+def _remove_subtree(rel_path):
+    CloudEntry.query.filter(
+        CloudEntry.path.startswith(rel_path + '/', autoescape=True)
+    ).delete(synchronize_session=False)
+    CloudEntry.query.filter_by(path=rel_path).delete(synchronize_session=False)
+
+
+def _apply_listing(rel_path, entries):
+    """Записывает содержимое папки в индекс. Возвращает папки, которые нужно обойти."""
+    now = datetime.utcnow()
+    directory = CloudEntry.query.filter_by(path=rel_path).first()
+    if directory is None:
+        name = rel_path.rsplit('/', 1)[-1]
+        directory = CloudEntry(path=rel_path, parent=_parent(rel_path) if rel_path else None,
+                               name=name, search_name=name.casefold(), is_dir=True)
+        db.session.add(directory)
+    directory.listed_at = now
+
+    existing = {row.path: row for row in CloudEntry.query.filter_by(parent=rel_path).all()}
+    seen = set()
+    to_crawl = []
+    for entry in entries:
+        seen.add(entry['path'])
+        row = existing.get(entry['path'])
+        if row is not None and row.is_dir != entry['is_dir']:
+            _remove_subtree(row.path)
+            row = None
+        if row is None:
+            row = CloudEntry(path=entry['path'], parent=rel_path)
+            db.session.add(row)
+        elif entry['is_dir'] and row.listed_at is not None and \
+                _change_token(row.etag, row.modified) == _change_token(entry['etag'], entry['modified']) and \
+                _change_token(entry['etag'], entry['modified']) is not None:
+            # Поддерево не менялось — не спускаемся в него
+            row.size = entry['size']
+            continue
+
+        row.name = entry['name']
+        row.search_name = entry['name'].casefold()
+        row.is_dir = entry['is_dir']
+        row.size = entry['size']
+        row.etag = entry['etag']
+        row.modified = entry['modified']
+        if entry['is_dir']:
+            row.listed_at = None
+            to_crawl.append(entry['path'])
+
+    for path in set(existing) - seen:
+        _remove_subtree(path)
+    return to_crawl
+
+
+def crawl(webdav, root=''):
+    """Обходит дерево облака начиная с root. Возвращает число прочитанных папок."""
+    workers = current_app.config.get('CLOUD_INDEX_WORKERS', 4)
+    listed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cloud-index') as pool:
+        # В потоках пула — только сетевые запросы; запись в БД — в этом потоке
+        pending = {pool.submit(_propfind, webdav, root): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel_path = pending.pop(future)
+                try:
+                    entries = future.result()
+                except Exception as e:
+                    # Папка недоступна — оставляем прежние данные до следующего обхода
+                    logger.warning(f"Cloud index: PROPFIND {rel_path or '/'} failed: {e}")
+                    continue
+                for child in _apply_listing(rel_path, entries):
+                    pending[pool.submit(_propfind, webdav, child)] = child
+                listed += 1
+            db.session.commit()
+    return listed
+
+
+def refresh_dir(webdav, rel_path):
+    """Перечитывает одну папку из облака и возвращает ее содержимое из индекса."""
+    _apply_listing(rel_path, _propfind(webdav, rel_path))
+    db.session.commit()
+    return list_dir(rel_path)
+
+
+def list_dir(rel_path):
+    """Содержимое папки из индекса или None, если папка еще не прочитана."""
+    rel_path = rel_path.strip('/')
+    directory = CloudEntry.query.filter_by(path=rel_path).first()
+    if directory is None or directory.listed_at is None:
+        return None
+    rows = CloudEntry.query.filter_by(parent=rel_path).order_by(
+        CloudEntry.is_dir.desc(), CloudEntry.name.asc()
+    ).all()
+    return [row.to_dict() for row in rows]
+
+
+def search(query, group=None, limit=100):
+    """Поиск по именам файлов и папок во всем облаке (или в папке группы).
+
+    Регистр не учитывается (в том числе для кириллицы); % и _ в запросе —
+    обычные символы.
+    """
+    q = CloudEntry.query.filter(
+        CloudEntry.search_name.contains(query.casefold(), autoescape=True),
+        CloudEntry.path != ''
+    )
+    if group:
+        q = q.filter(CloudEntry.path.startswith(group.strip('/') + '/', autoescape=True))
+    rows = q.order_by(CloudEntry.is_dir.desc(), CloudEntry.path.asc()).limit(limit).all()
+    return [row.to_dict() for row in rows]
+
+
+def mark_changed(rel_path):
+    """Помечает папку для перечитывания (после изменений через приложение)."""
+    CloudEntry.query.filter_by(path=rel_path.strip('/')).update(
+        {'listed_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def forget(rel_path):
+    """Удаляет из индекса путь и все вложенное (после удаления или переименования)."""
+    rel_path = rel_path.strip('/')
+    _remove_subtree(rel_path)
+    CloudEntry.query.filter_by(path=_parent(rel_path)).update(
+        {'listed_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def is_stale():
+    interval = current_app.config.get('CLOUD_INDEX_INTERVAL', 600)
+    with _state_lock:
+        return not _running and time.monotonic() - _last_crawl > interval
+
+
+def request_crawl(webdav):
+    """Запускает фоновый обход, если индекс устарел (не более одного одновременно)."""
+    global _running
+    with _state_lock:
+        if _running:
+            return False
+        _running = True
+
+    app = current_app._get_current_object()
+
+    def run():
+        global _running, _last_crawl
+        try:
+            with app.app_context():
+                started = time.monotonic()
+                listed = crawl(webdav)
+                logger.info(f"Cloud index: {listed} folders listed in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"Cloud index crawl failed: {e}")
+        finally:
+            with _state_lock:
+                _running = False
+                _last_crawl = time.monotonic()
+
+    threading.Thread(target=run, name='cloud-index', daemon=True).start()
+    return True
+
+
+if __name__ == '__main__':
+    from app import app
+    from cloud_utils import CloudStorage
+
+    with app.app_context():
+        storage = CloudStorage()
+        if not storage.webdav:
+            print('WebDAV не настроен')
+        else:
+            started = time.monotonic()
+            count = crawl(storage.webdav)
+            print(f'Прочитано папок: {count} за {time.monotonic() - started:.1f} с')
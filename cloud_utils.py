@@ -1,5 +1,9 @@
 import os
+import shutil
+import threading
+import time
 from config import Config
+from upload_sessions import SizedStream, stream_size, STREAM_BLOCK_SIZE
 from typing import List
 
 try:
@@ -7,9 +11,19 @@ try:
 except Exception:
     yadisk = None
 
+try:
+    from webdav3.urn import Urn
+except Exception:
+    Urn = None
+
 
 class CloudStorage:
     def __init__(self):
+        # Remote directories known to exist (path -> expiry), shared by all uploads
+        # through this connection; see _ensure_dir
+        self._known_dirs = {}
+        self._dir_locks = {}
+        self._dirs_lock = threading.Lock()
         self.client = None
         if yadisk and Config.YANDEX_TOKEN:
             try:
@@ -82,12 +96,21 @@ class CloudStorage:
             print(f"Download error: {e}")
             return False
 
-    def list_submissions(self, student_name, group_name):
+    def list_submissions(self, student_name, group_name, subdir=''):
+        """Items in the student's folder (subdir: path of a subfolder inside it)."""
+        subdir = subdir.strip('/')
         if not self.client and not self.webdav:
-            path = os.path.join('uploads', group_name, student_name)
+            path = os.path.join('uploads', group_name, student_name, *([subdir] if subdir else []))
             try:
                 if os.path.exists(path):
-                    return [type('Obj', (), {'name': f, 'path': os.path.join(path, f)}) for f in os.listdir(path)]
+                    return [
+                        type('Obj', (), {
+                            'name': f,
+                            'path': os.path.join(path, f),
+                            'type': 'dir' if os.path.isdir(os.path.join(path, f)) else 'file'
+                        })
+                        for f in os.listdir(path)
+                    ]
                 return []
             except Exception as e:
                 print(f"Local list error: {e}")
@@ -95,6 +118,8 @@ class CloudStorage:
         # Try Yandex Disk first
         if self.client:
             path = f'/Assignments/{group_name}/{student_name}/submissions'
+            if subdir:
+                path += f'/{subdir}'
             try:
                 if self.client.exists(path):
                     return list(self.client.listdir(path))
@@ -103,6 +128,8 @@ class CloudStorage:
         # WebDAV (Mail.ru Cloud)
         if self.webdav:
             cloud_path = Config.WEBDAV_ROOT_PATH.rstrip('/') + f'/{group_name}/{student_name}'
+            if subdir:
+                cloud_path += f'/{subdir}'
             try:
                 # webdavclient3 returns list of dicts with 'href'
                 items = self.webdav.list(cloud_path)
@@ -115,6 +142,43 @@ class CloudStorage:
                 print(f"WebDAV list error: {e}")
         return []
 
+    def fetch_submission(self, item, student_name, group_name, fileobj):
+        """Write one item returned by list_submissions into fileobj, chunk by chunk."""
+        if not self.client and not self.webdav:
+            with open(item.path, 'rb') as src:
+                shutil.copyfileobj(src, fileobj, STREAM_BLOCK_SIZE)
+            return
+        if self.client and str(getattr(item, 'path', '')).startswith('disk:'):
+            self.client.download(item.path, fileobj)
+            return
+        self.download_to(f'{group_name}/{student_name}/{item.name}', fileobj)
+
+    def download_to(self, rel_path: str, fileobj):
+        """Stream a file under the cloud root into fileobj without a temp file."""
+        if self.webdav:
+            p = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + rel_path.strip('/')).replace('//', '/')
+            # a plain GET: download_from() would add is_dir/check PROPFINDs first
+            response = self.webdav.execute_request(action='download', path=Urn(p).quote())
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_BLOCK_SIZE):
+                    fileobj.write(chunk)
+            finally:
+                response.close()
+            return
+        with open(os.path.join('uploads', rel_path), 'rb') as src:
+            shutil.copyfileobj(src, fileobj, STREAM_BLOCK_SIZE)
+
+    def remote_version(self, rel_path: str):
+        """Version token of a cloud file (etag, else mtime+size) from a depth-0 PROPFIND."""
+        p = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + rel_path.strip('/')).replace('//', '/')
+        info = self.webdav.info(p)
+        etag = (info.get('etag') or '').strip('"')
+        if etag:
+            return etag
+        if info.get('modified') or info.get('size'):
+            return f"{info.get('modified')}:{info.get('size')}"
+        return None
+
     def list_group_folders(self, group_name: str):
         """List folders for a path under cloud root (Mail.ru WebDAV or local fallback)."""
         # Local fallback
@@ -130,12 +194,15 @@ class CloudStorage:
         base = (Config.WEBDAV_ROOT_PATH.rstrip('/') + ('/' + group_name if group_name else '/')).replace('//', '/')
         try:
             items = self.webdav.list(base)
+            self._remember_dir(base)
             out = []
             for href in items:
                 if href == base or href.rstrip('/') == base.rstrip('/'):
                     continue
                 name = href.rstrip('/').split('/')[-1]
                 is_dir = href.endswith('/')
+                if is_dir:
+                    self._remember_dir(base.rstrip('/') + '/' + name)
                 out.append({'name': name, 'path': href, 'type': 'dir' if is_dir else 'file'})
             return out
         except Exception as e:
@@ -149,13 +216,17 @@ class CloudStorage:
     def mkdir(self, rel_path: str):
         if self.webdav:
             p = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + rel_path.strip('/')).replace('//', '/')
-            self.webdav.mkdir(p)
+            self._ensure_dir(p)
             return True
         os.makedirs(os.path.join('uploads', rel_path), exist_ok=True)
         return True
 
     def upload(self, rel_path: str, file_storage):
         # rel_path includes folders + filename
+        return self.upload_stream(rel_path, file_storage.stream)
+
+    def upload_stream(self, rel_path: str, stream, size=None):
+        """Upload a file-like object without buffering it in memory or in a temp file."""
         if self.webdav:
             p = (Config.WEBDAV_ROOT_PATH.rstrip('/') + '/' + rel_path.strip('/')).replace('//', '/')
             # ensure parent directory exists
@@ -164,23 +235,16 @@ class CloudStorage:
                 self._ensure_dir(parent)
             except Exception as e:
                 print('ensure_dir error', e)
-            # save temp then upload
-            tmp = os.path.join('uploads', '__tmp__')
-            os.makedirs(tmp, exist_ok=True)
-            tmp_file = os.path.join(tmp, file_storage.filename)
-            file_storage.save(tmp_file)
-            try:
-                self.webdav.upload_sync(remote_path=p, local_path=tmp_file)
-            finally:
-                try:
-                    os.remove(tmp_file)
-                except Exception:
-                    pass
+            # the PUT body is read from the stream in blocks
+            if size is None:
+                size = stream_size(stream)
+            self.webdav.upload_to(SizedStream(stream, size), p)
             return True
         # local
         dest = os.path.join('uploads', rel_path)
         os.makedirs(os.path.dirname(dest), exist_ok=True)
-        file_storage.save(dest)
+        with open(dest, 'wb') as d:
+            shutil.copyfileobj(stream, d, STREAM_BLOCK_SIZE)
         return True
 
     def download(self, rel_path: str, local_dest: str):
@@ -195,22 +259,63 @@ class CloudStorage:
             d.write(s.read())
         return True
 
+    def _dir_ttl(self):
+        return getattr(Config, 'WEBDAV_DIR_CACHE_TTL', 300)
+
+    def _remember_dir(self, path: str):
+        norm = '/' + path.replace('//', '/').strip('/')
+        with self._dirs_lock:
+            self._known_dirs[norm] = time.monotonic() + self._dir_ttl()
+
+    def _dir_known(self, path: str) -> bool:
+        with self._dirs_lock:
+            expires = self._known_dirs.get(path)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._known_dirs[path]
+                return False
+            return True
+
+    def _dir_lock(self, path: str):
+        with self._dirs_lock:
+            lock = self._dir_locks.get(path)
+            if lock is None:
+                lock = self._dir_locks[path] = threading.Lock()
+            return lock
+
+    def forget_dirs(self, remote_path: str):
+        """Drop cached directories at or below remote_path (after a delete)."""
+        norm = '/' + remote_path.replace('//', '/').strip('/')
+        with self._dirs_lock:
+            for path in [p for p in self._known_dirs if p == norm or p.startswith(norm.rstrip('/') + '/')]:
+                del self._known_dirs[path]
+
     def _ensure_dir(self, remote_path: str):
-        """Recursively ensure remote directories exist for WebDAV."""
+        """Ensure remote directories exist for WebDAV.
+
+        Directories seen in listings or created earlier are cached for
+        WEBDAV_DIR_CACHE_TTL seconds, so repeated uploads into the same folder
+        cost no extra round trips. Each missing component is created with a
+        single MKCOL (an existing directory answers 405, which webdav3 treats
+        as success); concurrent uploads wait on a per-path lock instead of
+        racing to create the same directory.
+        """
         if not self.webdav:
             return
         norm = remote_path.replace('//', '/')
         if norm in ('', '/'):
             return
         parts = norm.strip('/').split('/')
-        path = ''
-        for part in parts:
-            path += '/' + part
-            try:
-                # list to check existence
-                self.webdav.list(path)
-            except Exception:
-                try:
-                    self.webdav.mkdir(path)
-                except Exception:
-                    pass
\ No newline at end of file
+        paths = ['/' + '/'.join(parts[:i + 1]) for i in range(len(parts))]
+        if self._dir_known(paths[-1]):
+            return
+        for path in paths:
+            if self._dir_known(path):
+                continue
+            with self._dir_lock(path):
+                # another upload may have created it while we waited
+                if self._dir_known(path):
+                    continue
+                if self.webdav.mkdir(path):
+                    self._remember_dir(path)
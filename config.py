@@ -26,13 +26,61 @@ class Config:
     # Optional integrations. Provide via environment variables when available.
     YANDEX_TOKEN = os.environ.get('YANDEX_TOKEN') or ''
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or ''
+    # Optional OpenAI-compatible endpoint (e.g. a local stand-in for testing)
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or ''
+    OPENAI_MODEL = os.environ.get('OPENAI_MODEL') or 'gpt-3.5-turbo'
+    # Cache of model responses keyed by (model, prompt, temperature): SQLite file, TTL and size cap
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH') or str(_INSTANCE_DIR / 'ai_cache.db')
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 30 * 24 * 60 * 60))
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 5000))
+    # Long submissions are analysed in chunks of this many characters, several chunks at a time
+    AI_CHUNK_CHARS = int(os.environ.get('AI_CHUNK_CHARS', 6000))
+    AI_CHUNK_CONCURRENCY = int(os.environ.get('AI_CHUNK_CONCURRENCY', 4))
+    # Parallel model requests in a batch AI check
+    AI_BATCH_CONCURRENCY = int(os.environ.get('AI_BATCH_CONCURRENCY', 4))
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    # Resumable uploads of larger files: part size (must stay below MAX_CONTENT_LENGTH),
+    # where parts are assembled and how long an abandoned upload is kept (seconds)
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_SESSION_DIR = os.environ.get('UPLOAD_SESSION_DIR') or os.path.join('uploads', '__sessions__')
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 60 * 60))
+    # Thumbnail cache for cloud file previews (directory and size cap in MB)
+    THUMBNAIL_CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR') or str(_INSTANCE_DIR / 'thumbnails')
+    THUMBNAIL_CACHE_MAX_MB = int(os.environ.get('THUMBNAIL_CACHE_MAX_MB', 200))
     # WebDAV (Mail.ru Cloud) settings
     WEBDAV_URL = os.environ.get('WEBDAV_URL') or 'https://webdav.cloud.mail.ru'
     WEBDAV_LOGIN = os.environ.get('WEBDAV_LOGIN') or ''
     WEBDAV_PASSWORD = os.environ.get('WEBDAV_PASSWORD') or ''
     WEBDAV_ROOT_PATH = os.environ.get('WEBDAV_ROOT_PATH') or '/'
+    # How long a remote directory seen in a listing or created by an upload is trusted (seconds)
+    WEBDAV_DIR_CACHE_TTL = int(os.environ.get('WEBDAV_DIR_CACHE_TTL', 300))
+    # Cloud metadata index: background re-crawl interval (seconds) and parallel PROPFIND requests
+    CLOUD_INDEX_INTERVAL = int(os.environ.get('CLOUD_INDEX_INTERVAL', 600))
+    CLOUD_INDEX_WORKERS = int(os.environ.get('CLOUD_INDEX_WORKERS', 4))
+    # Parallel cloud downloads when zipping a group's submissions
+    SUBMISSIONS_ZIP_WORKERS = int(os.environ.get('SUBMISSIONS_ZIP_WORKERS', 4))
+    # Near-duplicate search: minimum estimated similarity (0..1) and parallel downloads for hashing
+    SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.5))
+    SIMILARITY_WORKERS = int(os.environ.get('SIMILARITY_WORKERS', 4))
+    # Local cache of files downloaded from the cloud (directory and size cap in MB)
+    DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR') or str(_INSTANCE_DIR / 'download_cache')
+    DOWNLOAD_CACHE_MAX_MB = int(os.environ.get('DOWNLOAD_CACHE_MAX_MB', 500))
+    # Upper bound on the age of cached dashboard counters (they are also reset on writes)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+    # Mail header cache: background resync interval (seconds) and size of the first sync
+    MAIL_SYNC_INTERVAL = int(os.environ.get('MAIL_SYNC_INTERVAL', 120))
+    MAIL_CACHE_INITIAL_LIMIT = int(os.environ.get('MAIL_CACHE_INITIAL_LIMIT', 1000))
+    # Pooled IMAP/SMTP connections per mailbox and optional IMAP IDLE push
+    MAIL_POOL_MAX_IDLE = int(os.environ.get('MAIL_POOL_MAX_IDLE', 2))
+    MAIL_POOL_IDLE_TIMEOUT = int(os.environ.get('MAIL_POOL_IDLE_TIMEOUT', 300))
+    MAIL_IDLE_ENABLED = os.environ.get('MAIL_IDLE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    MAIL_IDLE_TTL = int(os.environ.get('MAIL_IDLE_TTL', 600))
+    # Group mailings: messages per second over the shared SMTP session
+    MAIL_BULK_RATE = float(os.environ.get('MAIL_BULK_RATE', 2))
+    # Allow SMTP login without TLS when the server offers no STARTTLS (local test relays only)
+    MAIL_SMTP_ALLOW_PLAINTEXT = os.environ.get('MAIL_SMTP_ALLOW_PLAINTEXT', '').lower() in ('1', 'true', 'yes')
  
     # GitHub webhook / deployment settings (for PythonAnywhere)
     GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET') or ''
@@ -45,3 +93,5 @@ class Config:
     # Telegram Bot settings
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN') or ''
     TELEGRAM_WEBHOOK_URL = os.environ.get('TELEGRAM_WEBHOOK_URL') or ''
+    # Size of the thread pool used for bot database queries
+    TELEGRAM_DB_WORKERS = int(os.environ.get('TELEGRAM_DB_WORKERS', 4))
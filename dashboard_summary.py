@@ -0,0 +1,154 @@
+"""
+Счетчики главной страницы преподавателя (группы, студенты, занятия, задания,
+непроверенные работы).
+
+Все счетчики считаются одним SELECT со скалярными подзапросами и хранятся в
+памяти процесса по teacher_id, поэтому повторные открытия главной страницы
+не обращаются к БД. Сводка сбрасывается слушателями сессии SQLAlchemy после
+коммита, затронувшего Group, Student, Lesson или Assignment преподавателя;
+массовые ORM-операции (insert()/update()/delete() и Query.delete()) по этим
+моделям сбрасывают сводки всех преподавателей. DASHBOARD_CACHE_TTL
+ограничивает возраст сводки, если запись прошла мимо этого процесса
+(другой воркер, скрипт, бот).
+"""
+
+import threading
+import time
+from typing import Dict, Set
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from models import db, Group, Student, Lesson, Assignment
+
+_TEACHERS_INFO = 'dashboard_summary_teachers'
+_ALL_INFO = 'dashboard_summary_all'
+_WATCHED = (Group, Student, Lesson, Assignment)
+
+_cache: Dict[int, tuple] = {}
+_generation = 0  # растет при каждом сбросе: сводку, посчитанную до сброса, не сохраняем
+_lock = threading.Lock()
+_listeners_registered = False
+
+
+def _compute(teacher_id: int) -> dict:
+    groups = select(func.count(Group.id)).where(Group.teacher_id == teacher_id).scalar_subquery()
+    students = select(func.count(Student.id)).join(Group, Student.group_id == Group.id).where(
+        Group.teacher_id == teacher_id
+    ).scalar_subquery()
+    lessons = select(func.count(Lesson.id)).where(Lesson.teacher_id == teacher_id).scalar_subquery()
+    assignments = select(func.count(Assignment.id)).where(Assignment.teacher_id == teacher_id).scalar_subquery()
+    unchecked = select(func.count(Assignment.id)).where(
+        Assignment.teacher_id == teacher_id,
+        Assignment.checked_at == None
+    ).scalar_subquery()
+
+    row = db.session.execute(select(groups, students, lessons, assignments, unchecked)).one()
+    return {
+        'groups': row[0],
+        'students': row[1],
+        'lessons': row[2],
+        'assignments': row[3],
+        'unchecked': row[4]
+    }
+
+
+def get_summary(teacher_id: int) -> dict:
+    """Счетчики преподавателя: из памяти или одним запросом к БД."""
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 300)
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(teacher_id)
+        generation = _generation
+    if cached is not None and now - cached[0] < ttl:
+        return dict(cached[1])
+
+    summary = _compute(teacher_id)
+    with _lock:
+        if generation == _generation:
+            _cache[teacher_id] = (now, summary)
+    return dict(summary)
+
+
+def invalidate(teacher_id: int = None):
+    """Сбрасывает сводку преподавателя (без аргумента — всех)."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if teacher_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(teacher_id, None)
+
+
+# ============================================================================
+# Инвалидация по событиям сессии
+# ============================================================================
+
+def _group_teachers(session, group_ids: Set[int]) -> Set[int]:
+    if not group_ids:
+        return set()
+    t = Group.__table__
+    rows = session.connection().execute(
+        select(t.c.teacher_id).where(t.c.id.in_(list(group_ids)))
+    ).all()
+    return {teacher_id for (teacher_id,) in rows if teacher_id}
+
+
+def _before_flush(session, flush_context, instances):
+    teachers = session.info.setdefault(_TEACHERS_INFO, set())
+    group_ids = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, _WATCHED):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Student):
+            # Студент мог перейти в группу другого преподавателя: учитываем обе
+            if obj.group_id:
+                group_ids.add(obj.group_id)
+            history = inspect(obj).attrs.group_id.history
+            group_ids.update(g for g in history.deleted or () if g)
+        else:
+            if obj.teacher_id:
+                teachers.add(obj.teacher_id)
+            history = inspect(obj).attrs.teacher_id.history
+            teachers.update(t for t in history.deleted or () if t)
+
+    teachers.update(_group_teachers(session, group_ids))
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _WATCHED:
+        orm_execute_state.session.info[_ALL_INFO] = True
+
+
+def _after_commit(session):
+    teachers = session.info.pop(_TEACHERS_INFO, set())
+    if session.info.pop(_ALL_INFO, False):
+        invalidate()
+        return
+    for teacher_id in teachers:
+        invalidate(teacher_id)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_TEACHERS_INFO, None)
+    session.info.pop(_ALL_INFO, None)
+
+
+def register_summary_listeners():
+    """Подключает сброс сводок к записи Group/Student/Lesson/Assignment."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_rollback)
+    _listeners_registered = True
@@ -0,0 +1,153 @@
+"""
+Дисковый кэш с ограничением объема и вытеснением давно не использованных
+записей (LRU по времени последнего обращения).
+
+Записи пишутся во временный файл и атомарно переименовываются, поэтому
+параллельный запрос никогда не увидит недописанный файл. fill() не дает
+нескольким запросам одновременно скачивать одну и ту же запись: первый
+скачивает, остальные ждут его результата.
+
+Путь, выданный get_path()/fill(), еще не открыт вызывающим кодом, поэтому
+вытеснение не трогает записи, к которым обращались последние
+RECENT_USE_SECONDS секунд.
+"""
+
+import os
+import threading
+import time
+
+RECENT_USE_SECONDS = 30
+
+
+class DiskLRUCache:
+    """Файловый кэш в directory общим объемом не более max_bytes. Потокобезопасен."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+        self._filling = {}
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get_path(self, key):
+        """Путь к записи или None; обращение продлевает жизнь записи."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def get(self, key):
+        """Содержимое записи или None."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        self._store(key, lambda f: f.write(data))
+
+    def fill(self, key, writer):
+        """Путь к записи; при промахе writer(fileobj) записывает содержимое.
+
+        Параллельные промахи по одному ключу выполняют writer один раз.
+        """
+        path = self.get_path(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            event = self._filling.get(key)
+            owner = event is None
+            if owner:
+                event = self._filling[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            path = self.get_path(key)
+            if path is not None:
+                return path
+            # Загрузка у первого запроса не удалась — пробуем сами
+            return self.fill(key, writer)
+
+        try:
+            self._store(key, writer)
+            return self.path_for(key)
+        finally:
+            with self._lock:
+                self._filling.pop(key, None)
+            event.set()
+
+    def _store(self, key, writer):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                writer(f)
+            with self._lock:
+                # Запись могла уже быть (перезапись): учитываем только разницу в размере
+                try:
+                    previous = os.path.getsize(path)
+                except OSError:
+                    previous = 0
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+                if self._total is None:
+                    self._total = self._scan_total()
+                else:
+                    self._total += size - previous
+                if self._total > self.max_bytes:
+                    self._evict(keep=path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, keep=None):
+        """Удаляет самые старые записи, пока кэш не сократится до 90% лимита.
+
+        keep — только что записанный файл: его не трогаем, даже если он один
+        больше лимита (его сейчас отдают клиенту). Недавно выданные записи
+        тоже пропускаются: их путь мог еще не дойти до send_file.
+        """
+        target = self.max_bytes * 0.9
+        recent = time.time() - RECENT_USE_SECONDS
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            if path == keep or mtime >= recent:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total = total
@@ -1,20 +1,35 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
+import codecs
 import mimetypes
 from datetime import datetime
 import secrets
-from urllib.parse import urlencode
+from urllib.parse import urlencode, quote
 import json
 import requests
 from models import db, CloudSettings, CloudCategory
+from yandex_client import get_client, PAGE_SIZE
+from thumbnails import (
+    Image, PREVIEW_SIZES, DEFAULT_PREVIEW_SIZE, MAX_SOURCE_BYTES, ThumbnailCache,
+    get_cache, resize_image, detect_mime
+)
+from upload_sessions import (
+    UploadSessionError, SizedStream, stream_size, create_session, get_session,
+    session_status, append_chunk, open_assembled, discard_session
+)
 
 docs_bp = Blueprint('docs', __name__, url_prefix='/docs')
 
 # Yandex Disk API конфигурация
 YANDEX_API_BASE = 'https://cloud-api.yandex.net/v1/disk'
 YANDEX_OAUTH_BASE = 'https://oauth.yandex.ru'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Просмотр текстового файла показывает не больше этого числа байт
+VIEW_TEXT_MAX_BYTES = 1024 * 1024
+# Заголовки ответа хранилища, которые передаются клиенту при потоковом скачивании
+PASSTHROUGH_HEADERS = ('Content-Length', 'Content-Range', 'Content-Encoding', 'Accept-Ranges', 'ETag', 'Last-Modified')
 
 def allowed_file(filename):
     """Проверяет, разрешен ли тип файла"""
@@ -69,54 +84,47 @@ def format_file_size(size_bytes):
     return f"{size_bytes:.1f} {size_names[i]}"
 
 def make_yandex_request(settings, method, endpoint, **kwargs):
-    """Выполнение запроса к Yandex Disk API"""
-    headers = kwargs.get('headers', {})
-    headers.update({
-        'Authorization': f'OAuth {settings.access_token}',
-        'Accept': 'application/json'
-    })
-    kwargs['headers'] = headers
-    
-    url = f"{YANDEX_API_BASE}{endpoint}"
-    response = requests.request(method, url, **kwargs)
-    
-    return response
+    """Выполнение запроса к Yandex Disk API (через пул соединений преподавателя)"""
+    return get_client(settings).request(method, endpoint, **kwargs)
 
-def get_yandex_files(settings, path='/'):
-    """Получение списка файлов из Yandex Disk"""
+def get_yandex_files(settings, path='/', offset=0, limit=None, sort=None):
+    """Получение списка файлов из Yandex Disk
+
+    Без limit возвращается вся папка; с limit/offset — одна страница
+    (для очень больших папок). Листинги кэшируются в yandex_client.
+    """
     try:
-        params = {
-            'path': path,
-            'limit': 1000
-        }
-        
-        response = make_yandex_request(settings, 'GET', '/resources', params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            files = []
-            
-            if '_embedded' in data and 'items' in data['_embedded']:
-                for item in data['_embedded']['items']:
-                    file_info = {
-                        'name': item.get('name', ''),
-                        'path': item.get('path', ''),
-                        'type': 'dir' if item.get('type') == 'dir' else 'file',
-                        'size': item.get('size', 0),
-                        'size_formatted': format_file_size(item.get('size', 0)) if item.get('type') != 'dir' else '',
-                        'modified': item.get('modified', ''),
-                        'icon': get_file_icon(item.get('name', '')) if item.get('type') != 'dir' else 'bi-folder-fill',
-                        'mime_type': item.get('mime_type', 'application/octet-stream')
-                    }
-                    files.append(file_info)
-            
-            return jsonify({'files': files})
-        else:
-            return jsonify({
-                'error': f'Ошибка API Yandex Disk: {response.status_code}',
-                'files': []
-            })
-            
+        listing = get_client(settings).list_folder(path, offset=offset, limit=limit, sort=sort)
+
+        files = []
+        for item in listing['items']:
+            file_info = {
+                'name': item.get('name', ''),
+                'path': item.get('path', ''),
+                'type': 'dir' if item.get('type') == 'dir' else 'file',
+                'size': item.get('size', 0),
+                'size_formatted': format_file_size(item.get('size', 0)) if item.get('type') != 'dir' else '',
+                'modified': item.get('modified', ''),
+                'md5': item.get('md5', ''),
+                'icon': get_file_icon(item.get('name', '')) if item.get('type') != 'dir' else 'bi-folder-fill',
+                'mime_type': item.get('mime_type', 'application/octet-stream')
+            }
+            files.append(file_info)
+
+        total = listing['total']
+        return jsonify({
+            'files': files,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'has_more': offset + len(files) < total
+        })
+
+    except requests.exceptions.HTTPError as e:
+        return jsonify({
+            'error': f'Ошибка API Yandex Disk: {e.response.status_code}',
+            'files': []
+        })
     except requests.exceptions.RequestException as e:
         return jsonify({
             'error': f'Ошибка подключения к Yandex Disk: {str(e)}',
@@ -128,8 +136,12 @@ def get_yandex_files(settings, path='/'):
             'files': []
         })
 
-def upload_to_yandex(settings, file_data, filename, path):
-    """Загрузка файла в Yandex Disk"""
+def upload_to_yandex(settings, stream, filename, path, size=None):
+    """Загрузка файла в Yandex Disk.
+
+    stream — файлоподобный объект; тело PUT читается из него блоками, поэтому
+    файл не загружается в память целиком.
+    """
     try:
         # Получаем URL для загрузки
         upload_params = {
@@ -144,10 +156,13 @@ def upload_to_yandex(settings, file_data, filename, path):
             upload_url = upload_data.get('href')
             
             if upload_url:
-                # Загружаем файл
-                upload_response = requests.put(upload_url, data=file_data, timeout=60)
+                # Загружаем файл потоком
+                if size is None:
+                    size = stream_size(stream)
+                upload_response = get_client(settings).put(upload_url, data=SizedStream(stream, size))
                 
                 if upload_response.status_code in [200, 201]:
+                    get_client(settings).invalidate(path)
                     return {
                         'success': True,
                         'message': f'Файл {filename} успешно загружен в Yandex Disk'
@@ -174,50 +189,117 @@ def upload_to_yandex(settings, file_data, filename, path):
             'error': f'Ошибка загрузки в Yandex Disk: {str(e)}'
         }
 
-def download_from_yandex(settings, path):
-    """Получение ссылки для скачивания файла из Yandex Disk"""
-    try:
-        params = {
-            'path': path
-        }
-        
-        response = make_yandex_request(settings, 'GET', '/resources/download', params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            download_url = data.get('href')
-            
-            if download_url:
-                # Получаем файл по ссылке
-                file_response = requests.get(download_url, timeout=60)
-                
-                if file_response.status_code == 200:
-                    return {
-                        'success': True,
-                        'content': file_response.content,
-                        'content_type': file_response.headers.get('content-type', 'application/octet-stream')
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': f'Ошибка скачивания файла: {file_response.status_code}'
-                    }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Не удалось получить ссылку для скачивания'
-                }
-        else:
-            return {
-                'success': False,
-                'error': f'Ошибка получения ссылки скачивания: {response.status_code}'
-            }
-            
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'Ошибка скачивания из Yandex Disk: {str(e)}'
-        }
+def get_yandex_download_url(settings, path):
+    """Ссылка на скачивание файла (href) или None"""
+    response = make_yandex_request(settings, 'GET', '/resources/download', params={'path': path})
+    if response.status_code != 200:
+        return None
+    return response.json().get('href')
+
+def stream_from_yandex(settings, path, range_header=None):
+    """Открывает потоковое скачивание файла из Yandex Disk.
+
+    Возвращает ответ requests с stream=True (тело читается по частям);
+    заголовок Range передается хранилищу как есть. Сжатие ответа не
+    запрашивается: Content-Length и Content-Range должны описывать те же
+    байты, что получит клиент, иначе докачка по Range ломается.
+    """
+    download_url = get_yandex_download_url(settings, path)
+    if not download_url:
+        return None
+    headers = {'Accept-Encoding': 'identity'}
+    if range_header:
+        headers['Range'] = range_header
+    return get_client(settings).get(download_url, headers=headers, stream=True)
+
+def content_disposition(filename, inline=False):
+    """Content-Disposition с поддержкой кириллицы (RFC 5987)"""
+    disposition = 'inline' if inline else 'attachment'
+    fallback = secure_filename(filename) or 'download'
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+def streaming_response(upstream, filename, inline=False):
+    """Flask-ответ, который передает тело upstream клиенту по частям"""
+    def generate():
+        try:
+            # Тело передается без распаковки: если хранилище все же сжало ответ,
+            # клиент получит его вместе с Content-Encoding и длинами сжатых байт
+            for chunk in upstream.raw.stream(DOWNLOAD_CHUNK_SIZE, decode_content=False):
+                if chunk:
+                    yield chunk
+        finally:
+            upstream.close()
+
+    headers = {name: upstream.headers[name] for name in PASSTHROUGH_HEADERS if name in upstream.headers}
+    headers.setdefault('Accept-Ranges', 'bytes')
+    headers['Content-Disposition'] = content_disposition(filename, inline)
+    content_type = upstream.headers.get('Content-Type') or 'application/octet-stream'
+    if content_type == 'application/octet-stream':
+        # Хранилище часто отдает octet-stream — уточняем тип по расширению для просмотра inline
+        content_type = mimetypes.guess_type(filename)[0] or content_type
+    return Response(
+        stream_with_context(generate()),
+        status=upstream.status_code,
+        headers=headers,
+        content_type=content_type,
+        direct_passthrough=True
+    )
+
+def get_yandex_preview(settings, path, size_key, modified=None):
+    """Миниатюра файла: (bytes, mime, modified) или None, если превью недоступно.
+
+    Сначала проверяется дисковый кэш (если время изменения известно из
+    листинга — без единого запроса к API), затем превью Yandex Disk, затем
+    уменьшение оригинала через Pillow.
+    """
+    cache = get_cache()
+    max_side = PREVIEW_SIZES[size_key]
+    
+    if modified:
+        data = cache.get(ThumbnailCache.make_key(settings.teacher_id, path, modified, size_key))
+        if data is not None:
+            return data, detect_mime(data), modified
+    
+    response = make_yandex_request(settings, 'GET', '/resources', params={
+        'path': path,
+        'fields': 'modified,mime_type,size,type,preview',
+        'preview_size': f'{max_side}x{max_side}',
+        'preview_crop': 'false'
+    })
+    response.raise_for_status()
+    meta = response.json()
+    if meta.get('type') == 'dir':
+        return None
+    
+    modified = meta.get('modified', '')
+    key = ThumbnailCache.make_key(settings.teacher_id, path, modified, size_key)
+    data = cache.get(key)
+    if data is not None:
+        return data, detect_mime(data), modified
+    
+    data = mime = None
+    if meta.get('preview'):
+        # Ссылка на превью требует того же OAuth-токена
+        preview = get_client(settings).get(meta['preview'], headers={'Authorization': f'OAuth {settings.access_token}'})
+        if preview.status_code == 200 and preview.content:
+            data = preview.content
+            mime = preview.headers.get('Content-Type') or detect_mime(data)
+    
+    if data is None and Image is not None and (meta.get('mime_type') or '').startswith('image/') \
+            and (meta.get('size') or 0) <= MAX_SOURCE_BYTES:
+        upstream = stream_from_yandex(settings, path)
+        if upstream is not None and upstream.status_code == 200:
+            try:
+                data, mime = resize_image(upstream.content, max_side)
+            except Exception:
+                data = None
+            finally:
+                upstream.close()
+    
+    if data is None:
+        return None
+    cache.put(key, data)
+    return data, mime, modified
 
 def delete_from_yandex(settings, path):
     """Удаление файла из Yandex Disk"""
@@ -230,6 +312,7 @@ def delete_from_yandex(settings, path):
         response = make_yandex_request(settings, 'DELETE', '/resources', params=params)
         
         if response.status_code in [200, 202, 204]:
+            get_client(settings).invalidate(path)
             return {
                 'success': True,
                 'message': 'Файл успешно удален из Yandex Disk'
@@ -405,6 +488,11 @@ def test_yandex_connection():
 def get_yandex_files_api():
     """Получение списка файлов из Yandex Disk"""
     path = request.args.get('path', '/')
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), PAGE_SIZE)
+    sort = request.args.get('sort') or None
     
     # Получаем настройки
     settings = CloudSettings.query.filter_by(
@@ -415,7 +503,7 @@ def get_yandex_files_api():
     if not settings:
         return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
     
-    return get_yandex_files(settings, path)
+    return get_yandex_files(settings, path, offset=offset, limit=limit, sort=sort)
 
 @docs_bp.route('/api/yandex/upload', methods=['POST'])
 @login_required
@@ -443,10 +531,8 @@ def upload_to_yandex_api():
         return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
     
     try:
-        # Читаем данные файла
-        file_data = file.read()
-        
-        result = upload_to_yandex(settings, file_data, file.filename, path)
+        size = stream_size(file.stream)
+        result = upload_to_yandex(settings, file.stream, file.filename, path, size)
         
         if result['success']:
             return jsonify({
@@ -454,8 +540,8 @@ def upload_to_yandex_api():
                 'message': result['message'],
                 'file': {
                     'name': file.filename,
-                    'size': len(file_data),
-                    'size_formatted': format_file_size(len(file_data)),
+                    'size': size,
+                    'size_formatted': format_file_size(size),
                     'path': f"{path.rstrip('/')}/{file.filename}"
                 }
             })
@@ -464,10 +550,91 @@ def upload_to_yandex_api():
     except Exception as e:
         return jsonify({'error': f'Ошибка загрузки: {str(e)}'}), 500
 
+# Загрузка больших файлов частями (см. upload_sessions)
+
+@docs_bp.route('/api/yandex/upload/session', methods=['POST'])
+@login_required
+def create_yandex_upload_session():
+    """Открывает сессию загрузки файла частями"""
+    data = request.get_json(silent=True) or {}
+    filename = (data.get('filename') or '').replace('\\', '/').split('/')[-1].strip()
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Недопустимый тип файла'}), 400
+    
+    settings = CloudSettings.query.filter_by(
+        teacher_id=current_user.id,
+        is_active=True
+    ).first()
+    
+    if not settings:
+        return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
+    
+    try:
+        upload = create_session(current_user.id, 'yandex', filename, data.get('size'), data.get('path') or '/')
+    except (UploadSessionError, ValueError) as e:
+        return jsonify({'error': str(e)}), getattr(e, 'status', 400)
+    
+    return jsonify(session_status(upload)), 201
+
+@docs_bp.route('/api/yandex/upload/session/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@login_required
+def yandex_upload_session(upload_id):
+    """Состояние сессии (GET), очередная часть файла (PUT) или отмена (DELETE)"""
+    try:
+        upload = get_session(upload_id, current_user.id, 'yandex')
+        
+        if request.method == 'GET':
+            return jsonify(session_status(upload))
+        
+        if request.method == 'DELETE':
+            discard_session(upload)
+            return jsonify({'success': True})
+        
+        status = session_status(upload)
+        if not status['complete']:
+            append_chunk(upload, request.stream, request.headers.get('Content-Range'))
+            status = session_status(upload)
+    except UploadSessionError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    
+    if not status['complete']:
+        return jsonify(status)
+    
+    # Файл собран — отправляем его в Yandex Disk одним потоковым запросом
+    settings = CloudSettings.query.filter_by(
+        teacher_id=current_user.id,
+        is_active=True
+    ).first()
+    
+    if not settings:
+        return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
+    
+    path = upload['target']
+    with open_assembled(upload) as stream:
+        result = upload_to_yandex(settings, stream, upload['filename'], path, upload['size'])
+    
+    if not result['success']:
+        # Файл остается на диске: отправку можно повторить PUT без тела
+        return jsonify({'error': result['error']}), 502
+    
+    discard_session(upload)
+    return jsonify({
+        'success': True,
+        'complete': True,
+        'message': result['message'],
+        'file': {
+            'name': upload['filename'],
+            'size': upload['size'],
+            'size_formatted': format_file_size(upload['size']),
+            'path': f"{path.rstrip('/')}/{upload['filename']}"
+        }
+    })
+
 @docs_bp.route('/api/yandex/download')
 @login_required
 def download_from_yandex_api():
-    """Скачивание файла из Yandex Disk"""
+    """Потоковое скачивание файла из Yandex Disk (с поддержкой Range)"""
     path = request.args.get('path')
     
     if not path:
@@ -483,18 +650,17 @@ def download_from_yandex_api():
         return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
     
     try:
-        result = download_from_yandex(settings, path)
+        upstream = stream_from_yandex(settings, path, request.headers.get('Range'))
+        if upstream is None:
+            return jsonify({'error': 'Не удалось получить ссылку для скачивания'}), 500
         
-        if result['success']:
-            filename = path.split('/')[-1]
-            return send_file(
-                io.BytesIO(result['content']),
-                as_attachment=True,
-                download_name=filename,
-                mimetype=result['content_type']
-            )
-        else:
-            return jsonify({'error': result['error']}), 500
+        if upstream.status_code not in (200, 206, 416):
+            upstream.close()
+            return jsonify({'error': f'Ошибка скачивания файла: {upstream.status_code}'}), 500
+        
+        filename = path.rstrip('/').split('/')[-1]
+        # inline=1 — для воспроизведения видео/аудио прямо в браузере
+        return streaming_response(upstream, filename, inline=request.args.get('inline') == '1')
     except Exception as e:
         return jsonify({'error': f'Ошибка скачивания: {str(e)}'}), 500
 
@@ -517,46 +683,116 @@ def view_yandex_file():
         return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
     
     try:
-        result = download_from_yandex(settings, path)
+        # Тип и размер — из метаданных Disk, чтобы не скачивать файл, который не будет показан
+        response = make_yandex_request(settings, 'GET', '/resources', params={
+            'path': path,
+            'fields': 'type,mime_type,size'
+        })
+        if response.status_code != 200:
+            return jsonify({'error': f'Ошибка получения сведений о файле: {response.status_code}'}), 500
+        meta = response.json()
+        content_type = meta.get('mime_type') or mimetypes.guess_type(path)[0] or 'application/octet-stream'
         
-        if result['success']:
-            content_type = result['content_type']
-            content = result['content']
-            
-            # Для текстовых файлов декодируем содержимое
-            if content_type.startswith('text/') or path.endswith('.txt') or path.endswith('.md'):
-                try:
-                    text_content = content.decode('utf-8')
-                    return jsonify({
-                        'success': True,
-                        'content': text_content,
-                        'type': content_type
-                    })
-                except UnicodeDecodeError:
-                    return jsonify({
-                        'success': True,
-                        'content': 'Файл содержит нечитаемые символы',
-                        'type': 'text/plain'
-                    })
-            # Для изображений возвращаем base64
-            elif content_type.startswith('image/'):
-                import base64
-                base64_content = base64.b64encode(content).decode('utf-8')
-                return jsonify({
-                    'success': True,
-                    'content': f"data:{content_type};base64,{base64_content}",
-                    'type': content_type
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Предварительный просмотр недоступен для данного типа файла'
-                })
-        else:
-            return jsonify({'error': result['error']}), 500
+        # Изображения показываются через /api/yandex/preview: браузер кэширует бинарный ответ
+        if content_type.startswith('image/'):
+            return jsonify({
+                'success': True,
+                'content': url_for('docs.yandex_preview', path=path, size='xl'),
+                'type': content_type
+            })
+        
+        if meta.get('type') == 'dir' or not (
+            content_type.startswith('text/') or path.endswith('.txt') or path.endswith('.md')
+        ):
+            return jsonify({
+                'success': False,
+                'error': 'Предварительный просмотр недоступен для данного типа файла'
+            })
+        
+        # Текст: читается только начало файла (не больше VIEW_TEXT_MAX_BYTES)
+        upstream = stream_from_yandex(settings, path, f'bytes=0-{VIEW_TEXT_MAX_BYTES - 1}')
+        if upstream is None:
+            return jsonify({'error': 'Не удалось получить ссылку для скачивания'}), 500
+        try:
+            if upstream.status_code not in (200, 206):
+                return jsonify({'error': f'Ошибка скачивания файла: {upstream.status_code}'}), 500
+            content = bytearray()
+            for chunk in upstream.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                content += chunk
+                if len(content) >= VIEW_TEXT_MAX_BYTES:
+                    break
+        finally:
+            upstream.close()
+        content = bytes(content[:VIEW_TEXT_MAX_BYTES])
+        truncated = (meta.get('size') or 0) > len(content)
+        
+        try:
+            # Обрезанный на середине символа хвост не считается ошибкой
+            text_content = codecs.getincrementaldecoder('utf-8')().decode(content, final=not truncated)
+        except UnicodeDecodeError:
+            return jsonify({
+                'success': True,
+                'content': 'Файл содержит нечитаемые символы',
+                'type': 'text/plain'
+            })
+        if truncated:
+            text_content += f'\n\n… показаны первые {VIEW_TEXT_MAX_BYTES // 1024} КБ файла, скачайте его целиком'
+        return jsonify({
+            'success': True,
+            'content': text_content,
+            'type': content_type if content_type.startswith('text/') else 'text/plain',
+            'truncated': truncated
+        })
     except Exception as e:
         return jsonify({'error': f'Ошибка просмотра файла: {str(e)}'}), 500
 
+@docs_bp.route('/api/yandex/preview')
+@login_required
+def yandex_preview():
+    """Миниатюра файла (size: s, m, l, xl).
+
+    Параметр v — время изменения файла из листинга: с ним ответ кэшируется
+    браузером навсегда, так как новая версия файла получит другой URL.
+    """
+    path = request.args.get('path')
+    size_key = request.args.get('size', DEFAULT_PREVIEW_SIZE)
+    version = request.args.get('v')
+    
+    if not path:
+        return jsonify({'error': 'Путь к файлу не указан'}), 400
+    if size_key not in PREVIEW_SIZES:
+        return jsonify({'error': 'Недопустимый размер превью'}), 400
+    
+    settings = CloudSettings.query.filter_by(
+        teacher_id=current_user.id,
+        is_active=True
+    ).first()
+    
+    if not settings:
+        return jsonify({'error': 'Настройки Yandex Disk не найдены'}), 400
+    
+    if version:
+        etag = ThumbnailCache.make_key(settings.teacher_id, path, version, size_key)
+        if etag in request.if_none_match:
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    try:
+        result = get_yandex_preview(settings, path, size_key, version)
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'Ошибка получения превью: {str(e)}'}), 502
+    
+    if result is None:
+        return jsonify({'error': 'Превью недоступно для данного файла'}), 404
+    
+    data, mime, modified = result
+    response = Response(data, mimetype=mime)
+    response.set_etag(ThumbnailCache.make_key(settings.teacher_id, path, modified, size_key))
+    if version and version == modified:
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
 @docs_bp.route('/api/yandex/delete', methods=['POST'])
 @login_required
 def delete_from_yandex_api():
@@ -648,6 +884,3 @@ def yandex_oauth_callback():
         flash(f'Ошибка запроса токена: {str(e)}', 'error')
     
     return redirect(url_for('docs.index'))
-
-# Добавляем импорт для BytesIO
-import io
\ No newline at end of file
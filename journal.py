@@ -48,16 +48,25 @@ def mark_attendance():
             lesson_id=lesson.id
         ).first()
 
-        if attendance:
-            attendance.present = present
-        else:
+        # Храним только явные отметки: None очищает ячейку
+        if present is None:
+            if attendance:
+                db.session.delete(attendance)
+            continue
+
+        if not attendance:
             attendance = Attendance(
                 student_id=student_id,
-                lesson_id=lesson.id,
-                present=present
+                lesson_id=lesson.id
             )
             db.session.add(attendance)
 
+        attendance.present = bool(present)
+        if not present:
+            attendance.attendance_mark = 'Н'
+        elif (attendance.attendance_mark or '').strip().upper() == 'Н':
+            attendance.attendance_mark = None
+
     db.session.commit()
     return jsonify({'status': 'success'})
 
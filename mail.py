@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models import db, EmailSettings, Teacher
-import imaplib
-import smtplib
+from models import db, EmailSettings, Teacher, Group, MailCampaign
+import mail_bulk
+import mail_cache
+import mail_pool
+import re
+import base64
+import binascii
 import email
+from datetime import datetime
 from email.header import decode_header
 from email.utils import parsedate_to_datetime, formataddr
 from email.mime.text import MIMEText
@@ -11,36 +16,47 @@ from email.mime.multipart import MIMEMultipart
 
 mail_bp = Blueprint('mail', __name__, url_prefix='/mail')
 
+# Для списка писем запрашиваем только нужные заголовки и начало тела
+LIST_HEADER_FIELDS = ('SUBJECT', 'FROM', 'DATE', 'CONTENT-TYPE', 'CONTENT-TRANSFER-ENCODING')
+SNIPPET_FETCH_BYTES = 2048
+SNIPPET_LENGTH = 140
+
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+_FETCH_SECTION_RE = re.compile(rb'BODY\[(HEADER\.FIELDS|TEXT)')
+
 
 def _get_email_settings():
     return EmailSettings.query.filter_by(teacher_id=current_user.id).first()
 
 
-def _imap_connect(settings):
-    if settings.imap_ssl:
-        client = imaplib.IMAP4_SSL(settings.imap_host, settings.imap_port)
-    else:
-        client = imaplib.IMAP4(settings.imap_host, settings.imap_port)
-    client.login(settings.username, settings.password)
-    return client
+def _mail_account(settings):
+    teacher = Teacher.query.get(settings.teacher_id)
+    return mail_pool.account_from_settings(settings, teacher.username if teacher else '')
 
 
-def _smtp_send(settings, to_email, subject, body):
+def _build_message(account, to_email, subject, body):
     msg = MIMEMultipart()
-    msg["From"] = formataddr((current_user.username, settings.email))
+    msg["From"] = formataddr((account.display_name, account.email))
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.attach(MIMEText(body, "plain", "utf-8"))
+    return msg
 
-    if settings.smtp_ssl:
-        server = smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port)
-    else:
-        server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-        server.starttls()
 
-    server.login(settings.username, settings.password)
-    server.send_message(msg)
-    server.quit()
+def _smtp_send(settings, to_email, subject, body):
+    account = _mail_account(settings)
+    # Соединение берется из пула: TLS и авторизация не повторяются для каждого письма
+    with mail_pool.get_pool().smtp(account) as server:
+        server.send_message(_build_message(account, to_email, subject, body))
+
+
+def _format_sync_time(value):
+    if not value:
+        return ''
+    # synced_at хранится в UTC, показываем локальное время сервера
+    local = value + (datetime.now() - datetime.utcnow())
+    return local.strftime('%d.%m %H:%M')
 
 
 def _decode_header_value(value):
@@ -56,6 +72,116 @@ def _decode_header_value(value):
     return "".join(decoded)
 
 
+def _parse_fetch_response(data):
+    """Разбирает ответ UID FETCH: {uid: {'HEADER.FIELDS': bytes, 'TEXT': bytes}}.
+
+    imaplib возвращает смесь кортежей (префикс, литерал) и байтовых строк;
+    UID может прийти как до, так и после литералов.
+    """
+    result = {}
+    current = None
+    uid = None
+
+    def flush():
+        if current is not None and uid is not None:
+            result[uid] = current
+
+    for item in data or []:
+        prefix = item[0] if isinstance(item, tuple) else item
+        if not isinstance(prefix, bytes):
+            continue
+        if isinstance(item, tuple) and _FETCH_START_RE.match(prefix):
+            flush()
+            current, uid = {}, None
+        if current is None:
+            continue
+        match = _FETCH_UID_RE.search(prefix)
+        if match:
+            uid = match.group(1)
+        if isinstance(item, tuple):
+            section = _FETCH_SECTION_RE.search(prefix)
+            if section:
+                current[section.group(1).decode()] = item[1] or b''
+    flush()
+    return result
+
+
+def _decode_partial_payload(part):
+    """Декодирует (возможно обрезанное) тело части письма."""
+    raw = part.get_payload(decode=False)
+    if isinstance(raw, list):
+        return ''
+    raw = raw.encode('ascii', errors='ignore') if isinstance(raw, str) else (raw or b'')
+    encoding = (part.get('Content-Transfer-Encoding') or '').strip().lower()
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        if encoding == 'base64':
+            # Тело обрезано на SNIPPET_FETCH_BYTES, берем только целые блоки base64
+            compact = re.sub(rb'[^A-Za-z0-9+/=]', b'', raw)
+            payload = base64.b64decode(compact[:len(compact) // 4 * 4])
+        else:
+            payload = part.get_payload(decode=True) or b''
+        return payload.decode(charset, errors='ignore')
+    except (binascii.Error, LookupError, ValueError):
+        return ''
+
+
+def _extract_snippet(msg):
+    snippet = ''
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == 'text/plain':
+                snippet = _decode_partial_payload(part)
+                break
+    else:
+        snippet = _decode_partial_payload(msg)
+
+    snippet = ' '.join((snippet or '').split())
+    if len(snippet) > SNIPPET_LENGTH:
+        snippet = snippet[:SNIPPET_LENGTH - 3] + '...'
+    return snippet
+
+
+def _build_summary(uid, header, text):
+    msg = email.message_from_bytes((header or b'') + (text or b''))
+    date = msg.get('Date')
+    try:
+        dt = parsedate_to_datetime(date) if date else None
+        time_str = dt.strftime('%d.%m %H:%M') if dt else ''
+    except Exception:
+        time_str = date or ''
+
+    return {
+        'id': uid.decode() if isinstance(uid, bytes) else str(uid),
+        'subject': _decode_header_value(msg.get('Subject')) or '(без темы)',
+        'sender': _decode_header_value(msg.get('From')),
+        'snippet': _extract_snippet(msg),
+        'time': time_str
+    }
+
+
+def _fetch_summaries(client, uids):
+    """Заголовки и начало текста для списка UID одним запросом FETCH."""
+    if not uids:
+        return []
+    uid_set = b','.join(uids).decode()
+    query = '(UID BODY.PEEK[HEADER.FIELDS ({})] BODY.PEEK[TEXT]<0.{}>)'.format(
+        ' '.join(LIST_HEADER_FIELDS), SNIPPET_FETCH_BYTES
+    )
+    typ, data = client.uid('FETCH', uid_set, query)
+    if typ != 'OK':
+        return []
+
+    parsed = _parse_fetch_response(data)
+    summaries = []
+    for uid in uids:
+        sections = parsed.get(uid)
+        if sections is None:
+            continue
+        summaries.append(_build_summary(uid, sections.get('HEADER.FIELDS'), sections.get('TEXT')))
+    return summaries
+
+
 @mail_bp.route('/')
 @login_required
 def index():
@@ -63,11 +189,12 @@ def index():
     teacher: Teacher = Teacher.query.get(current_user.id)
 
     if settings and settings.is_active:
+        state = mail_cache.get_state(current_user.id, 'INBOX')
         account_status = {
             'connected': True,
             'provider': settings.imap_host,
             'email': settings.email,
-            'last_sync': 'Подключено',
+            'last_sync': _format_sync_time(state.synced_at if state else None) or 'Подключено',
             'quota': ''
         }
     else:
@@ -79,7 +206,8 @@ def index():
             'quota': ''
         }
 
-    return render_template('mail.html', account_status=account_status)
+    groups = Group.query.filter_by(teacher_id=current_user.id).order_by(Group.name.asc()).all()
+    return render_template('mail.html', account_status=account_status, groups=groups)
 
 
 @mail_bp.route('/api/settings', methods=['GET', 'POST'])
@@ -123,6 +251,12 @@ def mail_settings():
     if not settings:
         settings = EmailSettings(teacher_id=current_user.id)
         db.session.add(settings)
+    elif (settings.username, settings.imap_host) != (data['username'], data.get('imap_host', 'imap.yandex.ru')):
+        # Другой ящик: кэш заголовков старого ящика больше не актуален
+        mail_cache.clear_cache(current_user.id)
+
+    mail_pool.get_pool().discard(current_user.id)
+    mail_pool.stop_watchers(current_user.id)
 
     settings.email = data['email']
     settings.username = data['username']
@@ -151,70 +285,62 @@ def list_messages():
         return jsonify({'error': 'Почта не настроена'}), 400
 
     mailbox = request.args.get('mailbox', 'INBOX')
-    limit = int(request.args.get('limit', 20))
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    search = (request.args.get('q') or '').strip()
+    refresh = request.args.get('refresh') == '1'
+
+    state = mail_cache.get_state(current_user.id, mailbox)
+    if state is None or state.synced_at is None:
+        # Первая загрузка папки: наполняем кэш сразу
+        try:
+            mail_cache.sync_mailbox(current_user.id, mailbox)
+        except Exception as e:
+            return jsonify({'error': f'Ошибка получения писем: {e}'}), 500
+        state = mail_cache.get_state(current_user.id, mailbox)
+    elif refresh or mail_cache.needs_sync(state):
+        mail_cache.request_sync(current_user.id, mailbox)
+
+    messages, total = mail_cache.list_cached(current_user.id, mailbox, limit, offset, search)
+    return jsonify({
+        'messages': messages,
+        'total': total,
+        'offset': offset,
+        'syncing': mail_cache.is_syncing(current_user.id, mailbox),
+        'synced_at': _format_sync_time(state.synced_at if state else None)
+    })
+
+
+@mail_bp.route('/api/status')
+@login_required
+def mail_status():
+    """Дешевый опрос новых писем: флаг IDLE-наблюдателя без обращения к серверу."""
+    settings = _get_email_settings()
+    if not settings or not settings.is_active:
+        return jsonify({'error': 'Почта не настроена'}), 400
+
+    mailbox = request.args.get('mailbox', 'INBOX')
+    state = mail_cache.get_state(current_user.id, mailbox)
+    synced_at = state.synced_at if state else None
 
-    try:
-        client = _imap_connect(settings)
-        client.select(mailbox)
-        typ, data = client.search(None, 'ALL')
-        if typ != 'OK':
-            client.logout()
-            return jsonify({'error': 'Не удалось получить список писем'}), 500
-
-        ids = data[0].split()
-        ids = ids[-limit:]
-        ids.reverse()
-
-        messages = []
-        for msg_id in ids:
-            typ, msg_data = client.fetch(msg_id, '(RFC822)')
-            if typ != 'OK':
-                continue
-            msg = email.message_from_bytes(msg_data[0][1])
-            subject = _decode_header_value(msg.get('Subject'))
-            sender = _decode_header_value(msg.get('From'))
-            date = msg.get('Date')
-            try:
-                dt = parsedate_to_datetime(date) if date else None
-                time_str = dt.strftime('%d.%m %H:%M') if dt else ''
-            except Exception:
-                time_str = date or ''
-
-            snippet = ''
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == 'text/plain':
-                        try:
-                            snippet = part.get_payload(decode=True).decode(
-                                part.get_content_charset() or 'utf-8', errors='ignore'
-                            )
-                        except Exception:
-                            snippet = ''
-                        break
-            else:
-                try:
-                    snippet = msg.get_payload(decode=True).decode(
-                        msg.get_content_charset() or 'utf-8', errors='ignore'
-                    )
-                except Exception:
-                    snippet = ''
-
-            snippet = (snippet or '').replace('\r', ' ').replace('\n', ' ')
-            if len(snippet) > 140:
-                snippet = snippet[:137] + '...'
-
-            messages.append({
-                'id': msg_id.decode(),
-                'subject': subject or '(без темы)',
-                'sender': sender,
-                'snippet': snippet,
-                'time': time_str
-            })
+    idle = False
+    new_mail = False
+    if current_app.config.get('MAIL_IDLE_ENABLED'):
+        watcher = mail_pool.ensure_watcher(_mail_account(settings), mailbox)
+        idle = watcher.supported
+        new_mail = bool(watcher.last_event and (synced_at is None or watcher.last_event > synced_at))
+    elif mail_cache.needs_sync(state):
+        new_mail = True
 
-        client.logout()
-        return jsonify({'messages': messages})
-    except Exception as e:
-        return jsonify({'error': f'Ошибка получения писем: {e}'}), 500
+    if new_mail:
+        mail_cache.request_sync(current_user.id, mailbox)
+
+    return jsonify({
+        'new_mail': new_mail,
+        'idle': idle,
+        'syncing': mail_cache.is_syncing(current_user.id, mailbox),
+        'synced_at': _format_sync_time(synced_at)
+    })
 
 
 @mail_bp.route('/api/send', methods=['POST'])
@@ -237,3 +363,33 @@ def send_message():
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': f'Ошибка отправки письма: {e}'}), 500
+
+
+@mail_bp.route('/api/group-mailing', methods=['POST'])
+@login_required
+def group_mailing():
+    """Рассылка персонализированных писем всем студентам группы (в фоне)."""
+    settings = _get_email_settings()
+    if not settings or not settings.is_active:
+        return jsonify({'error': 'Почта не настроена'}), 400
+
+    data = request.json or {}
+    subject = (data.get('subject') or '').strip()
+    body = data.get('body') or ''
+    if not subject or not body.strip():
+        return jsonify({'error': 'Укажите тему и текст письма'}), 400
+
+    group = Group.query.filter_by(id=data.get('group_id'), teacher_id=current_user.id).first()
+    if not group:
+        return jsonify({'error': 'Группа не найдена'}), 404
+
+    campaign = mail_bulk.create_campaign(current_user.id, group, subject, body)
+    mail_bulk.start_campaign(campaign.id)
+    return jsonify({'success': True, 'campaign': mail_bulk.campaign_status(campaign)}), 202
+
+
+@mail_bp.route('/api/group-mailing/<int:campaign_id>')
+@login_required
+def group_mailing_status(campaign_id):
+    campaign = MailCampaign.query.filter_by(id=campaign_id, teacher_id=current_user.id).first_or_404()
+    return jsonify(mail_bulk.campaign_status(campaign))
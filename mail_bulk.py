@@ -0,0 +1,177 @@
+"""
+Рассылка писем студентам группы.
+
+Адреса студентов выбираются одним запросом, для каждого получателя
+подставляются персональные поля шаблона ({name}, {first_name}, {group},
+{email}). Письма отправляются в фоновом потоке через одно SMTP-соединение
+из пула с ограничением скорости (MAIL_BULK_RATE писем в секунду); статус
+каждого получателя сохраняется в mail_campaign_recipient.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from mail_pool import get_pool
+from models import db, EmailSettings, Group, Student, MailCampaign, MailCampaignRecipient
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 10
+MAX_RECONNECTS = 3
+
+# Ошибки, относящиеся к одному письму: отмечаем получателя и продолжаем рассылку
+_RECIPIENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
+
+
+class _SafeDict(dict):
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def render_text(template, context):
+    """Подставляет поля получателя; неизвестные {поля} остаются как есть."""
+    try:
+        return template.format_map(_SafeDict(context))
+    except (ValueError, IndexError, AttributeError):
+        return template
+
+
+def _recipient_context(recipient, group_name):
+    name = recipient.name or ''
+    parts = name.split()
+    # ФИО: Фамилия Имя Отчество — обращаемся по имени
+    first_name = parts[1] if len(parts) > 1 else name
+    return {'name': name, 'first_name': first_name, 'group': group_name, 'email': recipient.email or ''}
+
+
+def create_campaign(teacher_id, group, subject, body):
+    """Создает рассылку и список получателей (студенты группы без email пропускаются)."""
+    students = db.session.query(Student.id, Student.name, Student.email).filter(
+        Student.group_id == group.id
+    ).order_by(Student.name.asc()).all()
+
+    campaign = MailCampaign(teacher_id=teacher_id, group_id=group.id, subject=subject, body=body)
+    for student_id, name, email in students:
+        email = (email or '').strip()
+        campaign.recipients.append(MailCampaignRecipient(
+            student_id=student_id,
+            name=name,
+            email=email,
+            status='pending' if email else 'skipped',
+            error=None if email else 'Не указан email'
+        ))
+    db.session.add(campaign)
+    db.session.commit()
+    return campaign
+
+
+def start_campaign(campaign_id):
+    """Запускает отправку рассылки в фоновом потоке."""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                run_campaign(campaign_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Mail campaign {campaign_id} failed: {e}")
+                campaign = MailCampaign.query.get(campaign_id)
+                if campaign:
+                    campaign.status = 'failed'
+                    campaign.error = str(e)[:500]
+                    campaign.finished_at = datetime.utcnow()
+                    db.session.commit()
+
+    threading.Thread(target=run, name=f'mail-campaign-{campaign_id}', daemon=True).start()
+
+
+def run_campaign(campaign_id):
+    from mail import _mail_account, _build_message
+
+    campaign = MailCampaign.query.get(campaign_id)
+    if campaign is None:
+        return
+    settings = EmailSettings.query.filter_by(teacher_id=campaign.teacher_id).first()
+    if not settings or not settings.is_active:
+        raise RuntimeError('Почта не настроена')
+
+    account = _mail_account(settings)
+    group = Group.query.get(campaign.group_id)
+    group_name = group.name if group else ''
+    pending = [r for r in campaign.recipients if r.status == 'pending']
+
+    campaign.status = 'sending'
+    db.session.commit()
+
+    interval = 1.0 / max(float(current_app.config.get('MAIL_BULK_RATE', 2)), 0.01)
+    next_send = time.monotonic()
+    index = 0
+    reconnects = 0
+
+    while index < len(pending):
+        try:
+            # Одна SMTP-сессия на всю рассылку; новая — только если сервер разорвал соединение
+            with get_pool().smtp(account) as server:
+                while index < len(pending):
+                    recipient = pending[index]
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_send = time.monotonic() + interval
+
+                    context = _recipient_context(recipient, group_name)
+                    msg = _build_message(
+                        account,
+                        recipient.email,
+                        render_text(campaign.subject, context),
+                        render_text(campaign.body, context)
+                    )
+                    try:
+                        server.send_message(msg)
+                        recipient.status = 'sent'
+                        recipient.sent_at = datetime.utcnow()
+                    except _RECIPIENT_ERRORS as e:
+                        recipient.status = 'failed'
+                        recipient.error = str(e)[:500]
+
+                    index += 1
+                    if index % COMMIT_EVERY == 0:
+                        db.session.commit()
+        except (smtplib.SMTPException, OSError) as e:
+            db.session.commit()
+            reconnects += 1
+            logger.warning(f"Mail campaign {campaign_id}: SMTP session lost ({e}), reconnect {reconnects}")
+            if reconnects > MAX_RECONNECTS:
+                for recipient in pending[index:]:
+                    recipient.status = 'failed'
+                    recipient.error = str(e)[:500]
+                campaign.error = str(e)[:500]
+                break
+
+    campaign.status = 'done'
+    campaign.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def campaign_status(campaign):
+    counts = {'pending': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+    for recipient in campaign.recipients:
+        counts[recipient.status] = counts.get(recipient.status, 0) + 1
+    return {
+        'id': campaign.id,
+        'group_id': campaign.group_id,
+        'subject': campaign.subject,
+        'status': campaign.status,
+        'error': campaign.error,
+        'total': len(campaign.recipients),
+        'counts': counts,
+        'created_at': campaign.created_at.isoformat() if campaign.created_at else None,
+        'finished_at': campaign.finished_at.isoformat() if campaign.finished_at else None,
+        'recipients': [r.to_dict() for r in campaign.recipients]
+    }
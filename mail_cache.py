@@ -0,0 +1,195 @@
+"""
+Локальный кэш заголовков почты преподавателя.
+
+Список писем, пагинация и поиск обслуживаются из таблицы mail_header без
+обращения к IMAP. Кэш синхронизируется инкрементально: запрашиваются только
+UID новее последнего сохраненного, удаленные на сервере письма убираются
+из кэша, а при смене UIDVALIDITY папка собирается заново.
+
+Синхронизация запускается в фоне, если кэш старше MAIL_SYNC_INTERVAL.
+Синхронизации одной папки в процессе выполняются по очереди, поэтому
+одновременная первая загрузка из двух запросов не сохраняет письма дважды.
+
+Поиск не зависит от регистра и для кириллицы: вместе с заголовком хранится
+search_text в casefold, с ним и сравнивается строка поиска.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from mail_pool import get_pool
+from models import db, EmailSettings, MailboxState, MailHeader
+
+logger = logging.getLogger(__name__)
+
+FETCH_BATCH_SIZE = 100
+
+_running = set()
+_running_lock = threading.Lock()
+_sync_locks = {}
+
+
+def _sync_interval():
+    return timedelta(seconds=current_app.config.get('MAIL_SYNC_INTERVAL', 120))
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _sync_lock(teacher_id, mailbox):
+    with _running_lock:
+        return _sync_locks.setdefault((teacher_id, mailbox), threading.Lock())
+
+
+def search_key(*parts):
+    """Текст для поиска без учета регистра (в том числе не-ASCII)."""
+    return ' '.join(part for part in parts if part).casefold()
+
+
+def get_state(teacher_id, mailbox):
+    return MailboxState.query.filter_by(teacher_id=teacher_id, mailbox=mailbox).first()
+
+
+def needs_sync(state):
+    return state is None or state.synced_at is None or datetime.utcnow() - state.synced_at > _sync_interval()
+
+
+def clear_cache(teacher_id):
+    """Удаляет кэш всех папок (например, при смене почтового ящика)."""
+    MailHeader.query.filter_by(teacher_id=teacher_id).delete()
+    MailboxState.query.filter_by(teacher_id=teacher_id).delete()
+
+
+def _reset_mailbox(state):
+    MailHeader.query.filter_by(teacher_id=state.teacher_id, mailbox=state.mailbox).delete()
+    state.last_uid = 0
+
+
+def sync_mailbox(teacher_id, mailbox='INBOX'):
+    """Синхронизирует кэш папки с сервером. Возвращает число новых писем."""
+    from mail import _mail_account
+
+    settings = EmailSettings.query.filter_by(teacher_id=teacher_id).first()
+    if not settings or not settings.is_active:
+        return 0
+
+    with _sync_lock(teacher_id, mailbox):
+        # Пока ждали, папку могла синхронизировать другая нить: читаем состояние заново
+        state = MailboxState.query.filter_by(
+            teacher_id=teacher_id, mailbox=mailbox
+        ).populate_existing().first()
+        if state is None:
+            state = MailboxState(teacher_id=teacher_id, mailbox=mailbox, last_uid=0)
+            db.session.add(state)
+
+        with get_pool().imap(_mail_account(settings)) as client:
+            return _sync_with_client(client, state, teacher_id, mailbox)
+
+
+def _sync_with_client(client, state, teacher_id, mailbox):
+    from mail import _fetch_summaries
+
+    try:
+        typ, _ = client.select(mailbox, readonly=True)
+        if typ != 'OK':
+            raise RuntimeError(f'Папка {mailbox} недоступна')
+
+        _, validity = client.response('UIDVALIDITY')
+        uidvalidity = int(validity[0]) if validity and validity[0] else None
+        if state.uidvalidity != uidvalidity:
+            # UID из старой сессии папки больше ничего не значат
+            _reset_mailbox(state)
+            state.uidvalidity = uidvalidity
+
+        typ, data = client.uid('SEARCH', None, 'ALL')
+        if typ != 'OK':
+            raise RuntimeError('Не удалось получить список писем')
+        server_uids = sorted(int(uid) for uid in data[0].split())
+        server_set = set(server_uids)
+
+        local_uids = {uid for (uid,) in db.session.query(MailHeader.uid).filter_by(
+            teacher_id=teacher_id, mailbox=mailbox
+        ).all()}
+
+        removed = list(local_uids - server_set)
+        for chunk in _chunks(removed, 500):
+            MailHeader.query.filter(
+                MailHeader.teacher_id == teacher_id,
+                MailHeader.mailbox == mailbox,
+                MailHeader.uid.in_(chunk)
+            ).delete(synchronize_session=False)
+
+        last_uid = state.last_uid or 0
+        new_uids = [uid for uid in server_uids if uid > last_uid and uid not in local_uids]
+        if not last_uid:
+            new_uids = new_uids[-current_app.config.get('MAIL_CACHE_INITIAL_LIMIT', 1000):]
+
+        # Сначала самые новые письма, чтобы первая страница появилась быстрее
+        new_uids.reverse()
+        for chunk in _chunks(new_uids, FETCH_BATCH_SIZE):
+            for summary in _fetch_summaries(client, [str(uid).encode() for uid in chunk]):
+                subject = summary['subject'][:500]
+                sender = (summary['sender'] or '')[:500]
+                db.session.add(MailHeader(
+                    teacher_id=teacher_id,
+                    mailbox=mailbox,
+                    uid=int(summary['id']),
+                    subject=subject,
+                    sender=sender,
+                    snippet=summary['snippet'],
+                    time_label=summary['time'][:50],
+                    search_text=search_key(subject, sender, summary['snippet'])
+                ))
+            db.session.commit()
+
+        if server_uids:
+            state.last_uid = max(last_uid, server_uids[-1])
+        state.synced_at = datetime.utcnow()
+        db.session.commit()
+        return len(new_uids)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def is_syncing(teacher_id, mailbox):
+    with _running_lock:
+        return (teacher_id, mailbox) in _running
+
+
+def request_sync(teacher_id, mailbox='INBOX'):
+    """Запускает синхронизацию в фоновом потоке (не более одной на папку)."""
+    key = (teacher_id, mailbox)
+    with _running_lock:
+        if key in _running:
+            return False
+        _running.add(key)
+
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                sync_mailbox(teacher_id, mailbox)
+        except Exception as e:
+            logger.warning(f"Mail sync failed for teacher {teacher_id}/{mailbox}: {e}")
+        finally:
+            with _running_lock:
+                _running.discard(key)
+
+    threading.Thread(target=run, name=f'mail-sync-{teacher_id}', daemon=True).start()
+    return True
+
+
+def list_cached(teacher_id, mailbox, limit=20, offset=0, search=None):
+    """Страница писем из кэша (новые сверху) и общее число найденных."""
+    query = MailHeader.query.filter_by(teacher_id=teacher_id, mailbox=mailbox)
+    if search:
+        query = query.filter(MailHeader.search_text.contains(search_key(search), autoescape=True))
+    total = query.count()
+    headers = query.order_by(MailHeader.uid.desc()).offset(offset).limit(limit).all()
+    return [h.to_dict() for h in headers], total
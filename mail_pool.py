@@ -0,0 +1,380 @@
+"""
+Пул IMAP/SMTP соединений и наблюдатель IMAP IDLE.
+
+Соединения хранятся отдельно для каждого почтового ящика преподавателя и
+переиспользуются между запросами: TLS-рукопожатие и авторизация выполняются
+один раз. Перед выдачей давно не использованное соединение проверяется NOOP,
+простаивающие дольше MAIL_POOL_IDLE_TIMEOUT закрываются.
+
+IdleWatcher держит отдельное IMAP-соединение в режиме IDLE и отмечает
+появление новых писем. Интерфейс опрашивает этот локальный флаг
+(/mail/api/status), не подключаясь к серверу.
+"""
+
+import atexit
+import hashlib
+import imaplib
+import logging
+import select
+import smtplib
+import ssl
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IDLE = 2
+DEFAULT_IDLE_TIMEOUT = 300
+MAX_LIFETIME = 30 * 60
+HEALTHCHECK_AFTER = 30      # секунд простоя, после которых соединение проверяется NOOP
+
+IDLE_RENEW_INTERVAL = 25 * 60   # RFC 2177: IDLE нужно перезапускать раньше 29 минут
+IDLE_RECONNECT_DELAY = 30
+DEFAULT_WATCHER_TTL = 600
+
+# smtp_plaintext: разрешить вход на SMTP без TLS, если сервер не предлагает STARTTLS
+MailAccount = namedtuple('MailAccount', [
+    'teacher_id', 'email', 'display_name', 'username', 'password',
+    'imap_host', 'imap_port', 'imap_ssl', 'smtp_host', 'smtp_port', 'smtp_ssl',
+    'smtp_plaintext'
+], defaults=(False,))
+
+
+def account_from_settings(settings, display_name=''):
+    """Снимок EmailSettings, который можно передавать между потоками."""
+    return MailAccount(
+        teacher_id=settings.teacher_id,
+        email=settings.email,
+        display_name=display_name,
+        username=settings.username,
+        password=settings.password,
+        imap_host=settings.imap_host,
+        imap_port=settings.imap_port,
+        imap_ssl=settings.imap_ssl,
+        smtp_host=settings.smtp_host,
+        smtp_port=settings.smtp_port,
+        smtp_ssl=settings.smtp_ssl,
+        smtp_plaintext=bool(has_app_context() and current_app.config.get('MAIL_SMTP_ALLOW_PLAINTEXT'))
+    )
+
+
+def _fingerprint(account):
+    secret = hashlib.sha256((account.password or '').encode('utf-8')).hexdigest()[:16]
+    return (account.teacher_id, account.username, secret)
+
+
+def open_imap(account):
+    if account.imap_ssl:
+        client = imaplib.IMAP4_SSL(account.imap_host, account.imap_port)
+    else:
+        client = imaplib.IMAP4(account.imap_host, account.imap_port)
+    client.login(account.username, account.password)
+    return client
+
+
+def open_smtp(account):
+    if account.smtp_ssl:
+        server = smtplib.SMTP_SSL(account.smtp_host, account.smtp_port)
+    else:
+        server = smtplib.SMTP(account.smtp_host, account.smtp_port)
+        server.ehlo()
+        # Без STARTTLS пароль уйдет открытым текстом — только при явном разрешении
+        if server.has_extn('starttls') or not account.smtp_plaintext:
+            server.starttls()
+            server.ehlo()
+    server.login(account.username, account.password)
+    return server
+
+
+def _close_imap(client):
+    try:
+        client.logout()
+    except Exception:
+        pass
+
+
+def _close_smtp(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def _imap_alive(client):
+    try:
+        return client.noop()[0] == 'OK'
+    except Exception:
+        return False
+
+
+def _smtp_alive(server):
+    try:
+        return server.noop()[0] == 250
+    except Exception:
+        return False
+
+
+_KINDS = {
+    'imap': (open_imap, _close_imap, _imap_alive, lambda a: (a.imap_host, a.imap_port, a.imap_ssl)),
+    'smtp': (open_smtp, _close_smtp, _smtp_alive, lambda a: (a.smtp_host, a.smtp_port, a.smtp_ssl, a.smtp_plaintext)),
+}
+
+
+class _Entry:
+    __slots__ = ('conn', 'created', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = self.last_used = time.monotonic()
+
+
+class MailConnectionPool:
+    """Пул соединений по почтовым ящикам. Потокобезопасен."""
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_lifetime=MAX_LIFETIME):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _key(self, kind, account):
+        return (kind, _KINDS[kind][3](account)) + _fingerprint(account)
+
+    def _expired(self, entry, now):
+        return now - entry.last_used > self.idle_timeout or now - entry.created > self.max_lifetime
+
+    def _prune(self, now):
+        """Забирает из пула просроченные соединения (закрывать — вне блокировки)."""
+        stale = []
+        for key, entries in list(self._idle.items()):
+            alive = []
+            for entry in entries:
+                (stale if self._expired(entry, now) else alive).append((key[0], entry))
+            self._idle[key] = [entry for _, entry in alive]
+            if not self._idle[key]:
+                del self._idle[key]
+        return stale
+
+    def _acquire(self, kind, account):
+        opener, closer, alive, _ = _KINDS[kind]
+        key = self._key(kind, account)
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                stale = self._prune(now)
+                entries = self._idle.get(key)
+                entry = entries.pop() if entries else None
+            for stale_kind, stale_entry in stale:
+                _KINDS[stale_kind][1](stale_entry.conn)
+
+            if entry is None:
+                return _Entry(opener(account))
+            if now - entry.last_used < HEALTHCHECK_AFTER or alive(entry.conn):
+                return entry
+            closer(entry.conn)
+
+    def _release(self, kind, account, entry, broken=False):
+        closer = _KINDS[kind][1]
+        entry.last_used = time.monotonic()
+        if broken or self._expired(entry, entry.last_used):
+            closer(entry.conn)
+            return
+        key = self._key(kind, account)
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if len(entries) < self.max_idle:
+                entries.append(entry)
+                return
+        closer(entry.conn)
+
+    @contextmanager
+    def _session(self, kind, account):
+        entry = self._acquire(kind, account)
+        broken = False
+        try:
+            yield entry.conn
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self._release(kind, account, entry, broken)
+
+    def imap(self, account):
+        """Контекстный менеджер: авторизованный IMAP-клиент из пула."""
+        return self._session('imap', account)
+
+    def smtp(self, account):
+        """Контекстный менеджер: авторизованное SMTP-соединение из пула."""
+        return self._session('smtp', account)
+
+    def discard(self, teacher_id):
+        """Закрывает все соединения преподавателя (например, после смены настроек)."""
+        with self._lock:
+            keys = [key for key in self._idle if key[2] == teacher_id]
+            removed = [(key[0], entry) for key in keys for entry in self._idle.pop(key)]
+        for kind, entry in removed:
+            _KINDS[kind][1](entry.conn)
+
+    def close_all(self):
+        with self._lock:
+            removed = [(key[0], entry) for key, entries in self._idle.items() for entry in entries]
+            self._idle.clear()
+        for kind, entry in removed:
+            _KINDS[kind][1](entry.conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = current_app.config if has_app_context() else {}
+            _pool = MailConnectionPool(
+                max_idle=config.get('MAIL_POOL_MAX_IDLE', DEFAULT_MAX_IDLE),
+                idle_timeout=config.get('MAIL_POOL_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)
+            )
+            atexit.register(_pool.close_all)
+    return _pool
+
+
+# ============================================================================
+# IMAP IDLE
+# ============================================================================
+
+class IdleWatcher(threading.Thread):
+    """Держит папку в режиме IDLE и записывает время появления новых писем."""
+
+    def __init__(self, account, mailbox='INBOX', ttl=DEFAULT_WATCHER_TTL):
+        super().__init__(name=f'mail-idle-{account.teacher_id}', daemon=True)
+        self.account = account
+        self.mailbox = mailbox
+        self.ttl = ttl
+        self.last_event = None
+        self.supported = True
+        self.last_poll = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def touch(self):
+        self.last_poll = time.monotonic()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def _should_run(self):
+        # Никто не опрашивает флаг — соединение не держим
+        return not self.stopped and time.monotonic() - self.last_poll < self.ttl
+
+    def run(self):
+        while self._should_run():
+            try:
+                self._watch()
+            except Exception as e:
+                logger.warning(f"IMAP IDLE for teacher {self.account.teacher_id} failed: {e}")
+                self._stop_event.wait(IDLE_RECONNECT_DELAY)
+            if not self.supported:
+                break
+        self.stop()
+
+    def _watch(self):
+        client = open_imap(self.account)
+        try:
+            if 'IDLE' not in client.capabilities:
+                self.supported = False
+                return
+            typ, data = client.select(self.mailbox, readonly=True)
+            if typ != 'OK':
+                raise RuntimeError(f'Папка {self.mailbox} недоступна')
+            exists = int(data[0] or 0)
+            while self._should_run():
+                exists = self._idle_cycle(client, exists)
+        finally:
+            _close_imap(client)
+
+    def _idle_cycle(self, client, exists):
+        tag = client._new_tag()
+        client.send(tag + b' IDLE\r\n')
+        line = client.readline()
+        if not line.startswith(b'+'):
+            raise RuntimeError(f'IDLE отклонен: {line!r}')
+
+        deadline = time.monotonic() + IDLE_RENEW_INTERVAL
+        while time.monotonic() < deadline and self._should_run():
+            if not self._readable(client, 1.0):
+                continue
+            exists = self._handle_line(client.readline(), exists)
+
+        client.send(b'DONE\r\n')
+        while True:
+            line = client.readline()
+            if line.startswith(tag):
+                break
+            exists = self._handle_line(line, exists)
+        return exists
+
+    def _handle_line(self, line, exists):
+        """Обрабатывает ответ сервера во время IDLE; возвращает новое число писем."""
+        if not line:
+            raise ConnectionError('Соединение закрыто сервером')
+        parts = line.split()
+        if len(parts) >= 3 and parts[0] == b'*' and parts[2].upper() == b'EXISTS':
+            count = int(parts[1])
+            if count > exists:
+                self.last_event = datetime.utcnow()
+            return count
+        return exists
+
+    @staticmethod
+    def _readable(client, timeout):
+        sock = client.sock
+        if isinstance(sock, ssl.SSLSocket) and sock.pending():
+            return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def ensure_watcher(account, mailbox='INBOX'):
+    """Запускает (или продлевает) IDLE-наблюдатель ящика. Возвращает его."""
+    ttl = current_app.config.get('MAIL_IDLE_TTL', DEFAULT_WATCHER_TTL) if has_app_context() else DEFAULT_WATCHER_TTL
+    key = (account.teacher_id, mailbox)
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is not None and watcher.is_alive() and _fingerprint(watcher.account) == _fingerprint(account) \
+                and watcher.account.imap_host == account.imap_host:
+            watcher.touch()
+            return watcher
+        if watcher is not None:
+            watcher.stop()
+            if not watcher.supported:
+                # Сервер без IDLE: не пытаемся снова с теми же настройками
+                if _fingerprint(watcher.account) == _fingerprint(account):
+                    return watcher
+        watcher = IdleWatcher(account, mailbox, ttl=ttl)
+        _watchers[key] = watcher
+        watcher.start()
+        return watcher
+
+
+def stop_watchers(teacher_id):
+    with _watchers_lock:
+        for key in [k for k in _watchers if k[0] == teacher_id]:
+            _watchers.pop(key).stop()
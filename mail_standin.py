@@ -0,0 +1,397 @@
+"""
+Локальный IMAP/SMTP сервер-заглушка для проверки почтового модуля.
+
+Поддерживает ровно то подмножество протоколов, которое использует
+приложение: LOGIN, SELECT/EXAMINE, UID SEARCH, UID FETCH (заголовки и
+частичный TEXT), NOOP, IDLE на стороне IMAP и EHLO, AUTH PLAIN/LOGIN,
+MAIL/RCPT/DATA на стороне SMTP. Работает без TLS на 127.0.0.1.
+
+Пример:
+    server = StandinMailServer().start()
+    server.deliver(b'Subject: Test\\r\\n\\r\\nHello')
+    account = server.account(teacher_id=1)   # MailAccount для mail_pool
+    ...
+    server.stop()
+
+Запуск из командной строки (для ручной проверки интерфейса почты):
+    python mail_standin.py
+"""
+
+import base64
+import re
+import select
+import socketserver
+import threading
+from email.utils import formatdate
+
+from mail_pool import MailAccount
+
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+_PARTIAL_RE = re.compile(r'BODY(?:\.PEEK)?\[TEXT\](?:<(\d+)\.(\d+)>)?', re.IGNORECASE)
+_FIELDS_RE = re.compile(r'HEADER\.FIELDS \(([^)]*)\)', re.IGNORECASE)
+
+
+class StandinMailbox:
+    """Папка: список (uid, сообщение) и UIDVALIDITY."""
+
+    def __init__(self, uidvalidity=1):
+        self.uidvalidity = uidvalidity
+        self.messages = []
+        self.next_uid = 1
+
+    def append(self, raw):
+        self.messages.append((self.next_uid, raw))
+        self.next_uid += 1
+        return self.next_uid - 1
+
+    def expunge(self, uid):
+        self.messages = [(u, raw) for u, raw in self.messages if u != uid]
+
+    def reset(self, uidvalidity):
+        """Имитирует пересоздание папки на сервере (смена UIDVALIDITY)."""
+        self.uidvalidity = uidvalidity
+        self.next_uid = 1
+        old = [raw for _, raw in self.messages]
+        self.messages = []
+        for raw in old:
+            self.append(raw)
+
+
+def _split_message(raw):
+    head, sep, body = raw.partition(b'\r\n\r\n')
+    if not sep:
+        head, sep, body = raw.partition(b'\n\n')
+    return head, body
+
+
+def _header_fields(raw, names):
+    head, _ = _split_message(raw)
+    wanted = {n.upper() for n in names}
+    lines, keep = [], False
+    for line in head.splitlines():
+        if line[:1] in (b' ', b'\t'):
+            if keep:
+                lines.append(line)
+            continue
+        name = line.split(b':', 1)[0].decode('ascii', errors='ignore').strip().upper()
+        keep = name in wanted
+        if keep:
+            lines.append(line)
+    return b'\r\n'.join(lines) + (b'\r\n' if lines else b'') + b'\r\n'
+
+
+class _ImapHandler(socketserver.StreamRequestHandler):
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server.owner
+        self.selected = None
+        self.send('* OK [CAPABILITY IMAP4rev1 IDLE] Stand-in IMAP ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.decode('utf-8', errors='ignore').strip().split(' ', 2)
+            if len(parts) < 2:
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ''
+            handler = getattr(self, f'cmd_{command.lower()}', None)
+            if handler is None:
+                self.send(f'{tag} BAD unknown command\r\n')
+                continue
+            with server.lock:
+                server.command_counts[command] = server.command_counts.get(command, 0) + 1
+            if handler(tag, args) is False:
+                return
+
+    def cmd_capability(self, tag, args):
+        self.send(f'* CAPABILITY IMAP4rev1 IDLE\r\n{tag} OK CAPABILITY completed\r\n')
+
+    def cmd_login(self, tag, args):
+        tokens = [u or q.replace('\\"', '"').replace('\\\\', '\\') for q, u in _TOKEN_RE.findall(args)]
+        if tokens[:2] != [self.server.owner.username, self.server.owner.password]:
+            self.send(f'{tag} NO [AUTHENTICATIONFAILED] invalid credentials\r\n')
+            return
+        with self.server.owner.lock:
+            self.server.owner.logins += 1
+        self.send(f'{tag} OK LOGIN completed\r\n')
+
+    def cmd_select(self, tag, args, readonly=False):
+        name = args.strip().strip('"')
+        mailbox = self.server.owner.mailboxes.get(name)
+        if mailbox is None:
+            self.send(f'{tag} NO no such mailbox\r\n')
+            return
+        self.selected = name
+        self.send(
+            f'* {len(mailbox.messages)} EXISTS\r\n'
+            f'* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid\r\n'
+            f'* OK [UIDNEXT {mailbox.next_uid}] next UID\r\n'
+            f'{tag} OK [{"READ-ONLY" if readonly else "READ-WRITE"}] SELECT completed\r\n'
+        )
+
+    def cmd_examine(self, tag, args):
+        self.cmd_select(tag, args, readonly=True)
+
+    def cmd_noop(self, tag, args):
+        self.send(f'{tag} OK NOOP completed\r\n')
+
+    def cmd_logout(self, tag, args):
+        self.send(f'* BYE logging out\r\n{tag} OK LOGOUT completed\r\n')
+        return False
+
+    def cmd_uid(self, tag, args):
+        mailbox = self.server.owner.mailboxes.get(self.selected)
+        if mailbox is None:
+            self.send(f'{tag} BAD no mailbox selected\r\n')
+            return
+        subcommand, _, rest = args.partition(' ')
+        subcommand = subcommand.upper()
+        if subcommand == 'SEARCH':
+            uids = ''.join(f' {uid}' for uid, _ in mailbox.messages)
+            self.send(f'* SEARCH{uids}\r\n{tag} OK SEARCH completed\r\n')
+        elif subcommand == 'FETCH':
+            uid_set, _, items = rest.partition(' ')
+            self._fetch(mailbox, uid_set, items)
+            self.send(f'{tag} OK FETCH completed\r\n')
+        else:
+            self.send(f'{tag} BAD unsupported UID command\r\n')
+
+    def _fetch(self, mailbox, uid_set, items):
+        wanted = set()
+        for part in uid_set.split(','):
+            if ':' in part:
+                start, end = part.split(':')
+                last = mailbox.next_uid if end == '*' else int(end)
+                wanted.update(range(int(start), last + 1))
+            else:
+                wanted.add(int(part))
+
+        fields = _FIELDS_RE.search(items)
+        partial = _PARTIAL_RE.search(items)
+        for seq, (uid, raw) in enumerate(mailbox.messages, start=1):
+            if uid not in wanted:
+                continue
+            chunks = [f'* {seq} FETCH (UID {uid}'.encode()]
+            if fields:
+                names = fields.group(1).split()
+                data = _header_fields(raw, names)
+                chunks.append(f' BODY[HEADER.FIELDS ({" ".join(names)})] {{{len(data)}}}\r\n'.encode() + data)
+            if partial:
+                _, body = _split_message(raw)
+                origin = int(partial.group(1) or 0)
+                if partial.group(2):
+                    body = body[origin:origin + int(partial.group(2))]
+                label = f'BODY[TEXT]<{origin}>' if partial.group(2) else 'BODY[TEXT]'
+                chunks.append(f' {label} {{{len(body)}}}\r\n'.encode() + body)
+            chunks.append(b')\r\n')
+            self.send(b''.join(chunks))
+
+    def cmd_idle(self, tag, args):
+        owner = self.server.owner
+        mailbox = owner.mailboxes.get(self.selected)
+        if mailbox is None:
+            self.send(f'{tag} BAD no mailbox selected\r\n')
+            return
+        known = len(mailbox.messages)
+        self.send('+ idling\r\n')
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.2)
+            if readable:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b'DONE':
+                    break
+            with owner.lock:
+                count = len(mailbox.messages)
+            if count != known:
+                known = count
+                self.send(f'* {count} EXISTS\r\n')
+        self.send(f'{tag} OK IDLE terminated\r\n')
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, text):
+        self.wfile.write((text + '\r\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def handle(self):
+        owner = self.server.owner
+        authenticated = False
+        mail_from, rcpt_to = None, []
+        self.reply('220 stand-in ESMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            text = line.decode('utf-8', errors='ignore').strip()
+            verb = text.split(' ', 1)[0].upper()
+            with owner.lock:
+                owner.command_counts[verb] = owner.command_counts.get(verb, 0) + 1
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME')
+            elif verb == 'AUTH':
+                authenticated = self._auth(text)
+                self.reply('235 2.7.0 Authentication successful' if authenticated else '535 5.7.8 Authentication failed')
+                if authenticated:
+                    with owner.lock:
+                        owner.logins += 1
+            elif verb == 'MAIL':
+                if not authenticated:
+                    self.reply('530 5.7.0 Authentication required')
+                    continue
+                mail_from, rcpt_to = text[10:].strip().strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt_to.append(text[8:].strip().strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                owner.record_sent(mail_from, rcpt_to, b''.join(data))
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                if verb == 'RSET':
+                    mail_from, rcpt_to = None, []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def _auth(self, text):
+        owner = self.server.owner
+        parts = text.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ''
+        try:
+            if mechanism == 'PLAIN':
+                if len(parts) > 2:
+                    payload = parts[2]
+                else:
+                    self.reply('334 ')
+                    payload = self.rfile.readline().decode().strip()
+                _, username, password = base64.b64decode(payload).decode('utf-8').split('\0')
+            elif mechanism == 'LOGIN':
+                if len(parts) > 2:
+                    username = base64.b64decode(parts[2]).decode('utf-8')
+                else:
+                    self.reply('334 VXNlcm5hbWU6')
+                    username = base64.b64decode(self.rfile.readline().strip()).decode('utf-8')
+                self.reply('334 UGFzc3dvcmQ6')
+                password = base64.b64decode(self.rfile.readline().strip()).decode('utf-8')
+            else:
+                return False
+        except (ValueError, UnicodeDecodeError):
+            return False
+        return (username, password) == (owner.username, owner.password)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StandinMailServer:
+    """IMAP + SMTP заглушка. Письма, отправленные через SMTP, попадают в `sent`."""
+
+    def __init__(self, username='teacher@example.com', password='secret', host='127.0.0.1'):
+        self.username = username
+        self.password = password
+        self.host = host
+        self.lock = threading.Lock()
+        self.mailboxes = {'INBOX': StandinMailbox(), 'Sent': StandinMailbox()}
+        self.sent = []
+        self.logins = 0
+        self.command_counts = {}
+        self._servers = []
+
+    def start(self):
+        for handler in (_ImapHandler, _SmtpHandler):
+            server = _ThreadingServer((self.host, 0), handler)
+            server.owner = self
+            threading.Thread(target=server.serve_forever, name=f'standin-{handler.__name__}', daemon=True).start()
+            self._servers.append(server)
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def imap_port(self):
+        return self._servers[0].server_address[1]
+
+    @property
+    def smtp_port(self):
+        return self._servers[1].server_address[1]
+
+    def deliver(self, raw, mailbox='INBOX'):
+        """Кладет письмо в папку; подключенные в IDLE клиенты получат EXISTS."""
+        if isinstance(raw, str):
+            raw = raw.encode('utf-8')
+        if b'\nDate:' not in b'\n' + raw.split(b'\r\n\r\n', 1)[0]:
+            raw = f'Date: {formatdate(localtime=True)}\r\n'.encode() + raw
+        with self.lock:
+            return self.mailboxes[mailbox].append(raw)
+
+    def record_sent(self, mail_from, rcpt_to, data):
+        with self.lock:
+            self.sent.append({'from': mail_from, 'to': list(rcpt_to), 'data': data})
+            self.mailboxes['Sent'].append(data)
+
+    def account(self, teacher_id=1, display_name='Teacher'):
+        return MailAccount(
+            teacher_id=teacher_id,
+            email=self.username,
+            display_name=display_name,
+            username=self.username,
+            password=self.password,
+            imap_host=self.host,
+            imap_port=self.imap_port,
+            imap_ssl=False,
+            smtp_host=self.host,
+            smtp_port=self.smtp_port,
+            smtp_ssl=False,
+            smtp_plaintext=True
+        )
+
+
+if __name__ == '__main__':
+    import time
+
+    server = StandinMailServer().start()
+    for i in range(1, 6):
+        server.deliver(
+            f'From: Student {i} <student{i}@example.com>\r\n'
+            f'Subject: Test message {i}\r\n'
+            f'Content-Type: text/plain; charset=utf-8\r\n\r\n'
+            f'Hello from student {i}!\r\n'
+        )
+    print(f"IMAP: {server.host}:{server.imap_port}, SMTP: {server.host}:{server.smtp_port}")
+    print(f"Логин: {server.username}, пароль: {server.password} (SSL выключен)")
+    print("Для отправки через приложение задайте MAIL_SMTP_ALLOW_PLAINTEXT=true")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
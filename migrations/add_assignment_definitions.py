@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Миграция: задания группы (assignment_definition)
+
+Раньше задание существовало только как набор одинаковых записей assignment
+(по одной на студента) с общими title и due_date. Теперь название, срок и
+дисциплина хранятся в assignment_definition, а работы студентов ссылаются на
+него через assignment.definition_id. Миграция создает таблицу, добавляет
+колонку и объединяет существующие работы в задания по преподавателю, группе,
+названию, сроку и дисциплине.
+"""
+
+import sqlite3
+import os
+import sys
+
+
+def migrate_database():
+    """Создает assignment_definition и связывает с ним существующие работы"""
+
+    # Путь к базе данных
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'database.db')
+
+    if not os.path.exists(db_path):
+        print("База данных не найдена!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS assignment_definition (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                teacher_id INTEGER NOT NULL,
+                group_id INTEGER NOT NULL,
+                title VARCHAR(200) NOT NULL,
+                due_date DATE,
+                subject VARCHAR(200),
+                created_at DATETIME,
+                FOREIGN KEY (teacher_id) REFERENCES teacher (id),
+                FOREIGN KEY (group_id) REFERENCES "group" (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS ix_assignment_definition_teacher_id ON assignment_definition (teacher_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS ix_assignment_definition_group_id ON assignment_definition (group_id)')
+
+        cursor.execute("PRAGMA table_info(assignment)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'definition_id' not in columns:
+            print("Добавляем поле definition_id в таблицу assignment...")
+            cursor.execute("ALTER TABLE assignment ADD COLUMN definition_id INTEGER REFERENCES assignment_definition (id)")
+        cursor.execute('CREATE INDEX IF NOT EXISTS ix_assignment_definition_id ON assignment (definition_id)')
+
+        cursor.execute("SELECT COUNT(*) FROM assignment WHERE definition_id IS NULL")
+        pending = cursor.fetchone()[0]
+        if pending:
+            print(f"Объединяем работы в задания: {pending}...")
+            cursor.execute('''
+                INSERT INTO assignment_definition (teacher_id, group_id, title, due_date, subject, created_at)
+                SELECT a.teacher_id, s.group_id, a.title, a.due_date, a.subject, MIN(a.submitted_at)
+                FROM assignment a JOIN student s ON s.id = a.student_id
+                WHERE a.definition_id IS NULL AND a.teacher_id IS NOT NULL AND s.group_id IS NOT NULL
+                GROUP BY a.teacher_id, s.group_id, a.title, a.due_date, a.subject
+            ''')
+            print(f"Создано заданий: {cursor.rowcount}")
+            cursor.execute('''
+                UPDATE assignment SET definition_id = (
+                    SELECT MIN(d.id) FROM assignment_definition d JOIN student s ON s.group_id = d.group_id
+                    WHERE s.id = assignment.student_id AND d.teacher_id = assignment.teacher_id
+                      AND d.title = assignment.title AND d.due_date IS assignment.due_date
+                      AND d.subject IS assignment.subject
+                )
+                WHERE definition_id IS NULL
+            ''')
+        else:
+            print("Все работы уже связаны с заданиями")
+
+        conn.commit()
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"Ошибка при выполнении миграции: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    if success:
+        print("Миграция выполнена успешно!")
+    else:
+        print("Ошибка выполнения миграции!")
+        sys.exit(1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Миграция: удаление пустых записей посещаемости
+
+Раньше при создании занятия (бот, /addlesson) для каждого студента заранее
+создавалась запись Attendance(present=False) без отметки. Журнал хранит
+только явные отметки: отсутствие записи означает пустую ячейку, а неявка
+всегда сохраняется с отметкой 'Н'. Пустые записи удаляются.
+"""
+
+import sqlite3
+import os
+import sys
+
+PLACEHOLDER_CONDITION = "(present = 0 OR present IS NULL) AND (attendance_mark IS NULL OR TRIM(attendance_mark) = '')"
+
+
+def migrate_database():
+    """Удаляет записи attendance без отметки"""
+
+    # Путь к базе данных
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'database.db')
+
+    if not os.path.exists(db_path):
+        print("База данных не найдена!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT COUNT(*) FROM attendance")
+        total = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM attendance WHERE {PLACEHOLDER_CONDITION}")
+        placeholders = cursor.fetchone()[0]
+
+        if placeholders:
+            print(f"Удаляем пустые записи посещаемости: {placeholders} из {total}...")
+            cursor.execute(f"DELETE FROM attendance WHERE {PLACEHOLDER_CONDITION}")
+            conn.commit()
+            # Возвращаем освободившееся место
+            conn.execute("VACUUM")
+            print("Пустые записи удалены!")
+        else:
+            print("Пустых записей посещаемости нет")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"Ошибка при выполнении миграции: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    if success:
+        print("Миграция выполнена успешно!")
+    else:
+        print("Ошибка выполнения миграции!")
+        sys.exit(1)
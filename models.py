@@ -40,6 +40,9 @@ class Student(db.Model):
 
 
 class Lesson(db.Model):
+    # Графики аналитики отбирают занятия преподавателя по диапазону дат
+    __table_args__ = (db.Index('ix_lesson_teacher_date', 'teacher_id', 'date'),)
+
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, nullable=False)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'))
@@ -51,6 +54,8 @@ class Lesson(db.Model):
 
 
 class Attendance(db.Model):
+    # Хранятся только явные отметки: нет записи — пустая ячейка журнала,
+    # неявка — present=False и отметка 'Н'
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'))
     lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'))
@@ -79,8 +84,36 @@ class ControlPointScore(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class AssignmentDefinition(db.Model):
+    """Задание группы: название, срок и дисциплина хранятся один раз для всех студентов"""
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False, index=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=False)
+    due_date = db.Column(db.Date)
+    subject = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submissions = db.relationship('Assignment', backref='definition', lazy=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'subject': self.subject
+        }
+
+
 class Assignment(db.Model):
+    """Работа студента по заданию (definition).
+
+    title/due_date/subject — снимок на момент создания, после него не изменяется;
+    актуальные значения читаются из definition.
+    """
+    __table_args__ = (db.Index('ix_assignment_teacher_submitted', 'teacher_id', 'submitted_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
+    definition_id = db.Column(db.Integer, db.ForeignKey('assignment_definition.id'), index=True)
     title = db.Column(db.String(200), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'))
     file_path = db.Column(db.String(500))
@@ -109,6 +142,17 @@ class Schedule(db.Model):
     event_type = db.Column(db.String(50))  # Тип мероприятия
 
 
+class ScheduleSnapshot(db.Model):
+    """Готовая повестка преподавателя на день (read-model для бота и рассылок)"""
+    __table_args__ = (db.UniqueConstraint('teacher_id', 'day', name='uq_schedule_snapshot_teacher_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    items = db.Column(db.Text, nullable=False, default='[]')  # JSON: занятия дня с названиями групп
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class TaskList(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -161,6 +205,154 @@ class EmailSettings(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class MailboxState(db.Model):
+    """Состояние синхронизации папки почтового ящика с локальным кэшем"""
+    __table_args__ = (db.UniqueConstraint('teacher_id', 'mailbox', name='uq_mailbox_state_teacher_mailbox'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    mailbox = db.Column(db.String(200), nullable=False)
+    uidvalidity = db.Column(db.BigInteger)  # При смене UIDVALIDITY кэш папки собирается заново
+    last_uid = db.Column(db.BigInteger, default=0)
+    synced_at = db.Column(db.DateTime)
+
+
+class MailHeader(db.Model):
+    """Кэшированный заголовок письма (для списка, пагинации и поиска)"""
+    __table_args__ = (
+        db.UniqueConstraint('teacher_id', 'mailbox', 'uid', name='uq_mail_header_teacher_mailbox_uid'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    mailbox = db.Column(db.String(200), nullable=False)
+    uid = db.Column(db.BigInteger, nullable=False)
+    subject = db.Column(db.String(500))
+    sender = db.Column(db.String(500))
+    snippet = db.Column(db.String(200))
+    time_label = db.Column(db.String(50))  # Дата в формате списка писем (дд.мм чч:мм)
+    # Тема, отправитель и фрагмент в casefold: LIKE в SQLite не различает регистр только для ASCII
+    search_text = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': str(self.uid),
+            'subject': self.subject,
+            'sender': self.sender,
+            'snippet': self.snippet,
+            'time': self.time_label
+        }
+
+
+class CloudEntry(db.Model):
+    """Файл или папка облака заданий (WebDAV) в локальном индексе метаданных"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(1000), unique=True, nullable=False)  # Относительно WEBDAV_ROOT_PATH, корень — ''
+    parent = db.Column(db.String(1000), index=True)
+    name = db.Column(db.String(500), nullable=False, index=True)
+    search_name = db.Column(db.String(500))  # name в casefold: поиск без учета регистра и для кириллицы
+    is_dir = db.Column(db.Boolean, default=False)
+    size = db.Column(db.BigInteger, default=0)
+    etag = db.Column(db.String(200))  # Для папок — признак изменения поддерева
+    modified = db.Column(db.DateTime)
+    listed_at = db.Column(db.DateTime)  # Когда прочитано содержимое папки; None — требуется обход
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'path': self.name + '/' if self.is_dir else self.name,
+            'rel_path': self.path,
+            'type': 'dir' if self.is_dir else 'file',
+            'size': self.size or 0,
+            'modified': self.modified.isoformat() if self.modified else None
+        }
+
+
+class MailCampaign(db.Model):
+    """Рассылка писем студентам группы"""
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
+    subject = db.Column(db.String(500), nullable=False)
+    body = db.Column(db.Text, nullable=False)  # Шаблон: {name}, {first_name}, {group}, {email}
+    status = db.Column(db.String(20), default='pending')  # pending, sending, done, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    recipients = db.relationship('MailCampaignRecipient', backref='campaign', lazy=True,
+                                 cascade='all, delete-orphan')
+
+
+class MailCampaignRecipient(db.Model):
+    """Получатель рассылки и статус доставки"""
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('mail_campaign.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'))
+    name = db.Column(db.String(100))
+    email = db.Column(db.String(120))
+    status = db.Column(db.String(20), default='pending')  # pending, sent, failed, skipped
+    error = db.Column(db.String(500))
+    sent_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'student_id': self.student_id,
+            'name': self.name,
+            'email': self.email,
+            'status': self.status,
+            'error': self.error,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+
+class AICheckJob(db.Model):
+    """Пакетная ИИ-проверка заданий (выполняется в фоне)"""
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    items = db.relationship('AICheckJobItem', backref='job', lazy=True,
+                            cascade='all, delete-orphan')
+
+
+class AICheckJobItem(db.Model):
+    """Задание в пакетной проверке и ее результат"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('ai_check_job.id'), nullable=False, index=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, checked, failed, skipped
+    score = db.Column(db.Float)
+    error = db.Column(db.String(500))
+    checked_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.assignment_id,
+            'status': self.status,
+            'score': self.score,
+            'error': self.error,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None
+        }
+
+
+class SubmissionSignature(db.Model):
+    """MinHash-подпись файла работы студента для поиска похожих работ"""
+    # Название группы не уникально: путь уникален только в пределах группы
+    __table_args__ = (db.UniqueConstraint('group_id', 'path', name='uq_submission_signature_group_path'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(1000), nullable=False)  # <группа>/<студент>/<файл>
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    name = db.Column(db.String(500), nullable=False)
+    version = db.Column(db.String(200))  # etag или mtime:size; None — перехэшировать каждый раз
+    shingles = db.Column(db.Integer, default=0)
+    signature = db.Column(db.LargeBinary)  # None — текст из файла не извлекается
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class CloudCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
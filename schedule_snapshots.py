@@ -0,0 +1,265 @@
+"""
+Снимки расписания преподавателя по дням (read-model).
+
+Для каждого преподавателя хранится готовая повестка на каждый день скользящего
+окна (вчера + SNAPSHOT_DAYS_AHEAD дней вперед) с уже подставленными названиями
+групп. Бот (/today, /schedule) и утренняя рассылка читают повестку одним
+запросом по ключу (teacher_id, day).
+
+Снимки обновляются автоматически: слушатели сессии SQLAlchemy собирают
+затронутые дни при записи Schedule/Group, удаляют устаревшие снимки в той же
+транзакции и пересобирают их после коммита.
+
+Ежедневный перенос окна (удаление старых и построение новых дней):
+    python schedule_snapshots.py
+"""
+
+import json
+import logging
+from datetime import datetime, date as date_cls, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event, inspect, select, delete, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, Schedule, Group, ScheduleSnapshot
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DAYS_BACK = 1
+SNAPSHOT_DAYS_AHEAD = 14
+
+_KEYS_INFO = 'schedule_snapshot_keys'
+_TEACHERS_INFO = 'schedule_snapshot_teachers'
+_listeners_registered = False
+
+
+def snapshot_window(today: date_cls = None) -> Tuple[date_cls, date_cls]:
+    """Границы окна (включительно), для которых хранятся снимки."""
+    today = today or datetime.now().date()
+    return today - timedelta(days=SNAPSHOT_DAYS_BACK), today + timedelta(days=SNAPSHOT_DAYS_AHEAD)
+
+
+def _in_window(day: date_cls) -> bool:
+    start, end = snapshot_window()
+    return start <= day <= end
+
+
+def _build_items(conn, teacher_id: int, day: date_cls) -> List[dict]:
+    """Собирает повестку дня одним запросом с JOIN на группы."""
+    start_of_day = datetime.combine(day, datetime.min.time())
+    end_of_day = datetime.combine(day, datetime.max.time())
+    s = Schedule.__table__
+    g = Group.__table__
+
+    rows = conn.execute(
+        select(s.c.id, s.c.title, s.c.start_time, s.c.end_time, s.c.classroom, g.c.name)
+        .select_from(s.outerjoin(g, s.c.group_id == g.c.id))
+        .where(
+            s.c.teacher_id == teacher_id,
+            s.c.start_time >= start_of_day,
+            s.c.start_time <= end_of_day
+        )
+        .order_by(s.c.start_time)
+    ).all()
+
+    return [{
+        'id': r.id,
+        'title': r.title,
+        'start_time': r.start_time.strftime('%H:%M'),
+        'end_time': r.end_time.strftime('%H:%M') if r.end_time else '',
+        'classroom': r.classroom,
+        'group_name': r.name
+    } for r in rows]
+
+
+def _store(conn, teacher_id: int, day: date_cls, items: List[dict]):
+    t = ScheduleSnapshot.__table__
+    conn.execute(delete(t).where(t.c.teacher_id == teacher_id, t.c.day == day))
+    conn.execute(t.insert().values(
+        teacher_id=teacher_id,
+        day=day,
+        items=json.dumps(items, ensure_ascii=False),
+        updated_at=datetime.utcnow()
+    ))
+
+
+def refresh_snapshots(keys: Iterable[Tuple[int, date_cls]], engine=None):
+    """Пересобирает снимки для набора (teacher_id, day) в отдельной транзакции."""
+    keys = [(t, d) for t, d in set(keys) if t and _in_window(d)]
+    if not keys:
+        return
+    engine = engine or db.engine
+    try:
+        with engine.begin() as conn:
+            for teacher_id, day in keys:
+                _store(conn, teacher_id, day, _build_items(conn, teacher_id, day))
+    except IntegrityError:
+        # Параллельная пересборка того же ключа — снимок уже актуален
+        pass
+
+
+def refresh_teacher_window(teacher_id: int, engine=None):
+    start, end = snapshot_window()
+    days = (end - start).days + 1
+    refresh_snapshots([(teacher_id, start + timedelta(days=i)) for i in range(days)], engine)
+
+
+def get_day_agenda(teacher_id: int, day: date_cls) -> List[dict]:
+    """Повестка преподавателя на день: один запрос по ключу.
+
+    Если снимка нет (новый день в окне), он строится и сохраняется;
+    для дат вне окна повестка считается напрямую без сохранения.
+    """
+    row = db.session.execute(
+        select(ScheduleSnapshot.items).where(
+            ScheduleSnapshot.teacher_id == teacher_id,
+            ScheduleSnapshot.day == day
+        )
+    ).scalar()
+    if row is not None:
+        return json.loads(row)
+
+    with db.engine.connect() as conn:
+        items = _build_items(conn, teacher_id, day)
+    if _in_window(day):
+        try:
+            with db.engine.begin() as conn:
+                _store(conn, teacher_id, day, items)
+        except IntegrityError:
+            pass
+        except Exception as e:
+            logger.warning(f"Schedule snapshot store failed: {e}")
+    return items
+
+
+def get_agendas(teacher_ids: Iterable[int], day: date_cls) -> Dict[int, List[dict]]:
+    """Повестки нескольких преподавателей на день (для рассылок)."""
+    teacher_ids = list(teacher_ids)
+    if not teacher_ids:
+        return {}
+    rows = db.session.execute(
+        select(ScheduleSnapshot.teacher_id, ScheduleSnapshot.items).where(
+            ScheduleSnapshot.teacher_id.in_(teacher_ids),
+            ScheduleSnapshot.day == day
+        )
+    ).all()
+    agendas = {r.teacher_id: json.loads(r.items) for r in rows}
+    for teacher_id in teacher_ids:
+        if teacher_id not in agendas:
+            agendas[teacher_id] = get_day_agenda(teacher_id, day)
+    return agendas
+
+
+def roll_window():
+    """Удаляет снимки вне окна и строит недостающие дни для всех преподавателей."""
+    from models import Teacher
+
+    start, end = snapshot_window()
+    t = ScheduleSnapshot.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(t).where((t.c.day < start) | (t.c.day > end)))
+    teacher_ids = [tid for (tid,) in db.session.query(Teacher.id).all()]
+    for teacher_id in teacher_ids:
+        refresh_teacher_window(teacher_id)
+    return len(teacher_ids)
+
+
+# ============================================================================
+# Инвалидация по событиям сессии
+# ============================================================================
+
+def _persisted_rows(session, table, ids: Set[int], columns) -> List:
+    """Значения строк в БД до flush (атрибуты объекта могут быть уже expired)."""
+    if not ids:
+        return []
+    return session.connection().execute(
+        select(*[table.c[c] for c in columns]).where(table.c.id.in_(list(ids)))
+    ).all()
+
+
+def _before_flush(session, flush_context, instances):
+    keys = session.info.setdefault(_KEYS_INFO, set())
+    teachers = session.info.setdefault(_TEACHERS_INFO, set())
+    schedule_ids, group_ids = set(), set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Schedule):
+            if obj in session.deleted:
+                schedule_ids.add(obj.id)
+            else:
+                if obj.id is not None:
+                    schedule_ids.add(obj.id)
+                if obj.teacher_id and obj.start_time:
+                    keys.add((obj.teacher_id, obj.start_time.date()))
+        elif isinstance(obj, Group):
+            if obj.id is not None:
+                group_ids.add(obj.id)
+            if obj not in session.deleted and obj.teacher_id:
+                teachers.add(obj.teacher_id)
+
+    for teacher_id, start in _persisted_rows(session, Schedule.__table__, schedule_ids, ('teacher_id', 'start_time')):
+        if teacher_id and start:
+            keys.add((teacher_id, start.date()))
+    for (teacher_id,) in _persisted_rows(session, Group.__table__, group_ids, ('teacher_id',)):
+        if teacher_id:
+            teachers.add(teacher_id)
+
+
+def _after_flush(session, flush_context):
+    keys = session.info.get(_KEYS_INFO)
+    teachers = session.info.get(_TEACHERS_INFO)
+    if not keys and not teachers:
+        return
+
+    # Удаляем устаревшие снимки в той же транзакции, что и сама запись
+    t = ScheduleSnapshot.__table__
+    conn = session.connection()
+    if teachers:
+        conn.execute(delete(t).where(t.c.teacher_id.in_(list(teachers))))
+    for teacher_id, day in keys:
+        if teacher_id not in teachers:
+            conn.execute(delete(t).where(and_(t.c.teacher_id == teacher_id, t.c.day == day)))
+
+
+def _after_commit(session):
+    keys = session.info.pop(_KEYS_INFO, set())
+    teachers = session.info.pop(_TEACHERS_INFO, set())
+    if not keys and not teachers:
+        return
+    try:
+        engine = session.get_bind(mapper=inspect(ScheduleSnapshot).mapper)
+        for teacher_id in teachers:
+            refresh_teacher_window(teacher_id, engine)
+        refresh_snapshots([k for k in keys if k[0] not in teachers], engine)
+    except Exception as e:
+        # Снимки будут достроены при следующем чтении
+        logger.warning(f"Schedule snapshot refresh failed: {e}")
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_KEYS_INFO, None)
+    session.info.pop(_TEACHERS_INFO, None)
+
+
+def register_snapshot_listeners():
+    """Подключает обновление снимков к записи Schedule/Group."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_rollback)
+    _listeners_registered = True
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        count = roll_window()
+    print(f"Снимки расписания обновлены для преподавателей: {count}")
@@ -0,0 +1,84 @@
+"""
+Распределение баллов контрольных точек по категориям успеваемости.
+
+Балл нормализуется к 100-балльной шкале (points / max_points) и относится к
+категории: отлично (от 85%), хорошо (от 70%), удовлетворительно (от 55%),
+неудовлетворительно (ниже 55%). Границы сравниваются в целых числах
+(points * 100 >= 85 * max_points), поэтому результат не зависит от
+округления деления.
+
+distribution() считает категории одним сгруппированным запросом для любой
+выборки: одна контрольная точка, группа, дисциплина или все контрольные
+точки преподавателя, — с разбивкой по группам или по контрольным точкам.
+Незаполненные баллы (NULL) в категории не попадают.
+"""
+
+from sqlalchemy import and_, case, func
+
+from models import db, ControlPoint, ControlPointScore, Group, Student
+
+# (категория, нижняя граница в процентах); последняя категория — все остальное
+CATEGORIES = (('excellent', 85), ('good', 70), ('average', 55), ('low', None))
+
+
+def _category_counts():
+    points = ControlPointScore.points
+    max_points = ControlPoint.max_points
+    columns = []
+    upper = None
+    for name, lower in CATEGORIES:
+        conditions = []
+        if lower is not None:
+            conditions.append(and_(max_points > 0, points * 100 >= lower * max_points))
+        if upper is not None:
+            # Ниже предыдущей границы; при max_points <= 0 балл считается нулевым
+            conditions.append((max_points <= 0) | (points * 100 < upper * max_points))
+        condition = and_(*conditions) if len(conditions) > 1 else conditions[0]
+        columns.append(func.sum(case((condition, 1), else_=0)).label(name))
+        upper = lower
+    return columns
+
+
+def distribution(teacher_id, by='group', control_point_id=None, group_id=None, subject=None):
+    """Число баллов каждой категории по группам (by='group') или контрольным точкам.
+
+    Возвращает {id группы или контрольной точки: {'excellent', 'good',
+    'average', 'low', 'scored'}}. Группа балла — текущая группа студента.
+    """
+    key = Student.group_id if by == 'group' else ControlPointScore.control_point_id
+    query = db.session.query(
+        key.label('key'),
+        *_category_counts(),
+        func.count(ControlPointScore.id).label('scored')
+    ).select_from(ControlPointScore).join(
+        ControlPoint, ControlPointScore.control_point_id == ControlPoint.id
+    ).join(
+        Student, ControlPointScore.student_id == Student.id
+    ).filter(
+        ControlPoint.teacher_id == teacher_id,
+        ControlPointScore.points != None,
+        Student.group_id != None
+    )
+    if control_point_id is not None:
+        query = query.filter(ControlPoint.id == control_point_id)
+    if group_id is not None:
+        query = query.filter(Student.group_id == group_id, ControlPoint.group_id == group_id)
+    if subject:
+        query = query.filter(ControlPoint.subject == subject)
+
+    names = [name for name, _ in CATEGORIES] + ['scored']
+    return {
+        row.key: {name: int(getattr(row, name) or 0) for name in names}
+        for row in query.group_by(key).all()
+    }
+
+
+def empty_counts():
+    return dict({name: 0 for name, _ in CATEGORIES}, scored=0)
+
+
+def group_names(group_ids):
+    """Названия групп по id (один запрос)."""
+    if not group_ids:
+        return {}
+    return dict(db.session.query(Group.id, Group.name).filter(Group.id.in_(list(group_ids))).all())
@@ -0,0 +1,245 @@
+"""
+Поиск похожих работ студентов (MinHash + LSH).
+
+Текст работы разбивается на шинглы — последовательности из SHINGLE_WORDS
+слов, — и для множества шинглов считается MinHash-подпись из NUM_PERM
+чисел (все перестановки сразу, матричными операциями numpy). Доля
+совпадающих позиций двух подписей оценивает коэффициент Жаккара их
+множеств шинглов.
+
+Чтобы не сравнивать все пары, подписи делятся на BANDS полос; работы,
+совпавшие хотя бы в одной полосе, попадают в одну корзину и становятся
+кандидатами. Только кандидаты сравниваются по полной подписи, поэтому
+время растет почти линейно с числом работ.
+
+Подписи хранятся в SubmissionSignature вместе с версией файла (etag или
+mtime:size): при повторном поиске скачиваются и хэшируются только новые и
+измененные файлы.
+"""
+
+import io
+import os
+import re
+import tempfile
+import zipfile
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import combinations
+
+import numpy as np
+
+from models import db, CloudEntry, SubmissionSignature
+
+NUM_PERM = 128
+BANDS = 32          # 32 полосы по 4 значения: кандидаты — пары с похожестью от ~0.4
+SHINGLE_WORDS = 5
+HASH_BLOCK = 4096   # шинглов за один матричный шаг (память: NUM_PERM x HASH_BLOCK x 8 байт)
+MAX_FILE_BYTES = 20 * 1024 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+TEXT_EXTENSIONS = {
+    '.txt', '.md', '.rtf', '.tex', '.csv', '.json', '.xml', '.html', '.htm', '.css', '.sql',
+    '.py', '.ipynb', '.java', '.c', '.h', '.cpp', '.hpp', '.cs', '.js', '.ts', '.go', '.rs',
+    '.php', '.rb', '.kt', '.swift', '.pas', '.sh'
+}
+# Документы-архивы с текстом в XML
+XML_DOCUMENTS = {'.docx': 'word/document.xml', '.odt': 'content.xml'}
+
+_rng = np.random.default_rng(20240901)  # фиксированное зерно: подписи сравнимы между запусками
+# Хэш-функции вида (a*x + b) >> 32 по модулю 2^64 (multiply-shift), a — нечетное
+_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r'\w+')
+_TAG_RE = re.compile(r'<[^>]+>')
+_PARAGRAPH_RE = re.compile(r'</(w:p|text:p|text:h)>')
+
+
+def extract_text(name, data):
+    """Текст файла работы или None, если формат не поддерживается."""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in XML_DOCUMENTS:
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                xml = archive.read(XML_DOCUMENTS[ext]).decode('utf-8', errors='replace')
+        except (zipfile.BadZipFile, KeyError):
+            return None
+        return _TAG_RE.sub(' ', _PARAGRAPH_RE.sub('\n', xml))
+    if ext in TEXT_EXTENSIONS:
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return data.decode('cp1251', errors='replace')
+    return None
+
+
+def shingle_hashes(text):
+    """Уникальные 64-битные хэши шинглов текста."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    codes = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    k = min(SHINGLE_WORDS, len(codes))
+    n = len(codes) - k + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            hashes = hashes * np.uint64(1000003) + codes[j:j + n]
+    return np.unique(hashes)
+
+
+def minhash(shingles):
+    """MinHash-подпись (NUM_PERM значений uint32) множества шинглов."""
+    signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(shingles), HASH_BLOCK):
+            block = shingles[start:start + HASH_BLOCK]
+            hashed = (_A[:, None] * block[None, :] + _B[:, None]) >> np.uint64(32)
+            signature = np.minimum(signature, hashed.min(axis=1).astype(np.uint32))
+    return signature
+
+
+def similar_pairs(keys, signatures, threshold):
+    """Пары (i, j, похожесть) с оценкой Жаккара не ниже threshold.
+
+    signatures — матрица len(keys) x NUM_PERM; keys — идентификаторы
+    авторов: пары одного автора пропускаются.
+    """
+    if len(signatures) < 2:
+        return []
+    rows = NUM_PERM // BANDS
+    candidates = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for index, part in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets[part.tobytes()].append(index)
+        for members in buckets.values():
+            if len(members) > 1:
+                candidates.update(combinations(members, 2))
+
+    pairs = []
+    for i, j in candidates:
+        if keys[i] == keys[j]:
+            continue
+        score = float(np.count_nonzero(signatures[i] == signatures[j])) / NUM_PERM
+        if score >= threshold:
+            pairs.append((i, j, score))
+    pairs.sort(key=lambda pair: -pair[2])
+    return pairs
+
+
+def _item_version(cloud, item, rel_path, indexed):
+    if not cloud.client and not cloud.webdav:
+        try:
+            stat = os.stat(item.path)
+        except OSError:
+            return None
+        return f'{stat.st_mtime}:{stat.st_size}'
+    if indexed.get(rel_path):
+        return indexed[rel_path]
+    if cloud.webdav:
+        try:
+            return cloud.remote_version(rel_path)
+        except Exception:
+            return None
+    return None
+
+
+def _list_student(cloud, student_name, group_name, indexed):
+    """[(файл, путь, версия)] работ студента. Выполняется в потоках пула, без БД."""
+    result = []
+    for item in cloud.list_submissions(student_name, group_name):
+        if getattr(item, 'type', None) == 'dir' or str(getattr(item, 'path', '')).endswith('/'):
+            continue
+        rel_path = f'{group_name}/{student_name}/{item.name}'
+        result.append((item, rel_path, _item_version(cloud, item, rel_path, indexed)))
+    return result
+
+
+def _signature_of(cloud, item, student_name, group_name):
+    """(число шинглов, подпись или None). Выполняется в потоках пула, без БД."""
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        cloud.fetch_submission(item, student_name, group_name, spool)
+        if spool.tell() > MAX_FILE_BYTES:
+            return 0, None
+        spool.seek(0)
+        text = extract_text(item.name, spool.read())
+    if not text:
+        return 0, None
+    shingles = shingle_hashes(text)
+    if not len(shingles):
+        return 0, None
+    return len(shingles), minhash(shingles)
+
+
+def index_group(cloud, group, students, workers=4):
+    """Обновляет подписи работ группы. Возвращает (подписи группы, число пересчитанных)."""
+    existing = {
+        row.path: row for row in SubmissionSignature.query.filter_by(group_id=group.id).all()
+    }
+    # Версии файлов из индекса облака (cloud_index) — без запросов к WebDAV
+    indexed = {
+        path: etag or (f'{modified}:{size}' if modified else None)
+        for path, etag, modified, size in db.session.query(
+            CloudEntry.path, CloudEntry.etag, CloudEntry.modified, CloudEntry.size
+        ).filter(CloudEntry.path.like(f'{group.name}/%'), CloudEntry.is_dir.is_(False)).all()
+    }
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='similarity') as pool:
+        listings = {
+            student.id: pool.submit(_list_student, cloud, student.name, group.name, indexed)
+            for student in students
+        }
+        seen = set()
+        pending = {}
+        for student in students:
+            try:
+                files = listings[student.id].result()
+            except Exception as e:
+                print(f"Similarity list error for {student.name}: {e}")
+                # Неизвестно, что у студента в облаке: подписи не трогаем
+                seen.update(path for path, row in existing.items() if row.student_id == student.id)
+                continue
+            for item, rel_path, version in files:
+                seen.add(rel_path)
+                row = existing.get(rel_path)
+                if row is not None and version is not None and row.version == version:
+                    continue
+                future = pool.submit(_signature_of, cloud, item, student.name, group.name)
+                pending[future] = (rel_path, student, item, version)
+
+        hashed = 0
+        for future, (rel_path, student, item, version) in pending.items():
+            try:
+                shingles, signature = future.result()
+            except Exception as e:
+                print(f"Similarity hash error for {rel_path}: {e}")
+                continue
+            row = existing.get(rel_path)
+            if row is None:
+                row = existing[rel_path] = SubmissionSignature(path=rel_path, group_id=group.id)
+                db.session.add(row)
+            row.student_id = student.id
+            row.name = item.name
+            row.version = version
+            row.shingles = shingles
+            row.signature = signature.tobytes() if signature is not None else None
+            row.updated_at = datetime.utcnow()
+            hashed += 1
+
+    for rel_path in set(existing) - seen:
+        db.session.delete(existing.pop(rel_path))
+    db.session.commit()
+    return list(existing.values()), hashed
+
+
+def find_similar(rows, threshold):
+    """Пары похожих работ разных студентов среди подписей rows."""
+    rows = [row for row in rows if row.signature]
+    if not rows:
+        return []
+    signatures = np.vstack([np.frombuffer(row.signature, dtype=np.uint32) for row in rows])
+    keys = [row.student_id for row in rows]
+    return [(rows[i], rows[j], score) for i, j, score in similar_pairs(keys, signatures, threshold)]
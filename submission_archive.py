@@ -0,0 +1,166 @@
+"""
+Потоковая ZIP-выгрузка работ студентов группы.
+
+Списки работ и сами файлы запрашиваются из облака параллельно (пул из
+SUBMISSIONS_ZIP_WORKERS потоков), а каждый скачанный файл сразу дописывается
+в архив, который отдается клиенту по мере формирования. Архив целиком нигде
+не хранится: в памяти (или во временном файле, если работа большая) лежат
+только файлы, которые уже скачаны, но еще не записаны в ZIP, и их число
+ограничено окном заданий пула.
+"""
+
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+SPOOL_MAX_MEMORY = 1024 * 1024
+COPY_BLOCK_SIZE = 64 * 1024
+MAX_FOLDER_DEPTH = 5  # папки глубже не обходятся и перечисляются в _ошибки.txt
+
+# Уже сжатые форматы кладутся в архив без повторного сжатия
+STORED_EXTENSIONS = {
+    '.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.zip', '.rar', '.7z', '.gz',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.mp3'
+}
+
+
+class _ZipOutput:
+    """Несжимаемый поток для zipfile: накапливает записанные байты до выдачи клиенту."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _is_dir(item):
+    return getattr(item, 'type', None) == 'dir' or str(getattr(item, 'path', '')).endswith('/')
+
+
+def _safe_name(name):
+    return (name or '').replace('/', '_').replace('\\', '_').strip() or 'file'
+
+
+def _list_student(cloud, student_name, group_name, name_filter):
+    """(файлы, пропущенные папки) студента, включая папки заданий внутри его папки.
+
+    Имя файла из подпапки — относительный путь (<папка>/<файл>): по нему
+    fetch_submission находит файл в облаке, и он же сохраняется в архиве.
+    """
+    result = []
+    skipped = []
+    folders = ['']
+    while folders:
+        subdir = folders.pop(0)
+        for item in cloud.list_submissions(student_name, group_name, subdir):
+            name = f'{subdir}/{item.name}' if subdir else item.name
+            if _is_dir(item):
+                if not item.name:
+                    continue
+                if name.count('/') >= MAX_FOLDER_DEPTH:
+                    skipped.append(name)
+                else:
+                    folders.append(name)
+                continue
+            if name_filter and name_filter.lower() not in name.lower():
+                continue
+            if subdir:
+                item = type('Obj', (), {'name': name, 'path': item.path})
+            result.append(item)
+    return result, skipped
+
+
+def _fetch(cloud, item, student_name, group_name):
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        cloud.fetch_submission(item, student_name, group_name, spool)
+        spool.seek(0)
+        return spool
+    except Exception:
+        spool.close()
+        raise
+
+
+def stream_group_archive(cloud, student_names, group_name, name_filter=None, workers=4):
+    """Генератор байтов ZIP-архива: <Студент>/[<папка>/]<файл> для всех работ группы."""
+    output = _ZipOutput()
+    archive = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+    errors = []
+    used_names = set()
+    window = max(workers * 2, 1)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='submissions-zip') as pool:
+        listings = {
+            pool.submit(_list_student, cloud, name, group_name, name_filter): name
+            for name in student_names
+        }
+        queue = []
+        downloads = {}
+
+        def fill_window():
+            while queue and len(downloads) < window:
+                student_name, item = queue.pop(0)
+                downloads[pool.submit(_fetch, cloud, item, student_name, group_name)] = (student_name, item)
+
+        while listings or queue or downloads:
+            done, _ = wait(list(listings) + list(downloads), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in listings:
+                    student_name = listings.pop(future)
+                    try:
+                        items, skipped = future.result()
+                        queue.extend((student_name, item) for item in items)
+                        errors.extend(
+                            f'{student_name}/{folder}: папка слишком глубоко вложена, не включена в архив'
+                            for folder in skipped
+                        )
+                    except Exception as e:
+                        errors.append(f'{student_name}: не удалось получить список работ ({e})')
+                    continue
+
+                student_name, item = downloads.pop(future)
+                try:
+                    spool = future.result()
+                except Exception as e:
+                    errors.append(f'{student_name}/{item.name}: {e}')
+                    continue
+
+                arcname = '/'.join(_safe_name(part) for part in [student_name] + item.name.split('/'))
+                while arcname in used_names:
+                    root, ext = os.path.splitext(arcname)
+                    arcname = f'{root}_{ext}'
+                used_names.add(arcname)
+
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED \
+                    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                with spool, archive.open(info, 'w', force_zip64=True) as dest:
+                    while True:
+                        block = spool.read(COPY_BLOCK_SIZE)
+                        if not block:
+                            break
+                        dest.write(block)
+                        data = output.drain()
+                        if data:
+                            yield data
+            fill_window()
+            data = output.drain()
+            if data:
+                yield data
+
+    if errors:
+        archive.writestr('_ошибки.txt', '\n'.join(errors))
+    archive.close()
+    yield output.drain()
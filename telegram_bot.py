@@ -18,6 +18,8 @@ from telegram.ext import (
     filters,
 )
 
+from telegram_repository import TelegramRepository
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -29,13 +31,18 @@ logger = logging.getLogger(__name__)
 _db = None
 _app = None
 _bot_application = None
+_repo = None
+_teacher_telegram_model = None
 
 
 def init_bot(db, flask_app):
     """Initialize bot with database and Flask app references."""
-    global _db, _app, _bot_application
+    global _db, _app, _bot_application, _repo
     _db = db
     _app = flask_app
+
+    if _repo is None:
+        _repo = TelegramRepository(flask_app)
     
     # Initialize bot application for webhook mode
     token = os.environ.get('TELEGRAM_BOT_TOKEN')
@@ -51,8 +58,12 @@ def init_bot(db, flask_app):
 
 def get_teacher_telegram_model():
     """Get or create TeacherTelegram model."""
+    global _teacher_telegram_model
     from models import db
 
+    if _teacher_telegram_model is not None:
+        return _teacher_telegram_model
+
     class TeacherTelegram(db.Model):
         """Model to link Telegram users to Teachers."""
         __tablename__ = 'teacher_telegram'
@@ -70,6 +81,7 @@ def get_teacher_telegram_model():
         def __repr__(self):
             return f'<TeacherTelegram teacher_id={self.teacher_id} chat_id={self.telegram_chat_id}>'
 
+    _teacher_telegram_model = TeacherTelegram
     return TeacherTelegram
 
 
@@ -77,83 +89,25 @@ def get_teacher_telegram_model():
 # Helper Functions
 # ============================================================================
 
-def get_teacher_by_chat_id(chat_id: int) -> Optional[object]:
-    """Get teacher by Telegram chat ID."""
-    from models import Teacher
-    TeacherTelegram = get_teacher_telegram_model()
-
-    with _app.app_context():
-        link = TeacherTelegram.query.filter_by(
-            telegram_chat_id=chat_id,
-            is_active=True
-        ).first()
-
-        if link:
-            return Teacher.query.get(link.teacher_id)
-    return None
-
-
-def get_teacher_groups(teacher_id: int) -> List[object]:
-    """Get all groups for a teacher."""
-    from models import Group
-
-    with _app.app_context():
-        return Group.query.filter_by(teacher_id=teacher_id).all()
-
-
-def get_group_by_name(teacher_id: int, group_name: str) -> Optional[object]:
-    """Get group by name for a specific teacher."""
-    from models import Group
-
-    with _app.app_context():
-        return Group.query.filter_by(
-            teacher_id=teacher_id,
-            name=group_name
-        ).first()
-
-
-def get_schedule_for_date(teacher_id: int, date: datetime.date) -> List[object]:
-    """Get schedule for a specific date."""
-    from models import Schedule, Group
-
-    with _app.app_context():
-        start_of_day = datetime.combine(date, datetime.min.time())
-        end_of_day = datetime.combine(date, datetime.max.time())
-
-        schedules = Schedule.query.filter(
-            Schedule.teacher_id == teacher_id,
-            Schedule.start_time >= start_of_day,
-            Schedule.start_time <= end_of_day
-        ).order_by(Schedule.start_time).all()
-
-        return schedules
-
-
-def format_schedule_list(schedules: List[object]) -> str:
-    """Format schedule list for display."""
-    from models import Group
+def format_schedule_list(schedules: List[dict]) -> str:
+    """Format schedule list for display.
 
+    Expects agenda items from schedule_snapshots (times as HH:MM, group
+    name already joined).
+    """
     if not schedules:
         return "📅 На этот день занятий не запланировано."
 
     lines = ["📅 Расписание на день:"]
 
     for sched in schedules:
-        start_time = sched.start_time.strftime('%H:%M')
-        end_time = sched.end_time.strftime('%H:%M')
-
-        # Get group name
-        group_name = ""
-        if sched.group_id:
-            with _app.app_context():
-                group = Group.query.get(sched.group_id)
-                if group:
-                    group_name = f" ({group.name})"
-
-        classroom = f" 🏫 {sched.classroom}" if sched.classroom else ""
+        start_time = sched['start_time']
+        end_time = sched['end_time']
+        group_name = f" ({sched['group_name']})" if sched.get('group_name') else ""
+        classroom = f" 🏫 {sched['classroom']}" if sched.get('classroom') else ""
 
         lines.append(f"\n🕐 {start_time}-{end_time}{group_name}{classroom}")
-        lines.append(f"   📖 {sched.title}")
+        lines.append(f"   📖 {sched['title']}")
 
     return "\n".join(lines)
 
@@ -185,11 +139,11 @@ def parse_time(time_str: str) -> Optional[datetime.time]:
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if teacher:
         await update.message.reply_text(
-            f"👋 Здравствуйте, {teacher.username}!\n\n"
+            f"👋 Здравствуйте, {teacher['username']}!\n\n"
             "✅ Ваш Telegram аккаунт уже привязан к системе.\n\n"
             "📋 Доступные команды:\n"
             "/help - Показать все команды\n"
@@ -239,7 +193,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /today command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -248,7 +202,7 @@ async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     today = datetime.now().date()
-    schedules = get_schedule_for_date(teacher.id, today)
+    schedules = await _repo.get_schedule_for_date(teacher['id'], today)
 
     message = format_schedule_list(schedules)
     await update.message.reply_text(message)
@@ -257,7 +211,7 @@ async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /schedule command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -282,7 +236,7 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    schedules = get_schedule_for_date(teacher.id, date)
+    schedules = await _repo.get_schedule_for_date(teacher['id'], date)
 
     message = format_schedule_list(schedules)
     await update.message.reply_text(message)
@@ -291,7 +245,7 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def groups_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /groups command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -299,7 +253,7 @@ async def groups_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    groups = get_teacher_groups(teacher.id)
+    groups = await _repo.get_teacher_groups(teacher['id'])
 
     if not groups:
         await update.message.reply_text("📂 У вас пока нет групп.")
@@ -307,9 +261,9 @@ async def groups_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     lines = ["📂 Ваши группы:"]
     for group in groups:
-        lines.append(f"\n👥 {group.name}")
-        lines.append(f"   📚 Курс: {group.course}")
-        lines.append(f"   🎓 Форма: {group.education_form}")
+        lines.append(f"\n👥 {group['name']}")
+        lines.append(f"   📚 Курс: {group['course']}")
+        lines.append(f"   🎓 Форма: {group['education_form']}")
 
     await update.message.reply_text("\n".join(lines))
 
@@ -317,7 +271,7 @@ async def groups_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def students_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /students command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -332,27 +286,23 @@ async def students_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     group_name = context.args[0]
-    group = get_group_by_name(teacher.id, group_name)
+    students = await _repo.get_group_students(teacher['id'], group_name)
 
-    if not group:
+    if students is None:
         await update.message.reply_text(
             f"❌ Группа '{group_name}' не найдена.\n"
             "Используйте /groups для просмотра доступных групп."
         )
         return
 
-    with _app.app_context():
-        from models import Student
-        students = Student.query.filter_by(group_id=group.id).all()
-
     if not students:
         await update.message.reply_text(f"👥 В группе '{group_name}' пока нет студентов.")
         return
 
     lines = [f"👥 Студенты группы {group_name}:"]
     for i, student in enumerate(students, 1):
-        email = f" 📧 {student.email}" if student.email else ""
-        lines.append(f"{i}. {student.name}{email}")
+        email = f" 📧 {student['email']}" if student['email'] else ""
+        lines.append(f"{i}. {student['name']}{email}")
 
     await update.message.reply_text("\n".join(lines))
 
@@ -360,7 +310,7 @@ async def students_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def addgroup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /addgroup command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -388,32 +338,13 @@ async def addgroup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    from models import Group, db
+    created = await _repo.create_group(teacher['id'], name, course, education_form)
 
-    with _app.app_context():
-        # Check if group already exists
-        existing = Group.query.filter_by(
-            teacher_id=teacher.id,
-            name=name
-        ).first()
-
-        if existing:
-            await update.message.reply_text(
-                f"❌ Группа '{name}' уже существует."
-            )
-            return
-
-        # Create new group
-        new_group = Group(
-            name=name,
-            course=course,
-            education_form=education_form,
-            teacher_id=teacher.id,
-            color='#007bff'
+    if not created:
+        await update.message.reply_text(
+            f"❌ Группа '{name}' уже существует."
         )
-
-        db.session.add(new_group)
-        db.session.commit()
+        return
 
     await update.message.reply_text(
         f"✅ Группа '{name}' успешно создана!\n"
@@ -425,7 +356,7 @@ async def addgroup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def addstudent_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /addstudent command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -444,26 +375,13 @@ async def addstudent_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     student_name = context.args[1]
     email = context.args[2] if len(context.args) > 2 else None
 
-    from models import Student, db
+    added = await _repo.add_student(teacher['id'], group_name, student_name, email)
 
-    with _app.app_context():
-        group = get_group_by_name(teacher.id, group_name)
-
-        if not group:
-            await update.message.reply_text(
-                f"❌ Группа '{group_name}' не найдена."
-            )
-            return
-
-        # Create new student
-        new_student = Student(
-            name=student_name,
-            email=email,
-            group_id=group.id
+    if not added:
+        await update.message.reply_text(
+            f"❌ Группа '{group_name}' не найдена."
         )
-
-        db.session.add(new_student)
-        db.session.commit()
+        return
 
     email_text = f"\n📧 Email: {email}" if email else ""
     await update.message.reply_text(
@@ -476,7 +394,7 @@ async def addstudent_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def addlesson_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /addlesson command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -513,58 +431,16 @@ async def addlesson_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Неверный формат времени. Используйте: ЧЧ:ММ")
         return
 
-    from models import Schedule, Lesson, Attendance, db
-
-    with _app.app_context():
-        group = get_group_by_name(teacher.id, group_name)
-
-        if not group:
-            await update.message.reply_text(f"❌ Группа '{group_name}' не найдена.")
-            return
-
-        # Create datetime objects
-        start_datetime = datetime.combine(date, start_time)
-        end_datetime = datetime.combine(date, end_time)
-
-        # Create Schedule entry
-        schedule = Schedule(
-            title=topic,
-            start_time=start_datetime,
-            end_time=end_datetime,
-            group_id=group.id,
-            teacher_id=teacher.id,
-            classroom=classroom,
-            color=group.color or '#007bff'
-        )
-
-        db.session.add(schedule)
-        db.session.flush()  # Get schedule.id
-
-        # Create Lesson entry (like calendar_module.py does)
-        lesson = Lesson(
-            date=start_datetime,
-            group_id=group.id,
-            topic=topic,
-            classroom=classroom,
-            teacher_id=teacher.id,
-            subject=topic
-        )
-
-        db.session.add(lesson)
-        db.session.flush()  # Get lesson.id
+    start_datetime = datetime.combine(date, start_time)
+    end_datetime = datetime.combine(date, end_time)
 
-        # Create Attendance records for all students in the group
-        students = group.students
-        for student in students:
-            attendance = Attendance(
-                student_id=student.id,
-                lesson_id=lesson.id,
-                present=False,
-                date=start_datetime
-            )
-            db.session.add(attendance)
+    schedule_id = await _repo.add_lesson(
+        teacher['id'], group_name, start_datetime, end_datetime, topic, classroom
+    )
 
-        db.session.commit()
+    if schedule_id is None:
+        await update.message.reply_text(f"❌ Группа '{group_name}' не найдена.")
+        return
 
     classroom_text = f"\n🏫 Аудитория: {classroom}" if classroom else ""
     await update.message.reply_text(
@@ -579,7 +455,7 @@ async def addlesson_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def deletelesson_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /deletelesson command."""
     chat_id = update.effective_chat.id
-    teacher = get_teacher_by_chat_id(chat_id)
+    teacher = await _repo.get_teacher_by_chat_id(chat_id)
 
     if not teacher:
         await update.message.reply_text(
@@ -600,38 +476,13 @@ async def deletelesson_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("❌ ID занятия должен быть числом.")
         return
 
-    from models import Schedule, Lesson, Attendance, db
-
-    with _app.app_context():
-        # Find schedule by ID and verify it belongs to this teacher
-        schedule = Schedule.query.filter_by(
-            id=lesson_id,
-            teacher_id=teacher.id
-        ).first()
-
-        if not schedule:
-            await update.message.reply_text(
-                f"❌ Занятие с ID {lesson_id} не найдено или у вас нет доступа."
-            )
-            return
-
-        # Find and delete related lesson
-        lesson = Lesson.query.filter_by(
-            date=schedule.start_time,
-            group_id=schedule.group_id,
-            teacher_id=teacher.id,
-            topic=schedule.title
-        ).first()
+    deleted = await _repo.delete_lesson(teacher['id'], lesson_id)
 
-        if lesson:
-            # Delete attendance records
-            Attendance.query.filter_by(lesson_id=lesson.id).delete()
-            # Delete lesson
-            db.session.delete(lesson)
-
-        # Delete schedule
-        db.session.delete(schedule)
-        db.session.commit()
+    if not deleted:
+        await update.message.reply_text(
+            f"❌ Занятие с ID {lesson_id} не найдено или у вас нет доступа."
+        )
+        return
 
     await update.message.reply_text(f"✅ Занятие с ID {lesson_id} успешно удалено.")
 
@@ -940,18 +791,22 @@ def send_notification_to_teacher(teacher_id: int, message: str) -> bool:
     """
     Send notification to teacher via Telegram.
     Returns True if message was sent successfully.
+
+    Uses the shared NotificationService (one bot and connection pool for the
+    whole process). For several teachers at once use
+    telegram_notifications.notify_teachers().
     """
-    import asyncio
+    from telegram_notifications import get_notification_service
 
     if not _app:
         return False
 
-    TeacherTelegram = get_teacher_telegram_model()
-    token = os.environ.get('TELEGRAM_BOT_TOKEN')
-
-    if not token:
+    service = get_notification_service()
+    if not service:
         return False
 
+    TeacherTelegram = get_teacher_telegram_model()
+
     with _app.app_context():
         link = TeacherTelegram.query.filter_by(
             teacher_id=teacher_id,
@@ -963,27 +818,7 @@ def send_notification_to_teacher(teacher_id: int, message: str) -> bool:
 
         chat_id = link.telegram_chat_id
 
-    async def send_message():
-        from telegram import Bot
-        bot = Bot(token=token)
-        try:
-            await bot.send_message(chat_id=chat_id, text=message)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send message: {e}")
-            return False
-
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If loop is already running, create a new task
-            future = asyncio.run_coroutine_threadsafe(send_message(), loop)
-            return future.result(timeout=10)
-        else:
-            return loop.run_until_complete(send_message())
-    except Exception as e:
-        logger.error(f"Error sending notification: {e}")
-        return False
+    return service.send(chat_id, message)
 
 
 if __name__ == '__main__':
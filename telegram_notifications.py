@@ -0,0 +1,346 @@
+"""
+Telegram notification service for teacherTools.
+
+Outgoing notifications go through one shared Bot (and one pooled HTTP client)
+living on a dedicated background event loop. Sending is rate limited with
+token buckets that follow Telegram's limits (about 30 messages per second
+overall and one message per second per chat), retried with exponential
+backoff, and available as a bulk API.
+
+Scheduled jobs (run from cron / PythonAnywhere scheduled tasks):
+    python telegram_notifications.py digest     # morning schedule digest
+    python telegram_notifications.py reminder   # unchecked assignments reminder
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API limits
+GLOBAL_RATE = 30        # messages per second for the whole bot
+PER_CHAT_RATE = 1       # messages per second for a single chat
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0      # seconds, doubled on every retry
+CONNECTION_POOL_SIZE = 8
+
+_service = None
+_service_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Asyncio token bucket. Must only be used from a single event loop."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class NotificationService:
+    """Shared, rate-limited Telegram sender usable from synchronous Flask code."""
+
+    def __init__(self, token: str, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 max_retries: int = MAX_RETRIES, pool_size: int = CONNECTION_POOL_SIZE):
+        self.token = token
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.per_chat_rate = per_chat_rate
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._bot: Optional[Bot] = None
+        self._bot_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Event loop and bot lifecycle
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or not self._loop.is_running():
+                self._loop = asyncio.new_event_loop()
+                self._bot = None
+                self._bot_lock = None
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(self._loop)
+                    self._loop.call_soon(started.set)
+                    self._loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='telegram-notifications', daemon=True)
+                self._thread.start()
+                started.wait()
+        return self._loop
+
+    async def _get_bot(self) -> Bot:
+        if self._bot_lock is None:
+            self._bot_lock = asyncio.Lock()
+        async with self._bot_lock:
+            if self._bot is None:
+                request = HTTPXRequest(connection_pool_size=self.pool_size)
+                bot = Bot(token=self.token, request=request)
+                await bot.initialize()
+                self._bot = bot
+        return self._bot
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 1000:
+                self._chat_buckets = {cid: b for cid, b in self._chat_buckets.items() if not b.idle}
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def close(self, timeout: float = 10):
+        if self._loop is None or not self._loop.is_running():
+            return
+
+        async def shutdown():
+            if self._bot is not None:
+                await self._bot.shutdown()
+                self._bot = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    async def send_async(self, chat_id: int, text: str, **kwargs) -> bool:
+        """Send one message honouring rate limits, retrying transient errors."""
+        bot = await self._get_bot()
+        delay = BACKOFF_BASE
+
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._global_bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                return True
+            except RetryAfter as e:
+                logger.warning(f"Flood limit for chat {chat_id}, retry in {e.retry_after}s")
+                await asyncio.sleep(float(e.retry_after))
+            except (BadRequest, Forbidden) as e:
+                # Not retryable: bad chat id, bot blocked by the user, etc.
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+                return False
+            except (TimedOut, NetworkError) as e:
+                if attempt == self.max_retries:
+                    break
+                logger.warning(f"Send to {chat_id} failed ({e}), retry in {delay}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+                return False
+
+        logger.error(f"Giving up on message to {chat_id} after {self.max_retries + 1} attempts")
+        return False
+
+    async def send_bulk_async(self, messages: Iterable[Tuple[int, str]], **kwargs) -> List[bool]:
+        return list(await asyncio.gather(*(self.send_async(chat_id, text, **kwargs) for chat_id, text in messages)))
+
+    def send(self, chat_id: int, text: str, timeout: float = 30, **kwargs) -> bool:
+        """Blocking send for synchronous callers."""
+        future = asyncio.run_coroutine_threadsafe(self.send_async(chat_id, text, **kwargs), self._ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Error sending notification: {e}")
+            future.cancel()
+            return False
+
+    def send_bulk(self, messages: Iterable[Tuple[int, str]], timeout: float = None, **kwargs) -> List[bool]:
+        """Blocking bulk send. Returns one success flag per message, in order."""
+        messages = list(messages)
+        if not messages:
+            return []
+        if timeout is None:
+            # Enough time for the per-chat limit plus retries
+            timeout = 30 + len(messages) / GLOBAL_RATE * 2
+        future = asyncio.run_coroutine_threadsafe(self.send_bulk_async(messages, **kwargs), self._ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Error sending bulk notifications: {e}")
+            future.cancel()
+            return [False] * len(messages)
+
+
+def get_notification_service() -> Optional[NotificationService]:
+    """Shared service instance, or None if TELEGRAM_BOT_TOKEN is not set."""
+    global _service
+    token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if not token:
+        return None
+    with _service_lock:
+        if _service is None or _service.token != token:
+            _service = NotificationService(token)
+    return _service
+
+
+# ============================================================================
+# Teacher-level helpers
+# ============================================================================
+
+def get_linked_chats(teacher_ids: Iterable[int] = None) -> Dict[int, int]:
+    """Map teacher_id -> telegram_chat_id for active links. Needs an app context."""
+    from telegram_bot import get_teacher_telegram_model
+
+    TeacherTelegram = get_teacher_telegram_model()
+    query = TeacherTelegram.query.filter_by(is_active=True)
+    if teacher_ids is not None:
+        query = query.filter(TeacherTelegram.teacher_id.in_(list(teacher_ids)))
+    return {link.teacher_id: link.telegram_chat_id for link in query.all()}
+
+
+def notify_teachers(flask_app, messages: Dict[int, str]) -> Dict[int, bool]:
+    """Send personalised messages to several teachers in one batch.
+
+    Args:
+        messages: teacher_id -> message text
+
+    Returns:
+        teacher_id -> True if delivered
+    """
+    service = get_notification_service()
+    if not service or not messages:
+        return {teacher_id: False for teacher_id in messages}
+
+    with flask_app.app_context():
+        chats = get_linked_chats(messages.keys())
+
+    targets = [(teacher_id, chats[teacher_id]) for teacher_id in messages if teacher_id in chats]
+    results = service.send_bulk([(chat_id, messages[teacher_id]) for teacher_id, chat_id in targets])
+
+    status = {teacher_id: False for teacher_id in messages}
+    for (teacher_id, _), ok in zip(targets, results):
+        status[teacher_id] = ok
+    return status
+
+
+# ============================================================================
+# Scheduled notifications
+# ============================================================================
+
+def build_schedule_digests(flask_app, date=None) -> Dict[int, str]:
+    """Morning digest texts for every linked teacher that has classes on the date."""
+    from schedule_snapshots import get_agendas
+    from telegram_bot import format_schedule_list
+
+    date = date or datetime.now().date()
+
+    with flask_app.app_context():
+        chats = get_linked_chats()
+        agendas = get_agendas(chats.keys(), date)
+
+    return {
+        teacher_id: f"☀️ Доброе утро! {date.strftime('%d.%m.%Y')}\n\n" + format_schedule_list(items)
+        for teacher_id, items in agendas.items() if items
+    }
+
+
+def build_unchecked_reminders(flask_app, limit_titles: int = 5) -> Dict[int, str]:
+    """Reminder texts for linked teachers with unchecked assignments."""
+    from models import db, Assignment, AssignmentDefinition
+    from sqlalchemy import func
+
+    with flask_app.app_context():
+        chats = get_linked_chats()
+        if not chats:
+            return {}
+
+        # Название берется из задания: после переименования копия в работе устаревает
+        title = func.coalesce(AssignmentDefinition.title, Assignment.title)
+        rows = db.session.query(
+            Assignment.teacher_id,
+            title,
+            func.count(Assignment.id).label('cnt')
+        ).outerjoin(
+            AssignmentDefinition, Assignment.definition_id == AssignmentDefinition.id
+        ).filter(
+            Assignment.teacher_id.in_(list(chats.keys())),
+            Assignment.checked_at == None
+        ).group_by(Assignment.teacher_id, title).all()
+
+    by_teacher: Dict[int, List[Tuple[str, int]]] = {}
+    for teacher_id, title, cnt in rows:
+        by_teacher.setdefault(teacher_id, []).append((title, int(cnt)))
+
+    messages = {}
+    for teacher_id, items in by_teacher.items():
+        items.sort(key=lambda x: x[1], reverse=True)
+        total = sum(cnt for _, cnt in items)
+        lines = [f"📝 Непроверенных работ: {total}"]
+        for title, cnt in items[:limit_titles]:
+            lines.append(f"   • {title} — {cnt}")
+        if len(items) > limit_titles:
+            lines.append(f"   … и ещё заданий: {len(items) - limit_titles}")
+        messages[teacher_id] = "\n".join(lines)
+    return messages
+
+
+def send_morning_digest(flask_app, date=None) -> Dict[int, bool]:
+    """Send today's schedule to every linked teacher."""
+    return notify_teachers(flask_app, build_schedule_digests(flask_app, date))
+
+
+def send_unchecked_reminder(flask_app) -> Dict[int, bool]:
+    """Remind linked teachers about assignments waiting to be checked."""
+    return notify_teachers(flask_app, build_unchecked_reminders(flask_app))
+
+
+if __name__ == '__main__':
+    from app import app
+
+    job = sys.argv[1] if len(sys.argv) > 1 else 'digest'
+    if job == 'digest':
+        result = send_morning_digest(app)
+    elif job == 'reminder':
+        result = send_unchecked_reminder(app)
+    else:
+        print("Usage: python telegram_notifications.py [digest|reminder]")
+        sys.exit(1)
+
+    sent = sum(1 for ok in result.values() if ok)
+    print(f"Отправлено уведомлений: {sent} из {len(result)}")
+    service = get_notification_service()
+    if service:
+        service.close()
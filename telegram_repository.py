@@ -0,0 +1,229 @@
+"""
+Data access layer for the Telegram bot.
+
+All SQLAlchemy work for bot handlers runs on a dedicated thread pool so that
+a slow query in one chat does not block the asyncio event loop serving the
+others. Every call gets its own Flask app context (and therefore its own
+scoped session) and returns plain dicts instead of ORM instances, so nothing
+lazy-loads after the session is gone.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_WORKERS = 4
+
+
+class TelegramRepository:
+    """Awaitable repository used by the bot command handlers."""
+
+    def __init__(self, flask_app, max_workers: int = None):
+        self._app = flask_app
+        workers = max_workers or flask_app.config.get('TELEGRAM_DB_WORKERS') or DEFAULT_DB_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix='telegram-db')
+
+    async def run(self, func, *args, **kwargs):
+        """Run a synchronous DB function in the pool inside an app context."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call_in_context, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def _call_in_context(self, func, *args, **kwargs):
+        from models import db
+
+        with self._app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    async def get_teacher_by_chat_id(self, chat_id: int) -> Optional[dict]:
+        return await self.run(self._get_teacher_by_chat_id, chat_id)
+
+    async def get_teacher_groups(self, teacher_id: int) -> List[dict]:
+        return await self.run(self._get_teacher_groups, teacher_id)
+
+    async def get_group_students(self, teacher_id: int, group_name: str) -> Optional[List[dict]]:
+        """Students of a group, or None if the teacher has no such group."""
+        return await self.run(self._get_group_students, teacher_id, group_name)
+
+    async def get_schedule_for_date(self, teacher_id: int, date) -> List[dict]:
+        return await self.run(self._get_schedule_for_date, teacher_id, date)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    async def create_group(self, teacher_id: int, name: str, course: str, education_form: str) -> bool:
+        """Create a group. Returns False if a group with this name already exists."""
+        return await self.run(self._create_group, teacher_id, name, course, education_form)
+
+    async def add_student(self, teacher_id: int, group_name: str, name: str, email: str = None) -> bool:
+        """Add a student. Returns False if the group was not found."""
+        return await self.run(self._add_student, teacher_id, group_name, name, email)
+
+    async def add_lesson(self, teacher_id: int, group_name: str, start: datetime, end: datetime,
+                         topic: str, classroom: str = None) -> Optional[int]:
+        """Create a schedule entry and its journal lesson. Returns the schedule id or None."""
+        return await self.run(self._add_lesson, teacher_id, group_name, start, end, topic, classroom)
+
+    async def delete_lesson(self, teacher_id: int, schedule_id: int) -> bool:
+        """Delete a schedule entry with its lesson. Returns False if not found."""
+        return await self.run(self._delete_lesson, teacher_id, schedule_id)
+
+    # ------------------------------------------------------------------
+    # Synchronous implementations (executed in the pool)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _find_group(teacher_id: int, group_name: str):
+        from models import Group
+
+        return Group.query.filter_by(teacher_id=teacher_id, name=group_name).first()
+
+    @staticmethod
+    def _get_teacher_by_chat_id(chat_id: int) -> Optional[dict]:
+        from models import db, Teacher
+        from telegram_bot import get_teacher_telegram_model
+
+        TeacherTelegram = get_teacher_telegram_model()
+        teacher = db.session.query(Teacher).join(
+            TeacherTelegram, TeacherTelegram.teacher_id == Teacher.id
+        ).filter(
+            TeacherTelegram.telegram_chat_id == chat_id,
+            TeacherTelegram.is_active == True
+        ).first()
+
+        if not teacher:
+            return None
+        return {'id': teacher.id, 'username': teacher.username, 'email': teacher.email}
+
+    @staticmethod
+    def _get_teacher_groups(teacher_id: int) -> List[dict]:
+        from models import Group
+
+        groups = Group.query.filter_by(teacher_id=teacher_id).all()
+        return [{
+            'id': g.id,
+            'name': g.name,
+            'course': g.course,
+            'education_form': g.education_form
+        } for g in groups]
+
+    @classmethod
+    def _get_group_students(cls, teacher_id: int, group_name: str) -> Optional[List[dict]]:
+        from models import Student
+
+        group = cls._find_group(teacher_id, group_name)
+        if not group:
+            return None
+
+        students = Student.query.filter_by(group_id=group.id).all()
+        return [{'id': s.id, 'name': s.name, 'email': s.email} for s in students]
+
+    @staticmethod
+    def _get_schedule_for_date(teacher_id: int, date) -> List[dict]:
+        from schedule_snapshots import get_day_agenda
+
+        return get_day_agenda(teacher_id, date)
+
+    @classmethod
+    def _create_group(cls, teacher_id: int, name: str, course: str, education_form: str) -> bool:
+        from models import db, Group
+
+        if cls._find_group(teacher_id, name):
+            return False
+
+        db.session.add(Group(
+            name=name,
+            course=course,
+            education_form=education_form,
+            teacher_id=teacher_id,
+            color='#007bff'
+        ))
+        db.session.commit()
+        return True
+
+    @classmethod
+    def _add_student(cls, teacher_id: int, group_name: str, name: str, email: str = None) -> bool:
+        from models import db, Student
+
+        group = cls._find_group(teacher_id, group_name)
+        if not group:
+            return False
+
+        db.session.add(Student(name=name, email=email, group_id=group.id))
+        db.session.commit()
+        return True
+
+    @classmethod
+    def _add_lesson(cls, teacher_id: int, group_name: str, start: datetime, end: datetime,
+                    topic: str, classroom: str = None) -> Optional[int]:
+        from models import db, Schedule, Lesson
+
+        group = cls._find_group(teacher_id, group_name)
+        if not group:
+            return None
+
+        schedule = Schedule(
+            title=topic,
+            start_time=start,
+            end_time=end,
+            group_id=group.id,
+            teacher_id=teacher_id,
+            classroom=classroom,
+            color=group.color or '#007bff'
+        )
+        db.session.add(schedule)
+
+        # Create Lesson entry (like calendar_module.py does)
+        lesson = Lesson(
+            date=start,
+            group_id=group.id,
+            topic=topic,
+            classroom=classroom,
+            teacher_id=teacher_id,
+            subject=topic
+        )
+        db.session.add(lesson)
+
+        # Attendance is sparse: rows appear only when a mark is set in the journal
+        db.session.commit()
+        return schedule.id
+
+    @staticmethod
+    def _delete_lesson(teacher_id: int, schedule_id: int) -> bool:
+        from models import db, Schedule, Lesson, Attendance
+
+        schedule = Schedule.query.filter_by(id=schedule_id, teacher_id=teacher_id).first()
+        if not schedule:
+            return False
+
+        lesson = Lesson.query.filter_by(
+            date=schedule.start_time,
+            group_id=schedule.group_id,
+            teacher_id=teacher_id,
+            topic=schedule.title
+        ).first()
+
+        if lesson:
+            Attendance.query.filter_by(lesson_id=lesson.id).delete()
+            db.session.delete(lesson)
+
+        db.session.delete(schedule)
+        db.session.commit()
+        return True
@@ -0,0 +1,81 @@
+"""
+Миниатюры файлов Yandex Disk с ограниченным дисковым кэшем.
+
+Миниатюра берется из превью, которое строит сам Yandex Disk (поле preview
+ресурса), а если его нет — уменьшается из оригинала через Pillow. Готовые
+миниатюры хранятся на диске под ключом (преподаватель, путь, время
+изменения, размер): измененный файл получает новый ключ, поэтому запись
+никогда не нужно инвалидировать. Общий объем кэша ограничен
+THUMBNAIL_CACHE_MAX_MB, при переполнении удаляются давно не запрошенные
+миниатюры (LRU по времени последнего обращения).
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+from flask import current_app
+
+from disk_cache import DiskLRUCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Допустимые размеры (по большей стороне) — ограничивают число вариантов в кэше
+PREVIEW_SIZES = {'s': 150, 'm': 300, 'l': 800, 'xl': 1600}
+DEFAULT_PREVIEW_SIZE = 'm'
+
+# Оригиналы больше этого размера Pillow не обрабатывает
+MAX_SOURCE_BYTES = 30 * 1024 * 1024
+JPEG_QUALITY = 85
+
+
+class ThumbnailCache(DiskLRUCache):
+    """Дисковый LRU-кэш миниатюр."""
+
+    @staticmethod
+    def make_key(teacher_id, path, modified, size):
+        raw = f'{teacher_id}\0{path}\0{modified}\0{size}'.encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            directory = current_app.config.get('THUMBNAIL_CACHE_DIR') or os.path.join('instance', 'thumbnails')
+            max_mb = current_app.config.get('THUMBNAIL_CACHE_MAX_MB', 200)
+            _cache = ThumbnailCache(directory, max_mb * 1024 * 1024)
+    return _cache
+
+
+def resize_image(data, max_side):
+    """Уменьшает изображение до max_side по большей стороне. Возвращает (bytes, mime)."""
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side))
+
+    output = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Прозрачность сохраняется только в PNG
+        image.save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'image/png'
+    image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue(), 'image/jpeg'
+
+
+def detect_mime(data):
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'GIF8'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
@@ -0,0 +1,179 @@
+"""
+Агрегация показателей по интервалам времени (день, неделя, месяц) для
+графиков аналитики.
+
+aggregate(metric, bucket, start, end, **scope) возвращает начала интервалов
+и ряды значений показателя (массивы numpy, по одному числу на интервал).
+Интервал строки вычисляется в SQL через CASE по заранее рассчитанным
+границам, а не через strftime от даты, поэтому отбор по периоду остается
+простым условием date >= start AND date < end и использует индекс
+(teacher_id, date). Пустые интервалы заполняются нулями одной операцией
+над массивом.
+
+Показатели описаны в METRICS: источник данных, колонка даты, агрегаты и
+поддерживаемые фильтры (scope): teacher_id, group_id.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import case, func, literal
+
+from models import db, Assignment, Attendance, Lesson, Student
+
+BUCKETS = ('day', 'week', 'month')
+
+MONTH_NAMES = {
+    1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
+    5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
+    9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
+}
+
+
+def _score_bins():
+    # 0-59 низкий, 60-74 средний, 75-89 хороший, 90-100 отличный, None — нет оценки
+    return {
+        'excellent': func.sum(case((Assignment.score >= 90, 1), else_=0)),
+        'good': func.sum(case(((Assignment.score >= 75) & (Assignment.score < 90), 1), else_=0)),
+        'average': func.sum(case(((Assignment.score >= 60) & (Assignment.score < 75), 1), else_=0)),
+        'low': func.sum(case(((Assignment.score < 60) & (Assignment.score != None), 1), else_=0)),
+        'no_score': func.sum(case((Assignment.score == None, 1), else_=0))
+    }
+
+
+METRICS = {
+    # Явные отметки посещаемости по дате занятия
+    'attendance': {
+        'source': Attendance,
+        'joins': [(Lesson, Attendance.lesson_id == Lesson.id, False)],
+        'date': Lesson.date,
+        'values': {
+            'present': func.sum(case((Attendance.present == True, 1), else_=0)),
+            'absent': func.sum(case((Attendance.present == False, 1), else_=0))
+        },
+        'scope': {'teacher_id': Lesson.teacher_id, 'group_id': Lesson.group_id}
+    },
+    # Занятия и пропуски на них (посещаемость хранится разреженно — outer join)
+    'lesson_absences': {
+        'source': Lesson,
+        'joins': [(Attendance, Attendance.lesson_id == Lesson.id, True)],
+        'date': Lesson.date,
+        'values': {
+            'lessons': func.count(func.distinct(Lesson.id)),
+            'absent': func.sum(case((Attendance.present == False, 1), else_=0))
+        },
+        'scope': {'teacher_id': Lesson.teacher_id, 'group_id': Lesson.group_id}
+    },
+    'lessons': {
+        'source': Lesson,
+        'joins': [],
+        'date': Lesson.date,
+        'values': {'count': func.count(Lesson.id)},
+        'scope': {'teacher_id': Lesson.teacher_id, 'group_id': Lesson.group_id}
+    },
+    # Оценки заданий по диапазонам, по дате сдачи
+    'scores': {
+        'source': Assignment,
+        'joins': [],
+        'date': Assignment.submitted_at,
+        'values': _score_bins(),
+        'scope': {'teacher_id': Assignment.teacher_id, 'group_id': Student.group_id},
+        'scope_joins': {'group_id': (Student, Assignment.student_id == Student.id)}
+    }
+}
+
+
+def align(dt, bucket):
+    """Начало интервала, в который попадает dt."""
+    dt = datetime(dt.year, dt.month, dt.day)
+    if bucket == 'week':
+        return dt - timedelta(days=dt.weekday())
+    if bucket == 'month':
+        return dt.replace(day=1)
+    return dt
+
+
+def shift(dt, bucket, count=1):
+    """Начало интервала через count интервалов (count < 0 — назад)."""
+    if bucket == 'day':
+        return dt + timedelta(days=count)
+    if bucket == 'week':
+        return dt + timedelta(weeks=count)
+    months = dt.year * 12 + dt.month - 1 + count
+    return dt.replace(year=months // 12, month=months % 12 + 1)
+
+
+def bucket_starts(bucket, start, end):
+    """Начала интервалов от интервала start до интервала end включительно."""
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket: {bucket}')
+    cursor = align(start, bucket)
+    last = align(end, bucket)
+    starts = []
+    while cursor <= last:
+        starts.append(cursor)
+        cursor = shift(cursor, bucket)
+    return starts
+
+
+def bucket_key(dt, bucket):
+    if bucket == 'day':
+        return dt.strftime('%Y-%m-%d')
+    if bucket == 'week':
+        year, week, _ = dt.isocalendar()
+        return f"{year}-W{week:02d}"
+    return dt.strftime('%Y-%m')
+
+
+def bucket_label(dt, bucket):
+    """Подпись интервала для графика."""
+    if bucket == 'day':
+        return dt.strftime('%d.%m.%Y')
+    if bucket == 'week':
+        return f"{dt.strftime('%d.%m.%Y')} - {(dt + timedelta(days=6)).strftime('%d.%m.%Y')}"
+    return f"{MONTH_NAMES[dt.month]} {dt.year}"
+
+
+def aggregate(metric, bucket, start, end, **scope):
+    """Ряды показателя metric по интервалам bucket от start до end включительно.
+
+    Возвращает (начала интервалов, {имя значения: np.ndarray}).
+    """
+    spec = METRICS[metric]
+    starts = bucket_starts(bucket, start, end)
+    edges = starts + [shift(starts[-1], bucket)]
+    date_col = spec['date']
+
+    if len(starts) > 1:
+        position = case(
+            *[(date_col >= edges[i], i) for i in range(len(starts) - 1, 0, -1)],
+            else_=0
+        )
+    else:
+        position = literal(0)
+    position = position.label('bucket')
+
+    query = db.session.query(
+        position, *[expr.label(name) for name, expr in spec['values'].items()]
+    ).select_from(spec['source'])
+    for target, onclause, outer in spec['joins']:
+        query = query.outerjoin(target, onclause) if outer else query.join(target, onclause)
+    for key, value in scope.items():
+        if key not in spec['scope']:
+            raise ValueError(f'Metric {metric} does not support scope {key}')
+        if value is None:
+            continue
+        join = spec.get('scope_joins', {}).get(key)
+        if join:
+            query = query.join(*join)
+        query = query.filter(spec['scope'][key] == value)
+
+    rows = query.filter(date_col >= edges[0], date_col < edges[-1]).group_by('bucket').all()
+
+    positions = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    series = {}
+    for column, name in enumerate(spec['values'], start=1):
+        values = np.zeros(len(starts), dtype=np.int64)
+        values[positions] = np.fromiter((row[column] or 0 for row in rows), dtype=np.int64, count=len(rows))
+        series[name] = values
+    return starts, series
@@ -0,0 +1,204 @@
+"""
+Возобновляемая загрузка больших файлов частями.
+
+Файл больше MAX_CONTENT_LENGTH не помещается в один запрос, поэтому клиент
+открывает сессию загрузки и отправляет файл кусками (PUT с заголовком
+Content-Range). Каждый кусок пишется из request.stream на диск блоками по
+STREAM_BLOCK_SIZE, так что память не растет с размером файла. После обрыва
+клиент запрашивает состояние сессии и продолжает с сохраненного смещения.
+
+Собранный файл отправляется в облако одним потоковым PUT и удаляется.
+Состояние сессии хранится рядом с частью файла (<id>.json), поэтому
+загрузку можно продолжить и после перезапуска приложения.
+"""
+
+import json
+import os
+import re
+import secrets
+import time
+
+from flask import current_app
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadSessionError(Exception):
+    """Ошибка протокола загрузки; status — HTTP-код ответа."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _session_dir():
+    directory = current_app.config.get('UPLOAD_SESSION_DIR') or os.path.join('uploads', '__sessions__')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _paths(upload_id):
+    base = os.path.join(_session_dir(), upload_id)
+    return base + '.json', base + '.part'
+
+
+def _save(session):
+    meta_path, _ = _paths(session['id'])
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+
+def _offset(upload_id):
+    _, part_path = _paths(upload_id)
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+
+def cleanup_expired():
+    """Удаляет брошенные сессии старше UPLOAD_SESSION_TTL."""
+    ttl = current_app.config.get('UPLOAD_SESSION_TTL', 24 * 60 * 60)
+    directory = _session_dir()
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > ttl:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def create_session(owner_id, kind, filename, size, target):
+    """Открывает сессию загрузки. target — куда отправить файл после сборки."""
+    if not filename:
+        raise UploadSessionError('Имя файла не указано')
+    if size is None or int(size) <= 0:
+        raise UploadSessionError('Размер файла не указан')
+
+    cleanup_expired()
+    session = {
+        'id': secrets.token_urlsafe(16),
+        'owner_id': owner_id,
+        'kind': kind,
+        'filename': filename,
+        'size': int(size),
+        'target': target,
+        'created_at': time.time()
+    }
+    _, part_path = _paths(session['id'])
+    open(part_path, 'wb').close()
+    _save(session)
+    return session
+
+
+def get_session(upload_id, owner_id, kind):
+    """Сессия владельца или UploadSessionError(404)."""
+    if not upload_id or not re.fullmatch(r'[\w-]+', upload_id):
+        raise UploadSessionError('Сессия загрузки не найдена', 404)
+    meta_path, _ = _paths(upload_id)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        raise UploadSessionError('Сессия загрузки не найдена', 404)
+    if session.get('owner_id') != owner_id or session.get('kind') != kind:
+        raise UploadSessionError('Сессия загрузки не найдена', 404)
+    return session
+
+
+def session_status(session):
+    offset = _offset(session['id'])
+    return {
+        'upload_id': session['id'],
+        'filename': session['filename'],
+        'size': session['size'],
+        'offset': offset,
+        'complete': offset >= session['size'],
+        'chunk_size': current_app.config.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+    }
+
+
+def append_chunk(session, stream, content_range):
+    """Дописывает кусок из потока запроса. Возвращает новое смещение.
+
+    Content-Range: bytes <start>-<end>/<size>; start должен совпадать с уже
+    принятым объемом, иначе клиенту возвращается 409 и текущее смещение.
+    """
+    match = _CONTENT_RANGE_RE.match(content_range or '')
+    if not match:
+        raise UploadSessionError('Ожидается заголовок Content-Range: bytes start-end/size')
+    start, end, total = (int(value) for value in match.groups())
+    if total != session['size'] or end < start or end >= total:
+        raise UploadSessionError('Некорректный диапазон Content-Range')
+
+    offset = _offset(session['id'])
+    if start != offset:
+        raise UploadSessionError('Смещение не совпадает с принятыми данными', 409, offset)
+
+    _, part_path = _paths(session['id'])
+    remaining = end - start + 1
+    with open(part_path, 'ab') as f:
+        while remaining > 0:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+    # Обрыв посреди куска не страшен: клиент продолжит с фактического смещения
+    _save(session)
+    return _offset(session['id'])
+
+
+def open_assembled(session):
+    """Открывает собранный файл для потоковой отправки в облако."""
+    _, part_path = _paths(session['id'])
+    return open(part_path, 'rb')
+
+
+def discard_session(session):
+    for path in _paths(session['id']):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class SizedStream:
+    """Файлоподобный поток известной длины.
+
+    requests берет Content-Length из len() и читает тело блоками, поэтому
+    данные уходят в облако без загрузки файла в память целиком.
+    """
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.size = size
+        self.remaining = size
+
+    def __len__(self):
+        return self.size
+
+    def read(self, amount=-1):
+        if self.remaining <= 0:
+            return b''
+        if amount is None or amount < 0 or amount > self.remaining:
+            amount = self.remaining
+        data = self.stream.read(amount)
+        self.remaining -= len(data)
+        return data
+
+
+def stream_size(stream):
+    """Размер потока с поддержкой seek (загруженный файл Werkzeug) без чтения."""
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell() - position
+    stream.seek(position)
+    return size
@@ -0,0 +1,191 @@
+"""
+Клиент Yandex Disk REST API с пулом соединений и кэшем листингов.
+
+Для каждого преподавателя (токена) создается один requests.Session с
+keep-alive, таймаутами и повторами временных ошибок, поэтому TLS-соединение
+с cloud-api.yandex.net переиспользуется между запросами.
+
+Листинги папок кэшируются по (путь, сортировка, offset, limit). Запись
+считается свежей LISTING_TTL секунд; после этого она проверяется одним
+дешевым запросом ревизии диска (GET /v1/disk?fields=revision): если ревизия
+не изменилась, листинг отдается из кэша без повторного чтения папки.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+YANDEX_API_BASE = 'https://cloud-api.yandex.net/v1/disk'
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+POOL_SIZE = 10
+MAX_RETRIES = 3
+
+PAGE_SIZE = 1000            # максимальный размер страницы для /resources
+LISTING_TTL = 15            # секунд без перепроверки ревизии
+LISTING_CACHE_SIZE = 256    # записей на одного преподавателя
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS', 'DELETE']),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class YandexDiskClient:
+    """Потокобезопасный клиент Yandex Disk для одного токена."""
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.session = _build_session()
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+        self._revision = None
+        self._revision_checked = 0.0
+
+    def request(self, method, endpoint, **kwargs):
+        headers = kwargs.pop('headers', None) or {}
+        headers.setdefault('Authorization', f'OAuth {self.access_token}')
+        headers.setdefault('Accept', 'application/json')
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        return self.session.request(method, f"{YANDEX_API_BASE}{endpoint}", headers=headers, **kwargs)
+
+    def get(self, url, **kwargs):
+        """GET по внешней ссылке (href для скачивания) через тот же пул."""
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        return self.session.get(url, **kwargs)
+
+    def put(self, url, **kwargs):
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        return self.session.put(url, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Ревизия диска и кэш листингов
+    # ------------------------------------------------------------------
+
+    def _current_revision(self):
+        """Ревизия диска; запрашивается не чаще раза в LISTING_TTL секунд."""
+        now = time.monotonic()
+        with self._lock:
+            if self._revision is not None and now - self._revision_checked < LISTING_TTL:
+                return self._revision
+        response = self.request('GET', '', params={'fields': 'revision'})
+        response.raise_for_status()
+        revision = response.json().get('revision')
+        with self._lock:
+            self._revision = revision
+            self._revision_checked = now
+        return revision
+
+    def _cache_get(self, key, revision):
+        with self._lock:
+            entry = self._listings.get(key)
+            if entry is None:
+                return None
+            if revision is not None and entry['revision'] == revision:
+                self._listings.move_to_end(key)
+                return entry['data']
+            del self._listings[key]
+            return None
+
+    def _cache_put(self, key, revision, data):
+        with self._lock:
+            self._listings[key] = {'revision': revision, 'data': data}
+            self._listings.move_to_end(key)
+            while len(self._listings) > LISTING_CACHE_SIZE:
+                self._listings.popitem(last=False)
+
+    def invalidate(self, path=None):
+        """Сбрасывает кэш листингов (после загрузки или удаления файлов)."""
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                parent = path.rstrip('/').rsplit('/', 1)[0] or '/'
+                for key in [k for k in self._listings if k[0] in (path, parent)]:
+                    del self._listings[key]
+            self._revision = None
+
+    def _fetch_page(self, path, offset, limit, sort):
+        params = {
+            'path': path,
+            'offset': offset,
+            'limit': limit,
+            'fields': '_embedded.items.name,_embedded.items.path,_embedded.items.type,'
+                      '_embedded.items.size,_embedded.items.modified,_embedded.items.mime_type,'
+                      '_embedded.items.md5,_embedded.total,modified'
+        }
+        if sort:
+            params['sort'] = sort
+        response = self.request('GET', '/resources', params=params)
+        response.raise_for_status()
+        embedded = response.json().get('_embedded') or {}
+        return {'items': embedded.get('items', []), 'total': embedded.get('total', 0)}
+
+    def list_folder(self, path='/', offset=0, limit=PAGE_SIZE, sort=None):
+        """Страница содержимого папки: {'items': [...], 'total': N} (из кэша, если ревизия та же).
+
+        limit=None — вся папка начиная с offset.
+        """
+        key = (path, sort, offset, limit)
+        revision = self._current_revision()
+        cached = self._cache_get(key, revision)
+        if cached is not None:
+            return cached
+
+        items, total = [], 0
+        # Страница больше лимита API собирается из нескольких запросов
+        position = offset
+        while limit is None or len(items) < limit:
+            size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - len(items))
+            page = self._fetch_page(path, position, size, sort)
+            total = page['total']
+            items.extend(page['items'])
+            position += len(page['items'])
+            if not page['items'] or position >= total:
+                break
+
+        data = {'items': items, 'total': total}
+        self._cache_put(key, revision, data)
+        return data
+
+    def close(self):
+        self.session.close()
+
+
+def get_client(settings):
+    """Клиент для настроек CloudSettings преподавателя (один на токен)."""
+    teacher_id = getattr(settings, 'teacher_id', None)
+    if teacher_id is None:
+        # Временные настройки (проверка подключения) не кэшируем
+        return YandexDiskClient(settings.access_token)
+
+    key = (teacher_id, settings.access_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Токен сменился — старый клиент больше не нужен
+            for old_key in [k for k in _clients if k[0] == teacher_id]:
+                _clients.pop(old_key).close()
+            client = YandexDiskClient(settings.access_token)
+            _clients[key] = client
+        return client